@@ -45,6 +45,8 @@ export async function registerAvatarRoutes(server: FastifyInstance) {
         // Enqueue job for processing
         await avatarQueue.add("avatar_build", {
             jobId: job.id,
+            // Worker fair-share key: one tenant's bulk work cannot starve the others.
+            tenantId: userId,
             frontPhotoUrl: request.frontPhotoUrl,
             sidePhotoUrl: request.sidePhotoUrl,
             heightCm: request.heightCm,
@@ -15,6 +15,17 @@ Env vars (optional):
   MODELS_PREFIX        default: (empty)
   DRY_RUN              true/false
   MINIO_INSECURE       true/false   (disable TLS cert verification; use only for debugging)
+  UPLOAD_CONCURRENCY   files uploaded in parallel (default: 4)
+  UPLOAD_PART_SIZE_MB  multipart part size (default: 64)
+  UPLOAD_PART_CONCURRENCY  parallel parts per file (default: 4)
+  UPLOAD_FORCE         true/false   (re-upload even when the remote copy is unchanged)
+  UPLOAD_HASH_CACHE    local SHA-256 cache (default: ~/.cache/trifitted/upload-models-hashes.json)
+
+Uploads are incremental: each file's SHA-256 is compared with the `sha256` metadata of the
+remote object (or the previous manifest), and only changed files are uploaded. Every upload
+stores its SHA-256 as object metadata. After uploading, a content-addressed manifest is
+published as `manifests/<revision>.json` plus `manifest.json` (latest); the worker's
+model_sync.py uses it to verify downloads and to skip unchanged trees.
 
 Optional upload sources (set what you have):
   SMPLX_DIR
@@ -27,11 +38,20 @@ Optional upload sources (set what you have):
 
 from __future__ import annotations
 
+import hashlib
+import io
+import json
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from urllib.parse import urlparse
 
+MANIFEST_NAME = "manifest.json"
+MANIFESTS_DIR = "manifests/"
+
 
 def _truthy(value: str | None) -> bool:
     if value is None:
@@ -106,24 +126,189 @@ def _ensure_bucket(client, bucket: str, dry_run: bool) -> None:
     client.make_bucket(bucket)
 
 
-def _upload_file(client, bucket: str, object_name: str, file_path: Path, dry_run: bool) -> None:
-    if dry_run:
-        _note(f"DRY_RUN: put {file_path} -> s3://{bucket}/{object_name}")
-        return
-    client.fput_object(bucket, object_name, str(file_path))
+class _HashCache:
+    """SHA-256 per local file, keyed by path + size + mtime, so unchanged multi-GB files are hashed once."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            self._entries = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            self._entries = {}
+
+    def sha256(self, file_path: Path) -> str:
+        st = file_path.stat()
+        key = str(file_path.resolve())
+        stamp = f"{st.st_size}:{st.st_mtime_ns}"
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached and cached.get("stamp") == stamp:
+            return cached["sha256"]
+        h = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(8 * 1024 * 1024), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._entries[key] = {"stamp": stamp, "sha256": digest}
+        return digest
+
+    def save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                self.path.write_text(json.dumps(self._entries, indent=2, sort_keys=True), encoding="utf-8")
+        except Exception as exc:
+            _note(f"WARNING: could not save hash cache {self.path}: {exc}")
 
 
-def _upload_dir_contents(client, bucket: str, prefix: str, source_dir: Path, dry_run: bool) -> None:
+def _dir_files(source_dir: Path, prefix: str) -> list[tuple[Path, str]]:
+    """(local file, key relative to the models root) for every file under `source_dir`."""
     if not source_dir.is_dir():
         raise SystemExit(f"ERROR: Directory not found: {source_dir}")
 
     base = source_dir.resolve()
-    for file_path in base.rglob("*"):
-        if file_path.is_dir():
+    return [
+        (file_path, f"{prefix}{file_path.relative_to(base).as_posix()}")
+        for file_path in sorted(base.rglob("*"))
+        if file_path.is_file()
+    ]
+
+
+def _remote_state(client, bucket: str, remote_root: str) -> dict[str, dict]:
+    """Current objects under the models root: key -> {size, etag, sha256}."""
+    state: dict[str, dict] = {}
+    for obj in client.list_objects(bucket, prefix=remote_root, recursive=True, include_user_meta=True):
+        if obj.is_dir:
+            continue
+        key = obj.object_name[len(remote_root):]
+        if key == MANIFEST_NAME or key.startswith(MANIFESTS_DIR):
             continue
-        rel = file_path.relative_to(base).as_posix()
-        object_name = f"{prefix}{rel}"
-        _upload_file(client, bucket, object_name, file_path, dry_run=dry_run)
+        meta = {k.lower(): v for k, v in (obj.metadata or {}).items()}
+        state[key] = {
+            "size": int(obj.size or 0),
+            "etag": (obj.etag or "").strip('"'),
+            "sha256": meta.get("x-amz-meta-sha256", "") or meta.get("sha256", ""),
+        }
+    return state
+
+
+def _previous_manifest(client, bucket: str, remote_root: str) -> dict:
+    response = None
+    try:
+        response = client.get_object(bucket, f"{remote_root}{MANIFEST_NAME}")
+        data = json.loads(response.read().decode("utf-8"))
+        return data if isinstance(data, dict) and isinstance(data.get("files"), dict) else {}
+    except Exception:
+        return {}
+    finally:
+        if response is not None:
+            response.close()
+            response.release_conn()
+
+
+def _put_json(client, bucket: str, object_name: str, payload: dict) -> None:
+    data = json.dumps(payload, indent=2, sort_keys=True).encode("utf-8")
+    client.put_object(bucket, object_name, io.BytesIO(data), len(data), content_type="application/json")
+
+
+def _sync_files(
+    client,
+    bucket: str,
+    remote_root: str,
+    files: list[tuple[Path, str]],
+    dry_run: bool,
+    concurrency: int,
+    part_size: int,
+    part_concurrency: int,
+    force: bool,
+    hash_cache: _HashCache,
+) -> None:
+    """Upload changed files in parallel and publish the manifest for the resulting tree."""
+    remote = _remote_state(client, bucket, remote_root) if client.bucket_exists(bucket) else {}
+    previous = _previous_manifest(client, bucket, remote_root)
+    previous_files = previous.get("files", {})
+
+    def plan(item: tuple[Path, str]) -> tuple[Path, str, str, bool]:
+        file_path, key = item
+        sha = hash_cache.sha256(file_path)
+        size = file_path.stat().st_size
+        current = remote.get(key)
+        known_sha = (current or {}).get("sha256") or (
+            previous_files.get(key, {}).get("sha256") if current and previous_files.get(key, {}).get("etag") == current["etag"] else ""
+        )
+        unchanged = current is not None and current["size"] == size and known_sha == sha
+        return file_path, key, sha, force or not unchanged
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        planned = list(pool.map(plan, files))
+    hash_cache.save()
+
+    changed = [p for p in planned if p[3]]
+    changed_bytes = sum(p[0].stat().st_size for p in changed)
+    _note(f"{len(changed)} of {len(planned)} file(s) changed ({changed_bytes / 1e6:.0f} MB to upload)")
+
+    uploaded: dict[str, dict] = {}
+
+    def upload(file_path: Path, key: str, sha: str) -> None:
+        object_name = f"{remote_root}{key}"
+        if dry_run:
+            _note(f"DRY_RUN: put {file_path} -> s3://{bucket}/{object_name}")
+            return
+        started = time.monotonic()
+        result = client.fput_object(
+            bucket,
+            object_name,
+            str(file_path),
+            metadata={"sha256": sha},
+            part_size=part_size,
+            num_parallel_uploads=part_concurrency,
+        )
+        uploaded[key] = {"size": file_path.stat().st_size, "etag": (result.etag or "").strip('"'), "sha256": sha}
+        _note(f"  uploaded {key} in {time.monotonic() - started:.1f}s")
+
+    failures = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {pool.submit(upload, p[0], p[1], p[2]): p[1] for p in changed}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as exc:
+                failures.append(f"{futures[future]}: {exc}")
+    if failures:
+        raise SystemExit("ERROR: upload failed for:\n  " + "\n  ".join(failures))
+
+    # Manifest of the whole tree: everything already in the bucket plus what was just uploaded.
+    manifest_files = dict(remote)
+    for key, entry in manifest_files.items():
+        if not entry.get("sha256") and previous_files.get(key, {}).get("etag") == entry["etag"]:
+            entry["sha256"] = previous_files[key].get("sha256", "")
+    for file_path, key, sha, _ in planned:
+        if key in uploaded:
+            manifest_files[key] = uploaded[key]
+        elif key in manifest_files:
+            manifest_files[key]["sha256"] = sha
+    revision = hashlib.sha256(
+        "\n".join(f"{k}:{v['size']}:{v['sha256'] or v['etag']}" for k, v in sorted(manifest_files.items())).encode("utf-8")
+    ).hexdigest()[:16]
+
+    if revision == previous.get("revision"):
+        _note(f"Model tree unchanged (revision {revision}); manifest not republished.")
+        return
+    manifest = {
+        "revision": revision,
+        "previousRevision": previous.get("revision"),
+        "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": manifest_files,
+    }
+    if dry_run:
+        _note(f"DRY_RUN: would publish manifest revision {revision} ({len(manifest_files)} file(s))")
+        return
+    # Versioned copy first, then the "latest" pointer, so a reader never sees a dangling revision.
+    _put_json(client, bucket, f"{remote_root}{MANIFESTS_DIR}{revision}.json", manifest)
+    _put_json(client, bucket, f"{remote_root}{MANIFEST_NAME}", manifest)
+    _note(f"Published manifest revision {revision} ({len(manifest_files)} file(s))")
 
 
 def main() -> int:
@@ -157,17 +342,19 @@ def main() -> int:
     sam2_checkpoints_dir = os.getenv("SAM2_CHECKPOINTS_DIR", "")
     gltfpack_file = os.getenv("GLTFPACK_FILE", "")
 
+    files: list[tuple[Path, str]] = []
+
     if smplx_dir:
         src = _resolve_repo_relative(smplx_dir)
-        _note(f"Uploading SMPL-X from {src} ...")
-        _upload_dir_contents(client, bucket, f"{remote_root}smplx/", src, dry_run=dry_run)
+        _note(f"Including SMPL-X from {src}")
+        files += _dir_files(src, "smplx/")
     else:
         _note("Skipping SMPL-X (SMPLX_DIR not set)")
 
     if pixie_data_dir:
         src = _resolve_repo_relative(pixie_data_dir)
-        _note(f"Uploading PIXIE assets from {src} ...")
-        _upload_dir_contents(client, bucket, f"{remote_root}pixie/", src, dry_run=dry_run)
+        _note(f"Including PIXIE assets from {src}")
+        files += _dir_files(src, "pixie/")
     else:
         _note("Skipping PIXIE assets (PIXIE_DATA_DIR not set)")
 
@@ -175,8 +362,8 @@ def main() -> int:
         src = _resolve_repo_relative(sam3d_checkpoint)
         if not src.is_file():
             raise SystemExit(f"ERROR: File not found: {src}")
-        _note(f"Uploading SAM3D checkpoint from {src} ...")
-        _upload_file(client, bucket, f"{remote_root}sam3d/model.ckpt", src, dry_run=dry_run)
+        _note(f"Including SAM3D checkpoint from {src}")
+        files.append((src, "sam3d/model.ckpt"))
     else:
         _note("Skipping SAM3D checkpoint (SAM3D_CHECKPOINT not set)")
 
@@ -184,15 +371,15 @@ def main() -> int:
         src = _resolve_repo_relative(sam3d_mhr)
         if not src.is_file():
             raise SystemExit(f"ERROR: File not found: {src}")
-        _note(f"Uploading SAM3D MHR model from {src} ...")
-        _upload_file(client, bucket, f"{remote_root}sam3d/assets/mhr_model.pt", src, dry_run=dry_run)
+        _note(f"Including SAM3D MHR model from {src}")
+        files.append((src, "sam3d/assets/mhr_model.pt"))
     else:
         _note("Skipping SAM3D MHR model (SAM3D_MHR_MODEL not set)")
 
     if sam2_checkpoints_dir:
         src = _resolve_repo_relative(sam2_checkpoints_dir)
-        _note(f"Uploading SAM2 checkpoints from {src} ...")
-        _upload_dir_contents(client, bucket, f"{remote_root}sam2/checkpoints/", src, dry_run=dry_run)
+        _note(f"Including SAM2 checkpoints from {src}")
+        files += _dir_files(src, "sam2/checkpoints/")
     else:
         _note("Skipping SAM2 checkpoints (SAM2_CHECKPOINTS_DIR not set)")
 
@@ -200,11 +387,27 @@ def main() -> int:
         src = _resolve_repo_relative(gltfpack_file)
         if not src.is_file():
             raise SystemExit(f"ERROR: File not found: {src}")
-        _note(f"Uploading gltfpack from {src} ...")
-        _upload_file(client, bucket, f"{remote_root}tools/gltfpack", src, dry_run=dry_run)
+        _note(f"Including gltfpack from {src}")
+        files.append((src, "tools/gltfpack"))
     else:
         _note("Skipping gltfpack (GLTFPACK_FILE not set)")
 
+    hash_cache_path = os.getenv("UPLOAD_HASH_CACHE", "").strip()
+    _sync_files(
+        client,
+        bucket,
+        remote_root,
+        files,
+        dry_run=dry_run,
+        concurrency=int(os.getenv("UPLOAD_CONCURRENCY", "4")),
+        part_size=int(os.getenv("UPLOAD_PART_SIZE_MB", "64")) * 1024 * 1024,
+        part_concurrency=int(os.getenv("UPLOAD_PART_CONCURRENCY", "4")),
+        force=_truthy(os.getenv("UPLOAD_FORCE")),
+        hash_cache=_HashCache(
+            Path(hash_cache_path) if hash_cache_path else Path.home() / ".cache" / "trifitted" / "upload-models-hashes.json"
+        ),
+    )
+
     _note("Done.")
     return 0
 
@@ -0,0 +1,192 @@
+"""
+Micro-benchmarks: MeasurementExtractor.extract_measurements and refine_betas_to_targets
+
+Runs over a fixed corpus of (initial betas, true betas, height) cases. Targets are the chest /
+waist / hip circumferences of the true betas, so every refinement has a known answer. The
+corpus is generated from --seed, or loaded from --corpus; --write-corpus stores it together
+with the targets, so alternative backends are compared on identical targets.
+
+Reports time per measurement call and, per refinement, nfev / function evaluations, wall
+time and the final residual (cm) against the targets.
+
+    python benchmarks/bench_measurements.py --cases 20
+    python benchmarks/bench_measurements.py --corpus corpus.json --solver mypkg.solvers:refine_lbfgs
+    python benchmarks/bench_measurements.py --measurer mypkg.backends:make_measurer --output results.json
+
+--measurer names a factory `f(smplx_model_dir) -> extractor` (extract_measurements(dict) -> dict);
+--solver names a function with refine_betas_to_targets' keyword signature.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import logging
+import math
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import harness
+
+_TARGET_KEYS = ("chestCm", "waistCm", "hipCm")
+
+
+def load_callable(spec: str) -> Callable:
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"Expected module:callable, got {spec!r}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def make_corpus(cases: int, seed: int) -> List[Dict[str, Any]]:
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    corpus = []
+    for i in range(cases):
+        true_betas = np.clip(rng.normal(0.0, 1.0, 10), -3.0, 3.0)
+        # PIXIE-like starting point: the truth plus a shape error concentrated in the first betas.
+        initial = np.clip(true_betas + rng.normal(0.0, 1.0, 10) * np.linspace(0.8, 0.2, 10), -3.0, 3.0)
+        corpus.append(
+            {
+                "id": f"case-{i:03d}",
+                "heightCm": float(np.round(rng.uniform(152.0, 196.0), 1)),
+                "trueBetas": [round(float(b), 4) for b in true_betas],
+                "initialBetas": [round(float(b), 4) for b in initial],
+            }
+        )
+    return corpus
+
+
+def scaled_targets(measurer, betas, height_cm: float) -> Dict[str, float]:
+    """Chest/waist/hip of `betas`, scaled to `height_cm` the same way the refiner scales predictions."""
+    import numpy as np
+
+    m = measurer.extract_measurements({"betas": np.asarray(betas, dtype=np.float32)})
+    pred_h = float(m.get("heightCm") or 0.0)
+    scale = float(height_cm) / pred_h if pred_h > 1e-3 else 1.0
+    return {k: float(m.get(k) or 0.0) * scale for k in _TARGET_KEYS}
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    harness.setup_environment("real", tempfile.mkdtemp(prefix="avatar-bench-"), device=args.device)
+
+    import numpy as np
+
+    from config import SMPLX_MODEL_DIR
+    from pipeline import instrumentation
+    from pipeline.betas_refiner import BetaRefineConfig, refine_betas_to_targets
+
+    factory = load_callable(args.measurer) if args.measurer else None
+    if factory is None:
+        from pipeline.measurements import MeasurementExtractor
+
+        factory = MeasurementExtractor
+    measurer = factory(args.smplx_dir or SMPLX_MODEL_DIR)
+    if getattr(measurer, "measurer", True) is None and not args.allow_placeholder:
+        raise SystemExit("Measurer is in placeholder mode (SMPL-X assets missing); results would be meaningless")
+    solver = load_callable(args.solver) if args.solver else refine_betas_to_targets
+
+    corpus = harness.load_json(args.corpus)["cases"] if args.corpus else make_corpus(args.cases, args.seed)
+    for case in corpus:
+        if "targets" not in case:
+            case["targets"] = scaled_targets(measurer, case["trueBetas"], case["heightCm"])
+    if args.write_corpus:
+        harness.save_json(args.write_corpus, {"seed": args.seed, "cases": corpus})
+
+    # Measurement calls
+    for _ in range(args.warmup):
+        measurer.extract_measurements({"betas": np.zeros(10, dtype=np.float32)})
+    call_ms: List[float] = []
+    for _ in range(args.repeat):
+        for case in corpus:
+            betas = np.asarray(case["initialBetas"], dtype=np.float32)
+            started = time.perf_counter()
+            measurer.extract_measurements({"betas": betas})
+            call_ms.append((time.perf_counter() - started) * 1000.0)
+
+    # Refinements
+    config = BetaRefineConfig(max_nfev=args.max_nfev) if args.max_nfev else BetaRefineConfig()
+    refinements = []
+    for case in corpus:
+        with instrumentation.stage("refinement") as record:
+            refined = solver(
+                measurement_extractor=measurer,
+                initial_betas=np.asarray(case["initialBetas"], dtype=np.float32),
+                height_cm=float(case["heightCm"]),
+                targets=case["targets"],
+                config=config,
+            )
+        achieved = scaled_targets(measurer, refined, case["heightCm"])
+        errors = {k: achieved[k] - case["targets"][k] for k in _TARGET_KEYS}
+        initial = scaled_targets(measurer, case["initialBetas"], case["heightCm"])
+        refinements.append(
+            {
+                "id": case["id"],
+                "wallSeconds": round(record.wall_seconds, 4),
+                "cpuSeconds": round(record.cpu_seconds, 4),
+                "nfev": record.attributes.get("nfev"),
+                "evaluations": record.attributes.get("evaluations"),
+                "initialResidualCm": round(math.sqrt(sum((initial[k] - case["targets"][k]) ** 2 for k in _TARGET_KEYS) / 3), 3),
+                "finalResidualCm": round(math.sqrt(sum(e * e for e in errors.values()) / 3), 3),
+                "finalErrorsCm": {k: round(v, 3) for k, v in errors.items()},
+            }
+        )
+
+    def column(key: str) -> List[float]:
+        return [r[key] for r in refinements if isinstance(r.get(key), (int, float))]
+
+    return {
+        "measurer": args.measurer or "pipeline.measurements:MeasurementExtractor",
+        "solver": args.solver or "pipeline.betas_refiner:refine_betas_to_targets",
+        "cases": len(corpus),
+        "measurementCallMs": harness.summarize(call_ms),
+        "refinement": {
+            "wallSeconds": harness.summarize(column("wallSeconds")),
+            "nfev": harness.summarize(column("nfev")),
+            "evaluations": harness.summarize(column("evaluations")),
+            "initialResidualCm": harness.summarize(column("initialResidualCm")),
+            "finalResidualCm": harness.summarize(column("finalResidualCm")),
+        },
+        "perCase": refinements,
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--corpus", help="corpus JSON ({'cases': [...]}) instead of generating one")
+    parser.add_argument("--write-corpus", help="write the corpus (with targets) here")
+    parser.add_argument("--repeat", type=int, default=3, help="measurement-call passes over the corpus")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--max-nfev", type=int, default=0, help="override BetaRefineConfig.max_nfev")
+    parser.add_argument("--measurer", help="module:factory for an alternative measurement backend")
+    parser.add_argument("--solver", help="module:function for an alternative refinement solver")
+    parser.add_argument("--smplx-dir", default=os.getenv("SMPLX_MODEL_DIR", ""))
+    parser.add_argument("--device", choices=["cpu", "auto"], default="cpu")
+    parser.add_argument("--allow-placeholder", action="store_true")
+    parser.add_argument("--output", help="write the full results JSON here")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    results = run(args)
+
+    calls = results["measurementCallMs"]
+    ref = results["refinement"]
+    print(f"measurer: {results['measurer']}\nsolver:   {results['solver']}\ncases:    {results['cases']}")
+    print(f"extract_measurements: p50 {calls['p50']:.1f}ms  p90 {calls['p90']:.1f}ms  (n={calls['n']})")
+    print(
+        f"refinement: wall p50 {ref['wallSeconds'].get('p50', float('nan')):.2f}s, "
+        f"nfev p50 {ref['nfev'].get('p50', float('nan')):.0f}, evaluations p50 {ref['evaluations'].get('p50', float('nan')):.0f}, "
+        f"residual {ref['initialResidualCm'].get('p50', float('nan')):.2f}cm -> {ref['finalResidualCm'].get('p50', float('nan')):.2f}cm (p50)"
+    )
+    if args.output:
+        harness.save_json(args.output, results)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,147 @@
+"""
+End-to-end pipeline benchmark (CPU)
+
+Drives AvatarWorker.process_job against local stand-ins (filesystem storage, a recording API
+client, synthetic or supplied fixture photos) and reports per-stage and end-to-end latency
+distributions from the worker's stage instrumentation.
+
+    python benchmarks/bench_pipeline.py --mode placeholder --iterations 10
+    python benchmarks/bench_pipeline.py --mode real --iterations 5 --baseline benchmarks/baselines/cpu-real.json
+
+With --baseline, exits 1 when a stage's (or the end-to-end) p50 regressed by more than
+--threshold. --write-baseline stores this run as the new baseline.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import harness
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["placeholder", "real"], default="placeholder")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed jobs run first")
+    parser.add_argument("--photos", help="directory with front.jpg (+ side.jpg); default: synthetic fixtures")
+    parser.add_argument("--height-cm", type=float, default=175.0)
+    parser.add_argument("--device", choices=["cpu", "auto"], default="cpu")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed p50 growth (fraction)")
+    parser.add_argument("--min-delta", type=float, default=0.02, help="ignore regressions smaller than this (s)")
+    parser.add_argument("--write-baseline", action="store_true", help="write this run to --baseline")
+    parser.add_argument("--output", help="write the full results JSON here")
+    parser.add_argument("--keep-workdir", action="store_true")
+    return parser.parse_args(argv)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="avatar-bench-")
+    harness.setup_environment(args.mode, workdir, device=args.device)
+
+    # Imported only now: config reads the environment at import time.
+    from pipeline.storage import LocalStorageClient
+    from worker import AvatarWorker
+
+    try:
+        storage = LocalStorageClient(os.path.join(workdir, "bucket"))
+        if args.photos:
+            photos = {v: os.path.join(args.photos, f"{v}.jpg") for v in ("front", "side")}
+            photos = {v: p for v, p in photos.items() if os.path.isfile(p)}
+        else:
+            photos = harness.write_fixture_photos(os.path.join(workdir, "fixtures"))
+        for view, path in photos.items():
+            storage.upload_file(path, f"uploads/bench/{view}.jpg")
+
+        api = harness.RecordingAPIClient()
+        load_started = time.perf_counter()
+        worker = AvatarWorker(storage=storage, api_client=api)
+        load_seconds = time.perf_counter() - load_started
+
+        stage_samples: Dict[str, List[float]] = {}
+        end_to_end: List[float] = []
+        for i in range(args.warmup + args.iterations):
+            job_id = f"bench-{i:04d}"
+            job = {
+                "jobId": job_id,
+                "frontPhotoUrl": "http://bench/uploads/bench/front.jpg",
+                "sidePhotoUrl": "http://bench/uploads/bench/side.jpg" if "side" in photos else None,
+                "heightCm": args.height_cm,
+            }
+            started = time.perf_counter()
+            ok = worker.process_job(job)
+            elapsed = time.perf_counter() - started
+            final = api.last(job_id) or {}
+            if not ok or final.get("status") != "completed":
+                raise RuntimeError(f"Benchmark job {job_id} failed: {final.get('error')}")
+            if i < args.warmup:
+                continue
+            end_to_end.append(elapsed)
+            performance = (final.get("result") or {}).get("qualityReport", {}).get("performance", {})
+            for name, totals in performance.get("totals", {}).items():
+                stage_samples.setdefault(name, []).append(float(totals["wallSeconds"]))
+
+        return {
+            "mode": args.mode,
+            "device": args.device,
+            "iterations": args.iterations,
+            "modelLoadSeconds": round(load_seconds, 3),
+            "endToEnd": harness.summarize(end_to_end),
+            "stages": {name: harness.summarize(values) for name, values in sorted(stage_samples.items())},
+        }
+    finally:
+        if args.keep_workdir:
+            print(f"Work dir kept at {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_table(results: Dict[str, Any]) -> None:
+    rows = [("end-to-end", results["endToEnd"])] + list(results["stages"].items())
+    print(f"{'stage':<20} {'n':>4} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    for name, s in rows:
+        if not s.get("n"):
+            continue
+        print(f"{name:<20} {s['n']:>4} {s['p50']:>9.3f} {s['p90']:>9.3f} {s['p99']:>9.3f} {s['max']:>9.3f}")
+    print(f"model load: {results['modelLoadSeconds']:.1f}s ({results['mode']} mode, {results['device']})")
+
+
+def main(argv: List[str] | None = None) -> int:
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    args = parse_args(argv)
+    results = run(args)
+    print_table(results)
+
+    if args.output:
+        harness.save_json(args.output, results)
+
+    if args.baseline and args.write_baseline:
+        harness.save_json(args.baseline, results)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if args.baseline:
+        baseline = harness.load_json(args.baseline)
+        if baseline.get("mode") != results["mode"]:
+            print(f"Baseline is for {baseline.get('mode')} mode, this run is {results['mode']}; not comparing")
+            return 0
+        current = {"end-to-end": results["endToEnd"], **results["stages"]}
+        previous = {"end-to-end": baseline.get("endToEnd", {}), **baseline.get("stages", {})}
+        regressions = harness.compare_to_baseline(current, previous, args.threshold, args.min_delta)
+        if regressions:
+            print("Regressions vs baseline:\n  " + "\n  ".join(regressions))
+            return 1
+        print(f"No regressions vs {args.baseline} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,329 @@
+"""
+Queue throughput load generator
+
+Enqueues synthetic BullMQ-format jobs (job hash + LPUSH onto `bull:<queue>:wait`, as the API's
+BullMQ producer does) and drains them with RedisClient.consume_jobs, using a no-op or sleep
+handler. Reports jobs/s, queue-to-start latency and Redis round trips per job (commands
+issued by the consuming thread, broken down by command / Lua script).
+
+    # local Redis (queues are namespaced per run and deleted afterwards)
+    python benchmarks/bench_queue.py --redis-url redis://localhost:6379 --jobs 5000
+
+    # in-process fake (pip install "fakeredis[lua]")
+    python benchmarks/bench_queue.py --fake --jobs 2000 --handler sleep --sleep-ms 2 --consumers 4
+
+    # starvation: one tenant's --jobs backlog ahead of a single job of another tenant; exits 1
+    # unless that job starts within ceil(jobs / intake) + 1 pops (fair share on)
+    python benchmarks/bench_queue.py --fake --scenario starvation --jobs 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import math
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Tuple
+
+import harness  # also puts src/ on sys.path
+
+from clients.queue_scheduling import QueueSpec, parse_queue_specs
+from clients.redis_client import RedisClient
+
+
+class _StopConsuming(KeyboardInterrupt):
+    """Raised into a consumer's next pop once every job is done (consume_jobs exits on it)."""
+
+
+class CommandCounter:
+    """Counts commands per thread by wrapping a redis client's execute_command."""
+
+    def __init__(self, client, should_stop):
+        self._lock = threading.Lock()
+        self._sha_names: Dict[str, str] = {}
+        self.by_thread: Dict[int, Dict[str, int]] = {}
+        original = client.execute_command
+
+        def execute_command(*args, **kwargs):
+            name = str(args[0]).upper() if args else "?"
+            if name == "EVALSHA" and len(args) > 1:
+                name = f"EVALSHA:{self._sha_names.get(args[1], args[1][:8])}"
+            if should_stop() and (name == "BRPOPLPUSH" or name.startswith("EVALSHA:pop_next")):
+                raise _StopConsuming()
+            counts = self.by_thread.setdefault(threading.get_ident(), {})
+            with self._lock:
+                counts[name] = counts.get(name, 0) + 1
+            return original(*args, **kwargs)
+
+        client.execute_command = execute_command
+
+    def name_scripts(self, redis_client: RedisClient) -> None:
+        for attr in ("_lock_active", "_extend_lock", "_move_to_finished", "_move_stalled", "_migrate_finished", "_pop_next"):
+            script = getattr(redis_client, attr, None)
+            if script is not None:
+                self._sha_names[script.sha] = attr.lstrip("_")
+
+
+def make_client(args: argparse.Namespace, fake_server=None):
+    if args.fake:
+        import fakeredis
+
+        return fakeredis.FakeRedis(server=fake_server, decode_responses=True)
+    import redis
+
+    return redis.from_url(args.redis_url, decode_responses=True)
+
+
+def make_consumer(args: argparse.Namespace, fake_server, should_stop) -> Tuple[RedisClient, CommandCounter]:
+    """A RedisClient on its own connection whose commands are counted; stops once should_stop()."""
+    client = make_client(args, fake_server)
+    counter = CommandCounter(client, should_stop)
+    redis_client = RedisClient(args.redis_url if not args.fake else "fakeredis://", client=client)
+    original_register = redis_client._register_scripts
+
+    def register_and_name():
+        original_register()
+        counter.name_scripts(redis_client)
+
+    redis_client._register_scripts = register_and_name
+    return redis_client, counter
+
+
+def enqueue(client, specs: List[QueueSpec], total: int, tenants: int, batch: int = 500) -> None:
+    """Spread `total` jobs over the queues by weight, round-robin over `tenants` tenants."""
+    weights = [max(1, s.weight) for s in specs]
+    pipe = client.pipeline(transaction=False)
+    for i in range(total):
+        spec = specs[i % len(specs)] if len(set(weights)) == 1 else _pick_weighted(specs, weights, i)
+        _add_job(pipe, spec, str(i + 1), f"load-{i}", f"tenant-{i % max(1, tenants)}")
+        if (i + 1) % batch == 0:
+            pipe.execute()
+    pipe.execute()
+
+
+def _add_job(pipe, spec: QueueSpec, job_id: str, name: str, tenant: str) -> None:
+    prefix = f"bull:{spec.name}:"
+    data = {"jobId": name, "tenantId": tenant, "benchEnqueuedAt": time.time()}
+    pipe.hset(
+        f"{prefix}{job_id}",
+        mapping={
+            "name": spec.name,
+            "data": json.dumps(data),
+            "opts": json.dumps({"attempts": 1}),
+            "timestamp": int(time.time() * 1000),
+            "delay": 0,
+            "priority": 0,
+        },
+    )
+    pipe.lpush(f"{prefix}wait", job_id)
+
+
+def _pick_weighted(specs: List[QueueSpec], weights: List[int], i: int) -> QueueSpec:
+    position = i % sum(weights)
+    for spec, weight in zip(specs, weights):
+        if position < weight:
+            return spec
+        position -= weight
+    return specs[-1]
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    run_id = uuid.uuid4().hex[:8]
+    specs = [QueueSpec(f"bench_{run_id}_{s.name}", s.weight) for s in parse_queue_specs(args.queues)]
+
+    fake_server = None
+    if args.fake:
+        import fakeredis
+
+        fake_server = fakeredis.FakeServer()
+
+    processed = {"count": 0}
+    processed_lock = threading.Lock()
+    latencies_ms: List[float] = []
+    first_start: List[float] = []
+    all_done = threading.Event()
+
+    def handler(job_data: Dict[str, Any]) -> bool:
+        started = time.time()
+        latencies_ms.append((started - float(job_data.get("benchEnqueuedAt", started))) * 1000.0)
+        if not first_start:
+            first_start.append(time.perf_counter())
+        if args.handler == "sleep":
+            time.sleep(args.sleep_ms / 1000.0)
+        with processed_lock:
+            processed["count"] += 1
+            if processed["count"] >= args.jobs:
+                all_done.set()
+        return True
+
+    setup_client = make_client(args, fake_server)
+    enqueue_started = time.perf_counter()
+    enqueue(setup_client, specs, args.jobs, args.tenants)
+    enqueue_seconds = time.perf_counter() - enqueue_started
+
+    counters: List[CommandCounter] = []
+    consumer_threads: List[threading.Thread] = []
+    consumer_idents: List[int] = []
+    started = time.perf_counter()
+
+    def consume():
+        consumer_idents.append(threading.get_ident())
+        redis_client, counter = make_consumer(args, fake_server, all_done.is_set)
+        counters.append(counter)
+        redis_client.consume_jobs(
+            specs,
+            handler,
+            poll_interval=1,
+            scheduling=args.scheduling,
+            fair_share=not args.no_fair_share,
+            fair_share_intake=args.intake,
+            keep_completed=(args.keep_completed, -1),
+            keep_failed=(args.keep_completed, -1),
+        )
+
+    for i in range(args.consumers):
+        thread = threading.Thread(target=consume, name=f"consumer-{i}", daemon=True)
+        thread.start()
+        consumer_threads.append(thread)
+
+    finished = all_done.wait(args.timeout)
+    drained_at = time.perf_counter()
+    for thread in consumer_threads:
+        thread.join(timeout=5)
+
+    _cleanup(setup_client, specs)
+
+    commands: Dict[str, int] = {}
+    for counter in counters:
+        for ident, counts in counter.by_thread.items():
+            if ident not in consumer_idents:
+                continue  # heartbeat / stalled-check threads
+            for name, n in counts.items():
+                commands[name] = commands.get(name, 0) + n
+    heartbeat_commands = sum(
+        n for counter in counters for ident, counts in counter.by_thread.items() if ident not in consumer_idents for n in counts.values()
+    )
+
+    count = processed["count"]
+    busy_seconds = drained_at - (first_start[0] if first_start else started)
+    return {
+        "backend": "fakeredis" if args.fake else "redis",
+        "jobs": args.jobs,
+        "processed": count,
+        "completed": bool(finished),
+        "consumers": args.consumers,
+        "handler": args.handler if args.handler == "noop" else f"sleep {args.sleep_ms}ms",
+        "queues": [f"{s.name.split('_', 2)[-1]}:{s.weight}" for s in specs],
+        "enqueueJobsPerSecond": round(args.jobs / enqueue_seconds, 1) if enqueue_seconds > 0 else None,
+        "jobsPerSecond": round(count / busy_seconds, 1) if busy_seconds > 0 else None,
+        "queueToStartMs": harness.summarize(latencies_ms),
+        "roundTripsPerJob": round(sum(commands.values()) / count, 2) if count else None,
+        "commandsPerJob": {k: round(v / count, 3) for k, v in sorted(commands.items())} if count else {},
+        "heartbeatCommands": heartbeat_commands,
+    }
+
+
+def run_starvation(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    One tenant enqueues a backlog of `args.jobs`, then a second tenant enqueues one job. With
+    fair share the late job must start within ceil(jobs / intake) + 1 pops: the backlog is taken
+    into the tenant FIFOs `intake` jobs per pop, and once the late job is taken in its tenant's
+    head has the smallest start tag. Without fair share it starts after the whole backlog.
+    """
+    run_id = uuid.uuid4().hex[:8]
+    spec = QueueSpec(f"bench_{run_id}_starvation")
+
+    fake_server = None
+    if args.fake:
+        import fakeredis
+
+        fake_server = fakeredis.FakeServer()
+
+    setup_client = make_client(args, fake_server)
+    enqueue(setup_client, [spec], args.jobs, 1)
+    pipe = setup_client.pipeline(transaction=False)
+    _add_job(pipe, spec, str(args.jobs + 1), "late", "tenant-late")
+    pipe.execute()
+
+    started = {"count": 0, "late": None}
+    done = threading.Event()
+
+    def handler(job_data: Dict[str, Any]) -> bool:
+        started["count"] += 1
+        if job_data.get("tenantId") == "tenant-late":
+            started["late"] = started["count"]
+            done.set()
+        return True
+
+    redis_client, _ = make_consumer(args, fake_server, done.is_set)
+    consumer = threading.Thread(
+        target=redis_client.consume_jobs,
+        args=([spec], handler),
+        kwargs={"poll_interval": 1, "fair_share": not args.no_fair_share, "fair_share_intake": args.intake},
+        name="consumer",
+        daemon=True,
+    )
+    began = time.perf_counter()
+    consumer.start()
+    finished = done.wait(args.timeout)
+    elapsed = time.perf_counter() - began
+    consumer.join(timeout=5)
+    _cleanup(setup_client, [spec])
+
+    bound = math.ceil(args.jobs / max(1, args.intake)) + 1
+    late = started["late"]
+    return {
+        "backend": "fakeredis" if args.fake else "redis",
+        "scenario": "starvation",
+        "backlog": args.jobs,
+        "fairShare": not args.no_fair_share,
+        "intake": args.intake,
+        "lateJobStartPosition": late,
+        "lateJobStartSeconds": round(elapsed, 3) if finished else None,
+        "bound": bound,
+        "completed": bool(finished and late is not None and (args.no_fair_share or late <= bound)),
+    }
+
+
+def _cleanup(client, specs: List[QueueSpec]) -> None:
+    try:
+        for spec in specs:
+            keys = list(client.scan_iter(f"bull:{spec.name}:*", count=1000))
+            for i in range(0, len(keys), 500):
+                client.delete(*keys[i : i + 500])
+    except Exception as e:
+        logging.warning(f"Cleanup failed: {e}")
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="redis://localhost:6379")
+    parser.add_argument("--fake", action="store_true", help='use an in-process fakeredis server (needs "fakeredis[lua]")')
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--queues", default="avatar_build:1", help='e.g. "avatar_build:10,avatar_backfill:1"')
+    parser.add_argument("--tenants", type=int, default=20)
+    parser.add_argument("--consumers", type=int, default=1, help="consumer threads, each with its own connection")
+    parser.add_argument("--handler", choices=["noop", "sleep"], default="noop")
+    parser.add_argument("--sleep-ms", type=float, default=5.0)
+    parser.add_argument("--scheduling", choices=["weighted", "priority"], default="weighted")
+    parser.add_argument("--no-fair-share", action="store_true")
+    parser.add_argument("--intake", type=int, default=1000, help="fair share intake per pop (QUEUE_FAIR_SHARE_INTAKE)")
+    parser.add_argument("--scenario", choices=["throughput", "starvation"], default="throughput")
+    parser.add_argument("--keep-completed", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=600.0, help="give up after this many seconds")
+    parser.add_argument("--output", help="write the results JSON here")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    results = run_starvation(args) if args.scenario == "starvation" else run(args)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        harness.save_json(args.output, results)
+    return 0 if results["completed"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,235 @@
+"""
+Accuracy-vs-latency evaluation over a grid of pipeline configurations
+
+Runs every record of a labeled dataset (see synthetic.py; any dataset.json with photos,
+heightCm and ground-truth measurements works) through AvatarWorker.process_job once per
+configuration, and reports per configuration:
+
+- mean absolute error per measurement zone (cm) against the ground truth
+- end-to-end and per-stage latency (p50/p90) from the worker's stage instrumentation
+- the Pareto frontier of end-to-end p50 latency vs mean zone error
+- the input quality gate's metrics and issues per record (to calibrate its thresholds)
+
+Most knobs are read from the environment when `config` is imported, so every configuration
+runs in its own spawned process (--jobs of them at a time, threads split between them).
+Grid keys are environment variables, except job fields (targetTriangles), which go into
+the job data:
+
+    python benchmarks/eval_grid.py --dataset fixtures/synth --jobs 4 \\
+        --set SILHOUETTE_REFINE_ENABLED=true,false --set SILHOUETTE_TORSO_ERODE_PX=4,8,12 \\
+        --set BETA_REFINE_MAX_NFEV=20,40 --set SAM3DBODY_ENABLED=false,true \\
+        --set AVATAR_DISPLAY_POSE=apose --set targetTriangles=5000,10000 --output grid.json
+
+    python benchmarks/eval_grid.py --dataset fixtures/synth --grid grid.json
+
+--grid takes a JSON object of key -> list of values; --set entries are added to it.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+import harness
+
+_JOB_FIELDS = {"targetTriangles"}
+_DEFAULT_ZONES = ("chestCm", "waistCm", "hipCm")
+
+
+def parse_grid(grid_path: str | None, sets: List[str]) -> Dict[str, List[str]]:
+    grid: Dict[str, List[str]] = {}
+    if grid_path:
+        for key, values in harness.load_json(grid_path).items():
+            grid[key] = [str(v).lower() if isinstance(v, bool) else str(v) for v in (values if isinstance(values, list) else [values])]
+    for item in sets:
+        key, sep, values = item.partition("=")
+        if not sep or not key.strip():
+            raise ValueError(f"Expected KEY=v1,v2,..., got {item!r}")
+        grid[key.strip()] = [v.strip() for v in values.split(",") if v.strip()]
+    return grid
+
+
+def expand_grid(grid: Dict[str, List[str]]) -> List[Dict[str, str]]:
+    if not grid:
+        return [{}]
+    keys = sorted(grid)
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(grid[k] for k in keys))]
+
+
+def config_name(settings: Dict[str, str]) -> str:
+    return ",".join(f"{k}={v}" for k, v in sorted(settings.items())) or "defaults"
+
+
+def run_configuration(task: Tuple[Dict[str, str], Dict[str, Any]]) -> Dict[str, Any]:
+    """Worker-process entry point: apply one configuration, run the dataset, return raw results."""
+    settings, options = task
+    for key, value in settings.items():
+        if key not in _JOB_FIELDS:
+            os.environ[key] = value
+    # Before torch / OpenCV load, so their thread pools are sized for `jobs` parallel configurations
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(var, str(options["threads"]))
+    workdir = tempfile.mkdtemp(prefix="avatar-grid-")
+    harness.setup_environment(options["mode"], workdir, device=options["device"])
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    # Imported only now: config reads the environment at import time.
+    from pipeline.storage import LocalStorageClient
+    from worker import AvatarWorker
+
+    job_fields = {k: v for k, v in settings.items() if k in _JOB_FIELDS}
+    try:
+        storage = LocalStorageClient(os.path.join(workdir, "bucket"))
+        api = harness.RecordingAPIClient()
+        worker = AvatarWorker(storage=storage, api_client=api)
+
+        records = []
+        for record in options["records"]:
+            for view, path in record["photos"].items():
+                storage.upload_file(path, f"uploads/{record['id']}/{view}.jpg")
+            job_id = f"grid-{record['id']}"
+            job = {
+                "jobId": job_id,
+                "frontPhotoUrl": f"http://grid/uploads/{record['id']}/front.jpg",
+                "sidePhotoUrl": f"http://grid/uploads/{record['id']}/side.jpg" if "side" in record["photos"] else None,
+                "heightCm": record["heightCm"],
+                **job_fields,
+            }
+            started = time.perf_counter()
+            ok = worker.process_job(job)
+            elapsed = time.perf_counter() - started
+            final = api.last(job_id) or {}
+            result = final.get("result") or {}
+            quality_report = result.get("qualityReport") or {}
+            performance = quality_report.get("performance", {})
+            records.append(
+                {
+                    "id": record["id"],
+                    "ok": bool(ok and final.get("status") == "completed"),
+                    "error": final.get("error"),
+                    "seconds": elapsed,
+                    "measurements": result.get("measurements") or {},
+                    "stages": {name: t["wallSeconds"] for name, t in performance.get("totals", {}).items()},
+                    "inputQuality": quality_report.get("inputQuality"),
+                }
+            )
+        return {"settings": settings, "records": records}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def score(raw: Dict[str, Any], truth: Dict[str, Dict[str, float]], zones: List[str]) -> Dict[str, Any]:
+    errors: Dict[str, List[float]] = {z: [] for z in zones}
+    end_to_end: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    failed = 0
+    for record in raw["records"]:
+        if not record["ok"]:
+            failed += 1
+            continue
+        end_to_end.append(record["seconds"])
+        for name, seconds in record["stages"].items():
+            stages.setdefault(name, []).append(float(seconds))
+        expected = truth.get(record["id"], {})
+        for zone in zones:
+            got = record["measurements"].get(zone)
+            if isinstance(got, (int, float)) and isinstance(expected.get(zone), (int, float)):
+                errors[zone].append(abs(float(got) - float(expected[zone])))
+
+    zone_mae = {z: round(sum(v) / len(v), 3) for z, v in errors.items() if v}
+    return {
+        "name": config_name(raw["settings"]),
+        "settings": raw["settings"],
+        "completed": len(end_to_end),
+        "failed": failed,
+        "maeCm": zone_mae,
+        "meanMaeCm": round(sum(zone_mae.values()) / len(zone_mae), 3) if zone_mae else None,
+        "endToEnd": harness.summarize(end_to_end),
+        "stages": {name: harness.summarize(values) for name, values in sorted(stages.items())},
+        "errors": sorted({str(r["error"]) for r in raw["records"] if not r["ok"]}),
+        "inputQuality": {r["id"]: r["inputQuality"] for r in raw["records"] if r.get("inputQuality")},
+    }
+
+
+def pareto_front(results: List[Dict[str, Any]]) -> List[str]:
+    """Names of the configurations not dominated on (end-to-end p50, mean zone MAE); lower is better."""
+    points = [
+        (r["name"], r["endToEnd"]["p50"], r["meanMaeCm"])
+        for r in results
+        if r["meanMaeCm"] is not None and r["endToEnd"].get("n") and not r["failed"]
+    ]
+    front = []
+    for name, latency, error in points:
+        dominated = any(
+            (l2 <= latency and e2 <= error) and (l2 < latency or e2 < error) for n2, l2, e2 in points if n2 != name
+        )
+        if not dominated:
+            front.append(name)
+    return front
+
+
+def print_table(results: List[Dict[str, Any]], front: List[str], zones: List[str]) -> None:
+    header = f"{'':2}{'p50 s':>8} {'p90 s':>8} {'MAE cm':>7} " + " ".join(f"{z[:-2]:>7}" for z in zones) + "  configuration"
+    print(header)
+    for r in sorted(results, key=lambda r: r["endToEnd"].get("p50", float("inf"))):
+        e2e = r["endToEnd"]
+        mae = "n/a" if r["meanMaeCm"] is None else f"{r['meanMaeCm']:.2f}"
+        zone_cols = " ".join(f"{r['maeCm'][z]:>7.2f}" if z in r["maeCm"] else f"{'n/a':>7}" for z in zones)
+        mark = "* " if r["name"] in front else "  "
+        failed = f"  ({r['failed']} failed)" if r["failed"] else ""
+        print(f"{mark}{e2e.get('p50', float('nan')):>8.2f} {e2e.get('p90', float('nan')):>8.2f} {mae:>7} {zone_cols}  {r['name']}{failed}")
+    print("* = Pareto frontier (end-to-end p50 vs mean zone MAE)")
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", required=True, help="dataset directory or dataset.json")
+    parser.add_argument("--grid", help="JSON object of key -> list of values")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=v1,v2", help="grid axis (repeatable)")
+    parser.add_argument("--zones", default=",".join(_DEFAULT_ZONES), help="measurement keys to score")
+    parser.add_argument("--limit", type=int, default=0, help="only the first N records")
+    parser.add_argument("--jobs", type=int, default=max(1, (os.cpu_count() or 2) // 4), help="configurations in parallel")
+    parser.add_argument("--mode", choices=["placeholder", "real"], default="real")
+    parser.add_argument("--device", choices=["cpu", "auto"], default="cpu")
+    parser.add_argument("--output", help="write the full results JSON here")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    from synthetic import load_dataset
+
+    dataset = load_dataset(args.dataset)
+    records = dataset["records"][: args.limit] if args.limit else dataset["records"]
+    zones = [z.strip() for z in args.zones.split(",") if z.strip()]
+    configurations = expand_grid(parse_grid(args.grid, args.set))
+    jobs = max(1, min(args.jobs, len(configurations)))
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    options = {"mode": args.mode, "device": args.device, "threads": max(1, cpus // jobs), "records": records}
+    print(f"{len(configurations)} configurations x {len(records)} records, {jobs} in parallel")
+
+    # spawn: every configuration gets a fresh interpreter, so import-time config is re-read.
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes=jobs, maxtasksperchild=1) as pool:
+        raw_results = pool.map(run_configuration, [(settings, options) for settings in configurations], chunksize=1)
+
+    truth = {r["id"]: r["measurements"] for r in records}
+    results = [score(raw, truth, zones) for raw in raw_results]
+    front = pareto_front(results)
+    print_table(results, front, zones)
+
+    if args.output:
+        harness.save_json(
+            args.output,
+            {"dataset": os.path.abspath(args.dataset), "records": len(records), "zones": zones, "pareto": front, "configurations": results},
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,177 @@
+"""
+Shared helpers for the avatar-worker benchmarks
+
+- environment setup so the worker runs offline against local stand-ins (must run before
+  anything imports `config`)
+- a recording stand-in for the API client and the filesystem storage client
+- synthetic fixture photos
+- latency summaries and baseline comparison
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import sys
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional
+
+SERVICE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC_DIR = os.path.join(SERVICE_ROOT, "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+def setup_environment(mode: str, workdir: str, device: str = "cpu") -> None:
+    """
+    Configure the worker for an offline benchmark run. Explicitly set env vars win.
+
+    Args:
+        mode: "placeholder" (model dirs point at an empty directory, so PIXIE and the measurer
+            run their placeholder paths) or "real" (real assets required; placeholder output fails)
+        workdir: Scratch directory for caches/checkpoints
+        device: "cpu" hides CUDA devices; "auto" leaves them visible
+    """
+    if device == "cpu":
+        os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    defaults = {
+        "RESULT_CACHE_ENABLED": "false",
+        "RESULT_CACHE_REMOTE_ENABLED": "false",
+        "CHECKPOINT_DIR": os.path.join(workdir, "checkpoints"),
+        "CHECKPOINT_REMOTE_ENABLED": "false",
+        "MAX_RETRIES": "0",
+        "METRICS_ENABLED": "false",
+        "READINESS_PORT": "0",
+        "MODEL_MMAP_DIR": os.path.join(workdir, "mmap"),
+    }
+    if mode == "placeholder":
+        empty = os.path.join(workdir, "no-models")
+        os.makedirs(empty, exist_ok=True)
+        defaults.update(
+            {
+                "SMPLX_MODEL_DIR": empty,
+                "PIXIE_DATA_DIR": empty,
+                "SAM3DBODY_ENABLED": "false",
+                "REQUIRE_REAL_AVATAR": "false",
+                "MODEL_WARMUP_ENABLED": "false",
+            }
+        )
+    elif mode == "real":
+        defaults["REQUIRE_REAL_AVATAR"] = "true"
+    else:
+        raise ValueError(f"Unknown benchmark mode: {mode}")
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+
+class RecordingAPIClient:
+    """APIClient stand-in that records status updates instead of calling the API."""
+
+    def __init__(self):
+        self.updates: List[Dict[str, Any]] = []
+
+    def update_job_status(self, job_id: str, status: str, error=None, progress=None, result=None) -> bool:
+        self.updates.append({"jobId": job_id, "status": status, "error": error, "progress": progress, "result": result})
+        return True
+
+    def last(self, job_id: str) -> Optional[Dict[str, Any]]:
+        for update in reversed(self.updates):
+            if update["jobId"] == job_id:
+                return update
+        return None
+
+
+def write_fixture_photos(directory: str, width: int = 768, height: int = 1024) -> Dict[str, str]:
+    """
+    Write a synthetic front + side "person" photo pair (plain background, skin-toned figure).
+
+    Returns:
+        {"front": path, "side": path}
+    """
+    from PIL import Image, ImageDraw
+
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for view, torso_w in (("front", 0.26), ("side", 0.16)):
+        img = Image.new("RGB", (width, height), (214, 220, 226))
+        draw = ImageDraw.Draw(img)
+        skin, cloth = (205, 160, 130), (60, 70, 90)
+        cx = width / 2
+        head_r = height * 0.055
+        draw.ellipse([cx - head_r, height * 0.06, cx + head_r, height * 0.06 + 2 * head_r], fill=skin)
+        tw = width * torso_w / 2
+        draw.rectangle([cx - tw, height * 0.19, cx + tw, height * 0.52], fill=cloth)
+        gap = tw * 0.1
+        legs = [(cx - tw, cx - gap), (cx + gap, cx + tw)] if view == "front" else [(cx - tw * 0.8, cx + tw * 0.8)]
+        for x0, x1 in legs:
+            draw.rectangle([x0, height * 0.52, x1, height * 0.93], fill=cloth)
+        if view == "front":
+            for side in (-1, 1):
+                x0 = cx + side * tw
+                x1 = x0 + side * width * 0.05
+                draw.rectangle([min(x0, x1), height * 0.2, max(x0, x1), height * 0.5], fill=skin)
+        path = os.path.join(directory, f"{view}.jpg")
+        img.save(path, quality=92)
+        paths[view] = path
+    return paths
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q
+    lo, hi = math.floor(k), math.ceil(k)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(values: Iterable[float]) -> Dict[str, float]:
+    values = [float(v) for v in values]
+    if not values:
+        return {"n": 0}
+    return {
+        "n": len(values),
+        "mean": round(sum(values) / len(values), 4),
+        "min": round(min(values), 4),
+        "p50": round(percentile(values, 0.5), 4),
+        "p90": round(percentile(values, 0.9), 4),
+        "p99": round(percentile(values, 0.99), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def compare_to_baseline(
+    current: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+    min_delta_seconds: float = 0.02,
+    stat: str = "p50",
+) -> List[str]:
+    """
+    Regressions of `current` vs `baseline` ({name: summary}): a name regresses when its `stat`
+    grew by more than `threshold` (fraction) and by more than `min_delta_seconds`.
+    """
+    regressions = []
+    for name, base in sorted(baseline.items()):
+        cur = current.get(name)
+        if not cur or stat not in cur or stat not in base:
+            continue
+        before, after = float(base[stat]), float(cur[stat])
+        if after > before * (1.0 + threshold) and after - before > min_delta_seconds:
+            regressions.append(f"{name}: {stat} {before:.3f}s -> {after:.3f}s (+{(after / max(before, 1e-9) - 1) * 100:.0f}%)")
+    return regressions
+
+
+def load_json(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_json(path: str, data: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
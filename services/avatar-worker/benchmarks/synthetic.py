@@ -0,0 +1,239 @@
+"""
+Synthetic photo / mask fixtures with ground-truth measurements
+
+Samples SMPL-X betas and heights, builds the bodies with `PIXIERunner.build_meshes_from_betas`
+and renders them on the CPU (orthographic, painter's algorithm over the mesh triangles):
+
+- front and side silhouettes (the ground-truth masks, 0/255 PNG)
+- front and side shaded "photos" (Lambert-shaded skin tone over a noisy backdrop, JPEG)
+
+Ground-truth measurements come from `MeasurementExtractor` on the T-pose mesh, exactly as
+the worker measures a finished avatar. Photos and masks use the display (A-pose) mesh, so
+the arms are separated from the torso in the front view.
+
+Output layout (paths in dataset.json are relative to the dataset directory):
+
+    <out>/dataset.json                 {"seed", "image": {...}, "records": [...]}
+    <out>/<id>/front.jpg, side.jpg
+    <out>/<id>/front_mask.png, side_mask.png
+
+    python benchmarks/synthetic.py --out fixtures/synth --count 50 --seed 7
+
+The dataset is deterministic for a given seed, model assets and image settings.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import harness
+
+logger = logging.getLogger(__name__)
+
+_SKIN_TONES = ((224, 187, 160), (205, 160, 130), (176, 124, 92), (141, 96, 66), (98, 66, 46))
+
+
+@dataclass
+class RenderSettings:
+    width: int = 768
+    height: int = 1024
+    # Fraction of the image height the body occupies (centered, so GrabCut's default rect holds it)
+    fill: float = 0.86
+    noise: float = 6.0
+    jpeg_quality: int = 92
+
+
+def sample_body(rng, betas_std: float = 1.0, height_range: Tuple[float, float] = (150.0, 198.0)) -> Dict[str, Any]:
+    import numpy as np
+
+    betas = np.clip(rng.normal(0.0, betas_std, 10), -3.0, 3.0)
+    return {
+        "betas": [round(float(b), 4) for b in betas],
+        "heightCm": float(np.round(rng.uniform(*height_range), 1)),
+    }
+
+
+def _project(vertices, view: str):
+    """Orthographic projection: (u, v, depth) with v pointing up and larger depth nearer the camera."""
+    import numpy as np
+
+    v = np.asarray(vertices, dtype=np.float64)
+    if view == "front":
+        return v[:, 0], v[:, 1], v[:, 2]
+    if view == "side":
+        # Camera on the body's left (+x), looking towards -x
+        return -v[:, 2], v[:, 1], v[:, 0]
+    raise ValueError(f"Unknown view: {view}")
+
+
+def render_view(
+    vertices,
+    faces,
+    view: str,
+    settings: RenderSettings,
+    skin_rgb: Tuple[int, int, int],
+    rng,
+) -> Tuple[Any, Any, float]:
+    """
+    Render one view of a mesh.
+
+    Returns:
+        (photo BGR uint8, mask uint8 0/255, pixels per cm)
+    """
+    import cv2
+    import numpy as np
+
+    u, v, depth = _project(vertices, view)
+    faces = np.asarray(faces, dtype=np.int64)
+    body_h = float(v.max() - v.min())
+    px_per_m = settings.fill * settings.height / max(body_h, 1e-6)
+    cx = 0.5 * (u.max() + u.min())
+    xs = (u - cx) * px_per_m + settings.width / 2.0
+    ys = (v.max() - v) * px_per_m + (1.0 - settings.fill) / 2.0 * settings.height
+    pts = np.stack([xs, ys], axis=1)
+
+    # Per-face Lambert shade, light from the camera and slightly above
+    vert3 = np.stack([u, v, depth], axis=1)
+    tri = vert3[faces]
+    normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True) + 1e-12
+    light = np.array([0.0, 0.35, 1.0])
+    light /= np.linalg.norm(light)
+    shade = 0.25 + 0.75 * np.abs(normals @ light)
+    order = np.argsort(tri[:, :, 2].mean(axis=1))  # far to near
+
+    # Backdrop: vertical gradient plus sensor-like noise
+    grad = np.linspace(235, 190, settings.height, dtype=np.float32)[:, None, None]
+    photo = np.repeat(np.repeat(grad, settings.width, axis=1), 3, axis=2)
+    photo = photo + rng.normal(0.0, settings.noise, photo.shape).astype(np.float32)
+    photo = np.clip(photo, 0, 255).astype(np.uint8)
+    mask = np.zeros((settings.height, settings.width), dtype=np.uint8)
+
+    skin_bgr = np.array(skin_rgb[::-1], dtype=np.float64)
+    # Fixed-point coordinates (4 fractional bits) keep thin triangles from dropping out
+    tri_px = np.round(pts[faces] * 16).astype(np.int32)
+    for i in order:
+        poly = tri_px[i]
+        color = tuple(int(c) for c in np.clip(skin_bgr * shade[i], 0, 255))
+        cv2.fillConvexPoly(photo, poly, color, lineType=cv2.LINE_AA, shift=4)
+        cv2.fillConvexPoly(mask, poly, 255, lineType=cv2.LINE_8, shift=4)
+
+    return photo, mask, px_per_m / 100.0
+
+
+def generate(
+    out_dir: str,
+    count: int,
+    seed: int,
+    settings: Optional[RenderSettings] = None,
+    pixie=None,
+    measurer=None,
+) -> Dict[str, Any]:
+    """
+    Write `count` synthetic subjects into `out_dir` and return the dataset index (also
+    written to `<out_dir>/dataset.json`).
+
+    Args:
+        pixie: PIXIERunner (built from config when omitted); must have real SMPL-X assets
+        measurer: MeasurementExtractor (built from config when omitted)
+    """
+    import cv2
+    import numpy as np
+
+    settings = settings or RenderSettings()
+    if pixie is None or measurer is None:
+        from config import PIXIE_DATA_DIR, PIXIE_MODEL_DIR, SMPLX_MODEL_DIR
+        from pipeline.measurements import MeasurementExtractor
+        from pipeline.pixie_runner import PIXIERunner
+
+        pixie = pixie or PIXIERunner(PIXIE_MODEL_DIR, SMPLX_MODEL_DIR, data_dir=PIXIE_DATA_DIR)
+        measurer = measurer or MeasurementExtractor(SMPLX_MODEL_DIR)
+    if pixie.model is None or getattr(measurer, "measurer", True) is None:
+        raise RuntimeError("Synthetic fixtures need the real PIXIE/SMPL-X assets (placeholder mode has no mesh)")
+
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    records: List[Dict[str, Any]] = []
+    for i in range(count):
+        body = sample_body(rng)
+        skin = _SKIN_TONES[int(rng.integers(len(_SKIN_TONES)))]
+        meshes = pixie.build_meshes_from_betas(np.asarray(body["betas"], dtype=np.float32), body["heightCm"], display_pose="apose")
+        measurements = measurer.extract_measurements({"mesh": meshes["mesh"], "betas": np.asarray(body["betas"])})
+
+        record_id = f"synth-{seed}-{i:04d}"
+        subject_dir = os.path.join(out_dir, record_id)
+        os.makedirs(subject_dir, exist_ok=True)
+        record: Dict[str, Any] = {
+            "id": record_id,
+            "betas": body["betas"],
+            "heightCm": body["heightCm"],
+            "skinRgb": list(skin),
+            "measurements": {k: float(v) for k, v in measurements.items() if isinstance(v, (int, float))},
+            "photos": {},
+            "masks": {},
+            "pxPerCm": {},
+        }
+        for view in ("front", "side"):
+            photo, mask, px_per_cm = render_view(
+                meshes["displayMesh"]["vertices"], meshes["displayMesh"]["faces"], view, settings, skin, rng
+            )
+            photo_rel = os.path.join(record_id, f"{view}.jpg")
+            mask_rel = os.path.join(record_id, f"{view}_mask.png")
+            cv2.imwrite(os.path.join(out_dir, photo_rel), photo, [cv2.IMWRITE_JPEG_QUALITY, settings.jpeg_quality])
+            cv2.imwrite(os.path.join(out_dir, mask_rel), mask)
+            record["photos"][view] = photo_rel
+            record["masks"][view] = mask_rel
+            record["pxPerCm"][view] = round(px_per_cm, 4)
+        records.append(record)
+        logger.info(f"Generated {record_id} ({i + 1}/{count})")
+
+    dataset = {
+        "seed": seed,
+        "image": {"width": settings.width, "height": settings.height, "fill": settings.fill},
+        "records": records,
+    }
+    harness.save_json(os.path.join(out_dir, "dataset.json"), dataset)
+    return dataset
+
+
+def load_dataset(path: str) -> Dict[str, Any]:
+    """Load dataset.json (or a dataset directory), resolving record paths to absolute paths."""
+    if os.path.isdir(path):
+        path = os.path.join(path, "dataset.json")
+    root = os.path.dirname(os.path.abspath(path))
+    dataset = harness.load_json(path)
+    for record in dataset["records"]:
+        for key in ("photos", "masks"):
+            record[key] = {view: os.path.join(root, rel) for view, rel in record[key].items()}
+    return dataset
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="dataset directory")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--width", type=int, default=768)
+    parser.add_argument("--height", type=int, default=1024)
+    parser.add_argument("--fill", type=float, default=0.86, help="fraction of the image height the body occupies")
+    parser.add_argument("--noise", type=float, default=6.0, help="backdrop noise std-dev (0-255 scale)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    for name in ("pipeline", "config"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    harness.setup_environment("real", tempfile.mkdtemp(prefix="avatar-synth-"))
+
+    settings = RenderSettings(width=args.width, height=args.height, fill=args.fill, noise=args.noise)
+    dataset = generate(args.out, args.count, args.seed, settings)
+    print(f"Wrote {len(dataset['records'])} subjects to {os.path.abspath(args.out)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
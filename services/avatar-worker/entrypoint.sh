@@ -25,8 +25,6 @@ fi
 
 # This container bakes code dependencies (PIXIE, SMPL-Anthropometry, optional sam-3d-body/sam2) into the image,
 # but large model weights are mounted at runtime under /app/models.
-#
-# To keep mounts simple (mount just /app/models), copy any provided weights into the locations expected by code.
 
 # Optional: install gltfpack from the mounted model/tools volume (avoids relying on GitHub release downloads).
 # Expected locations (Linux binary):
@@ -52,20 +50,8 @@ if is_true "${REQUIRE_GLTFPACK:-false}"; then
   fi
 fi
 
-if [ -d "/app/models/pixie" ]; then
-  mkdir -p "/app/src/pipeline/PIXIE/data"
-  if [ ! -f "/app/src/pipeline/PIXIE/data/pixie_model.tar" ] && [ -f "/app/models/pixie/pixie_model.tar" ]; then
-    log "[entrypoint] Copying PIXIE assets from /app/models/pixie -> /app/src/pipeline/PIXIE/data"
-    cp -R "/app/models/pixie/." "/app/src/pipeline/PIXIE/data/" || true
-  fi
-fi
-
-if [ -d "/app/models/sam2/checkpoints" ] && [ -d "/app/vendors/sam2" ]; then
-  mkdir -p "/app/vendors/sam2/checkpoints"
-  if [ ! -f "/app/vendors/sam2/checkpoints/sam2.1_hiera_large.pt" ] && [ -f "/app/models/sam2/checkpoints/sam2.1_hiera_large.pt" ]; then
-    log "[entrypoint] Copying SAM2 checkpoints from /app/models/sam2/checkpoints -> /app/vendors/sam2/checkpoints"
-    cp -R "/app/models/sam2/checkpoints/." "/app/vendors/sam2/checkpoints/" || true
-  fi
-fi
+# Model weights are not copied into the image paths: the worker reads PIXIE/SMPL-X/SAM3D assets in place
+# from /app/models (see resolve_model_path in src/config.py), and model_sync.py above links the SAM2
+# checkpoints into /app/vendors/sam2/checkpoints (MODEL_MATERIALIZE_MODE).
 
 exec python3 /app/src/worker.py
@@ -0,0 +1,429 @@
+"""
+Offline batch processing: bulk avatar builds without Redis or API callbacks
+
+Runs every row of a manifest through the same pipeline as a queued avatar_build job, but
+outside the live queue, so backfills and reprocessing campaigns do not compete with
+interactive traffic:
+
+- PIXIE runs in this process and encodes the views of --batch-size subjects per forward pass
+  (PIXIERunner.process_images_batch); each subject is handed over as its `pixie` stage checkpoint
+- a pool of --workers CPU-only processes picks the subjects up from that checkpoint and runs the
+  rest of the job (masks, refinement, measurement, export, gltfpack, artifact upload)
+- every finished row is appended to <out>/progress.jsonl. Re-running with the same --out skips
+  completed rows (and failed ones unless --retry-failed); rows that were in flight resume from
+  their stage checkpoints (<out>/checkpoints unless CHECKPOINT_DIR is set)
+- <out>/results.csv (status, timings, GLB URL, measurements) is written at the end
+
+Manifest: CSV with a header row, or JSON lines, with fields id, front, side (optional) and
+heightCm. Photo references are local paths (relative to the manifest) or minio://<object> in
+MINIO_BUCKET. The manifest itself may live in MinIO; relative references then name objects under
+the manifest's prefix. Artifacts go to <out>/artifacts/avatars/<id>/, or with --upload to
+avatars/<id>/ in MINIO_BUCKET, exactly as the worker writes them.
+
+    python src/batch.py --manifest backfill.csv --out runs/backfill
+    python src/batch.py --manifest minio://backfills/2026-10/manifest.csv --out runs/2026-10 --upload --workers 6
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import posixpath
+import re
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("batch")
+
+_MINIO = "minio://"
+_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+# Child-process state (set by _init_child)
+_child_worker = None
+_child_api = None
+
+
+@dataclass
+class BatchItem:
+    id: str
+    front: str
+    side: Optional[str]
+    height_cm: float
+
+
+class CollectingAPIClient:
+    """APIClient stand-in that keeps each job's last status update instead of calling the API"""
+
+    def __init__(self):
+        self.last: Dict[str, Dict[str, Any]] = {}
+
+    def update_job_status(self, job_id, status, error=None, progress=None, result=None) -> bool:
+        self.last[job_id] = {"status": status, "error": error, "progress": progress, "result": result}
+        return True
+
+    def create_avatar(self, *args, **kwargs) -> Optional[str]:
+        return None
+
+
+class BatchStorage:
+    """Serves staged input photos (uploads/...) locally and writes artifacts to `outputs`."""
+
+    def __init__(self, inputs, outputs):
+        self.inputs = inputs
+        self.outputs = outputs
+        self.bucket = getattr(outputs, "bucket", "")
+
+    def download_file(self, object_name: str, file_path: str) -> str:
+        store = self.inputs if object_name.startswith("uploads/") else self.outputs
+        return store.download_file(object_name, file_path)
+
+    def exists(self, object_name: str) -> bool:
+        return self.outputs.exists(object_name)
+
+    def upload_file(self, file_path: str, object_name: str, content_type: Optional[str] = None) -> str:
+        return self.outputs.upload_file(file_path, object_name, content_type=content_type)
+
+    def get_public_url(self, object_name: str) -> str:
+        return self.outputs.get_public_url(object_name)
+
+
+def _minio_client():
+    from config import MINIO_ACCESS_KEY, MINIO_BUCKET, MINIO_ENDPOINT, MINIO_SECRET_KEY, MINIO_SECURE
+    from pipeline.storage import StorageClient
+
+    return StorageClient(MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_BUCKET, MINIO_SECURE)
+
+
+def _make_storage(out_dir: str, upload: bool) -> BatchStorage:
+    from pipeline.storage import LocalStorageClient
+
+    inputs = LocalStorageClient(os.path.join(out_dir, "inputs"))
+    outputs = _minio_client() if upload else LocalStorageClient(os.path.join(out_dir, "artifacts"))
+    return BatchStorage(inputs, outputs)
+
+
+def _resolve(ref: str, base: str) -> str:
+    if ref.startswith(_MINIO) or os.path.isabs(ref):
+        return ref
+    if base.startswith(_MINIO):
+        return _MINIO + posixpath.join(base[len(_MINIO):], ref)
+    return os.path.join(base, ref)
+
+
+def read_manifest(manifest: str, scratch_dir: str) -> List[BatchItem]:
+    """Parse a CSV / JSON-lines manifest from a local path or minio://<object>."""
+    if manifest.startswith(_MINIO):
+        local = os.path.join(scratch_dir, "manifest" + os.path.splitext(manifest)[1])
+        _minio_client().download_file(manifest[len(_MINIO):], local)
+        base = _MINIO + posixpath.dirname(manifest[len(_MINIO):])
+    else:
+        local = manifest
+        base = os.path.dirname(os.path.abspath(manifest))
+    with open(local, "r", encoding="utf-8-sig") as f:
+        text = f.read()
+
+    if manifest.endswith((".jsonl", ".ndjson")) or text.lstrip().startswith("{"):
+        rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+
+    items: List[BatchItem] = []
+    seen = set()
+    for n, row in enumerate(rows, 1):
+        item_id = str(row.get("id") or "").strip()
+        front = str(row.get("front") or "").strip()
+        side = str(row.get("side") or "").strip() or None
+        height = row.get("heightCm")
+        if not item_id or not front or height in (None, ""):
+            raise ValueError(f"Manifest row {n}: id, front and heightCm are required")
+        if not _ID_RE.match(item_id):
+            raise ValueError(f"Manifest row {n}: id {item_id!r} must be [A-Za-z0-9._-] (it names the artifact prefix)")
+        if item_id in seen:
+            raise ValueError(f"Manifest row {n}: duplicate id {item_id}")
+        seen.add(item_id)
+        items.append(BatchItem(item_id, _resolve(front, base), _resolve(side, base) if side else None, float(height)))
+    return items
+
+
+def load_progress(path: str) -> Dict[str, Dict[str, Any]]:
+    """Last recorded outcome per id (a truncated final line from an interrupted run is ignored)."""
+    records: Dict[str, Dict[str, Any]] = {}
+    if not os.path.isfile(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record["id"]] = record
+    return records
+
+
+def stage_inputs(item: BatchItem, inputs_root: str, minio=None) -> Dict[str, str]:
+    """Copy/download an item's photos to <inputs_root>/uploads/<id>/<view>.<ext>; returns view -> local path."""
+    paths = {}
+    for view, ref in (("front", item.front), ("side", item.side)):
+        if not ref:
+            continue
+        ext = os.path.splitext(ref)[1].lower() or ".jpg"
+        dest = os.path.join(inputs_root, "uploads", item.id, f"{view}{ext}")
+        if not os.path.isfile(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            partial = dest + ".partial"
+            if ref.startswith(_MINIO):
+                minio = minio or _minio_client()
+                minio.download_file(ref[len(_MINIO):], partial)
+            else:
+                shutil.copyfile(ref, partial)
+            os.replace(partial, dest)
+        paths[view] = dest
+    return paths
+
+
+def _job_data(item: BatchItem, staged: Dict[str, str], inputs_root: str) -> Dict[str, Any]:
+    def url(view: str) -> Optional[str]:
+        if view not in staged:
+            return None
+        return "batch://" + os.path.relpath(staged[view], inputs_root).replace(os.sep, "/")
+
+    return {
+        "jobId": item.id,
+        "type": "avatar_build",
+        "frontPhotoUrl": url("front"),
+        "sidePhotoUrl": url("side"),
+        "heightCm": item.height_cm,
+    }
+
+
+def _init_child(out_dir: str, upload: bool, threads: int) -> None:
+    """Pool initializer: CPU-only worker that loads PIXIE only if a job needs it (mesh rebuild after refinement)."""
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    os.environ["MODEL_PRELOAD"] = "measurer,masks"
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+
+    from worker import AvatarWorker
+
+    global _child_worker, _child_api
+    _child_api = CollectingAPIClient()
+    _child_worker = AvatarWorker(storage=_make_storage(out_dir, upload), api_client=_child_api)
+
+
+def _run_item(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one job (from its pixie checkpoint on) in a pool process."""
+    job_id = job["jobId"]
+    started = time.perf_counter()
+    ok = _child_worker.process_job(job)
+    final = _child_api.last.pop(job_id, {})
+    result = final.get("result") or {}
+    performance = (result.get("qualityReport") or {}).get("performance") or {}
+    return {
+        "id": job_id,
+        "status": "completed" if ok else "failed",
+        "error": None if ok else (final.get("error") or "job failed"),
+        "seconds": round(time.perf_counter() - started, 3),
+        "glbUrl": result.get("glbUrl"),
+        "measurements": result.get("measurements") or {},
+        "stages": {name: t["wallSeconds"] for name, t in performance.get("totals", {}).items()},
+    }
+
+
+def run_pixie_batch(worker, items: List[BatchItem], staged: Dict[str, Dict[str, str]], max_batch: int) -> Dict[str, str]:
+    """
+    PIXIE for the items without a pixie checkpoint; saves the checkpoints the pool resumes from.
+
+    Returns:
+        id -> error for items that must not continue (rejected by the input quality gate, or
+        placeholder output with REQUIRE_REAL_AVATAR)
+    """
+    from config import REQUIRE_REAL_AVATAR
+    from pipeline import instrumentation
+    from pipeline.appearance import estimate_skin_color_rgb
+    from pipeline.checkpoints import JobCheckpoints
+    from worker import NonRetryableJobError
+
+    errors: Dict[str, str] = {}
+    input_quality: Dict[str, Any] = {}
+    todo = []
+    for item in items:
+        if JobCheckpoints(worker.checkpoint_store, item.id).load("pixie") is not None:
+            continue
+        try:
+            input_quality[item.id] = worker.check_inputs(staged[item.id])
+        except NonRetryableJobError as e:
+            errors[item.id] = str(e)
+            continue
+        todo.append(item)
+    if not todo:
+        return errors
+
+    requests = [(staged[it.id]["front"], staged[it.id].get("side"), it.height_cm) for it in todo]
+    started = time.perf_counter()
+    with instrumentation.stage("pixie", subjects=len(todo)):
+        results = worker.pixie.process_images_batch(requests, max_batch=max_batch)
+    logger.info(f"PIXIE: {len(todo)} subjects in {time.perf_counter() - started:.1f}s")
+
+    for item, smplx_params in zip(todo, results):
+        if REQUIRE_REAL_AVATAR and smplx_params.get("placeholder"):
+            errors[item.id] = "PIXIE produced placeholder output (REQUIRE_REAL_AVATAR=true)"
+            continue
+        if input_quality[item.id] is not None:
+            smplx_params["inputQuality"] = input_quality[item.id]
+        skin_rgb = estimate_skin_color_rgb(staged[item.id]["front"])
+        JobCheckpoints(worker.checkpoint_store, item.id).save("pixie", {"smplx_params": smplx_params, "skin_rgb": skin_rgb})
+    return errors
+
+
+def write_results(path: str, items: Iterable[BatchItem], records: Dict[str, Dict[str, Any]]) -> None:
+    rows = [records[it.id] for it in items if it.id in records]
+    measurement_keys = sorted({k for r in rows for k in (r.get("measurements") or {})})
+    columns = ["id", "status", "error", "seconds", "glbUrl", *measurement_keys]
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for r in rows:
+            m = r.get("measurements") or {}
+            writer.writerow([r["id"], r["status"], r.get("error") or "", r.get("seconds", ""), r.get("glbUrl") or ""] + [m.get(k, "") for k in measurement_keys])
+    os.replace(tmp, path)
+
+
+def _chunks(items: List[BatchItem], size: int) -> Iterable[List[BatchItem]]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def run(args: argparse.Namespace) -> int:
+    out_dir = os.path.abspath(args.out)
+    inputs_root = os.path.join(out_dir, "inputs")
+    os.makedirs(inputs_root, exist_ok=True)
+
+    items = read_manifest(args.manifest, out_dir)
+    if args.limit:
+        items = items[: args.limit]
+    progress_path = os.path.join(out_dir, "progress.jsonl")
+    records = load_progress(progress_path)
+    pending = [
+        it
+        for it in items
+        if it.id not in records or (records[it.id]["status"] != "completed" and args.retry_failed)
+    ]
+    logger.info(f"{len(items)} rows, {len(items) - len(pending)} already done, {len(pending)} to process")
+
+    from worker import AvatarWorker
+
+    storage = _make_storage(out_dir, args.upload)
+    worker = AvatarWorker(load_models=False, storage=storage, api_client=CollectingAPIClient())
+    if worker.checkpoint_store is None:
+        raise RuntimeError("Checkpoint store unavailable; batch runs hand PIXIE results to the pool through it")
+    minio = _minio_client() if any(ref and ref.startswith(_MINIO) for it in pending for ref in (it.front, it.side)) else None
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    threads = max(1, cpus // args.workers)
+    max_in_flight = max(args.batch_size, 2 * args.workers)
+    completed = failed = 0
+
+    with open(progress_path, "a", encoding="utf-8") as progress, ThreadPoolExecutor(max_workers=8) as io_pool:
+
+        def record(result: Dict[str, Any]) -> None:
+            nonlocal completed, failed
+            records[result["id"]] = result
+            progress.write(json.dumps(result) + "\n")
+            progress.flush()
+            if result["status"] == "completed":
+                completed += 1
+                shutil.rmtree(os.path.join(inputs_root, "uploads", result["id"]), ignore_errors=True)
+            else:
+                failed += 1
+                logger.warning(f"{result['id']} failed: {result.get('error')}")
+            logger.info(f"Progress: {completed} completed, {failed} failed of {len(pending)}")
+
+        def drain(in_flight: set, until: int) -> set:
+            while len(in_flight) > until:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job_id = futures[future]
+                    try:
+                        record(future.result())
+                    except Exception as e:
+                        record({"id": job_id, "status": "failed", "error": f"worker process error: {e}", "measurements": {}})
+            return in_flight
+
+        ctx = multiprocessing.get_context("spawn")
+        pool = ProcessPoolExecutor(
+            max_workers=args.workers, mp_context=ctx, initializer=_init_child, initargs=(out_dir, args.upload, threads)
+        )
+        futures: Dict[Any, str] = {}
+        in_flight: set = set()
+        try:
+            for chunk in _chunks(pending, args.batch_size):
+                staged: Dict[str, Dict[str, str]] = {}
+                for item, paths in zip(chunk, io_pool.map(lambda it: _stage_or_error(it, inputs_root, minio), chunk)):
+                    if isinstance(paths, Exception):
+                        record({"id": item.id, "status": "failed", "error": f"input staging failed: {paths}", "measurements": {}})
+                    else:
+                        staged[item.id] = paths
+                ready = [it for it in chunk if it.id in staged]
+
+                errors = run_pixie_batch(worker, ready, staged, args.batch_size * 2)
+                for item in ready:
+                    if item.id in errors:
+                        record({"id": item.id, "status": "failed", "error": errors[item.id], "measurements": {}})
+                        continue
+                    future = pool.submit(_run_item, _job_data(item, staged[item.id], inputs_root))
+                    futures[future] = item.id
+                    in_flight.add(future)
+                # Keep PIXIE at most `max_in_flight` subjects ahead of the CPU stages.
+                in_flight = drain(in_flight, max_in_flight - args.batch_size)
+            drain(in_flight, 0)
+        except KeyboardInterrupt:
+            logger.warning("Interrupted; finished rows are recorded, re-run with the same --out to resume")
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            pool.shutdown(wait=True)
+            write_results(os.path.join(out_dir, "results.csv"), items, records)
+
+    logger.info(f"Done: {completed} completed, {failed} failed; results in {os.path.join(out_dir, 'results.csv')}")
+    return 0 if failed == 0 else 1
+
+
+def _stage_or_error(item: BatchItem, inputs_root: str, minio):
+    try:
+        return stage_inputs(item, inputs_root, minio)
+    except Exception as e:
+        return e
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--manifest", required=True, help="CSV / JSON-lines manifest (local path or minio://<object>)")
+    parser.add_argument("--out", required=True, help="run directory (progress, results, checkpoints, local artifacts)")
+    parser.add_argument("--upload", action="store_true", help="write artifacts to MINIO_BUCKET instead of <out>/artifacts")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="CPU-stage processes")
+    parser.add_argument("--batch-size", type=int, default=8, help="subjects per PIXIE batch")
+    parser.add_argument("--retry-failed", action="store_true", help="also re-run rows recorded as failed")
+    parser.add_argument("--limit", type=int, default=0, help="only the first N manifest rows")
+    args = parser.parse_args(argv)
+    args.workers = max(1, args.workers)
+    args.batch_size = max(1, args.batch_size)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    # Checkpoints live with the run so an interrupted batch resumes where it stopped. Set before
+    # anything imports config (children inherit the environment).
+    os.environ.setdefault("CHECKPOINT_DIR", os.path.join(os.path.abspath(args.out), "checkpoints"))
+    os.environ.setdefault("MAX_RETRIES", "1")
+    return run(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -9,6 +9,8 @@ import requests
 import logging
 from typing import Dict, Any, Optional
 
+from pipeline import tracing
+
 logger = logging.getLogger(__name__)
 
 
@@ -58,8 +60,11 @@ class APIClient:
                 payload["result"] = result
             
             logger.info(f"Updating job {job_id} status to: {status}")
-            response = self.session.patch(url, json=payload, timeout=10)
-            response.raise_for_status()
+            attributes = {"job.id": job_id, "job.status": status, "job.progress": progress, "http.method": "PATCH"}
+            with tracing.span("api.update_job_status", attributes) as span:
+                response = self.session.patch(url, json=payload, timeout=10, headers=tracing.inject_headers())
+                tracing.set_attributes(span, {"http.status_code": response.status_code})
+                response.raise_for_status()
             
             return True
             
@@ -99,8 +104,10 @@ class APIClient:
             }
             
             logger.info(f"Creating avatar for job {job_id}")
-            response = self.session.post(url, json=payload, timeout=10)
-            response.raise_for_status()
+            with tracing.span("api.create_avatar", {"job.id": job_id, "http.method": "POST"}) as span:
+                response = self.session.post(url, json=payload, timeout=10, headers=tracing.inject_headers())
+                tracing.set_attributes(span, {"http.status_code": response.status_code})
+                response.raise_for_status()
             
             data = response.json()
             return data.get("id")
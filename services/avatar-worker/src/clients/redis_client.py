@@ -7,30 +7,377 @@ This module handles Redis connection for job queue consumption.
 import redis
 import json
 import logging
-from typing import Dict, Any, Optional, Callable
+from typing import Dict, Any, Optional, Callable, Sequence, Tuple, Union
 import time
 import os
 import ssl
+import threading
+import uuid
 from urllib.parse import urlsplit, urlunsplit
 
+from clients.queue_scheduling import QueueScheduler, QueueSpec
+
 logger = logging.getLogger(__name__)
 
+# failedReason of a job the stalled check gives up on (BullMQ's wording).
+_STALLED_REASON = "job stalled more than allowable limit"
+
+
+# --- Lua scripts (BullMQ-compatible state moves) ------------------------------------------
+#
+# Key layout follows BullMQ: bull:<queue>:wait|active|stalled|stalled-check, job hash
+# bull:<queue>:<id> and job lock bull:<queue>:<id>:lock (value = worker token, PX = lock duration).
+
+# KEYS: active, job, lock   ARGV: jobId, token, lockDurationMs, nowMs
+# Lock a job that BRPOPLPUSH just moved into active and return its hash (flattened).
+# A job whose hash is gone (removed while waiting) is dropped from active and nil is returned.
+_LOCK_ACTIVE_JOB = """
+if redis.call("LPOS", KEYS[1], ARGV[1]) == false then
+  return nil
+end
+if redis.call("EXISTS", KEYS[2]) == 0 then
+  redis.call("LREM", KEYS[1], 0, ARGV[1])
+  return nil
+end
+redis.call("SET", KEYS[3], ARGV[2], "PX", tonumber(ARGV[3]))
+redis.call("HSET", KEYS[2], "processedOn", ARGV[4])
+redis.call("HINCRBY", KEYS[2], "attemptsStarted", 1)
+return redis.call("HGETALL", KEYS[2])
+"""
+
+# KEYS: per queue: wait, active
+# ARGV: token prefix, lockDurationMs, nowMs, intake, fairShare ("1"/"0"), then per queue: queueKeyPrefix
+# Returns: {queueIndex (1-based), jobId, flattened job hash...} or nil when every queue is empty
+#
+# Queues are tried in the order given (the worker's scheduler decides it). With fair share on,
+# each pop first moves up to `intake` of the oldest waiting jobs out of `wait` into per-tenant
+# FIFO lists (bull:<queue>:fair:<tenant>, tenant = data.tenantId, else data.userId). Tenants
+# with queued jobs sit in the fair-ready sorted set, scored by the start tag of their head job,
+# and the tenant with the smallest tag is served - start-time fair queueing: a tenant's tag is
+# max(virtual clock, its previous tag + 1), and the clock advances to the tag of each job
+# started. Picking among tenant heads instead of a window of `wait` means one tenant's 10k-job
+# import delays another tenant's job by at most ceil(backlog / intake) pops (until the job is
+# taken in) plus one. A single tenant stays FIFO. Without fair share, jobs a fair-share worker
+# left in the tenant lists are served first, then `wait` in order. The chosen job moves into
+# that queue's active list and is locked exactly like _LOCK_ACTIVE_JOB does.
+_POP_NEXT_JOB = """
+local nQueues = #KEYS / 2
+local intake = tonumber(ARGV[4])
+local fair = ARGV[5] == "1"
+
+local function tenantOf(jobKey)
+  local raw = redis.call("HGET", jobKey, "data")
+  if raw then
+    local ok, data = pcall(cjson.decode, raw)
+    if ok and type(data) == "table" then
+      local tenant = data["tenantId"] or data["userId"]
+      if tenant and tenant ~= cjson.null then
+        return tostring(tenant)
+      end
+    end
+  end
+  return "default"
+end
+
+local function claim(q, activeKey, prefix, jobId)
+  redis.call("LPUSH", activeKey, jobId)
+  local jobKey = prefix .. jobId
+  redis.call("SET", jobKey .. ":lock", ARGV[1] .. jobId, "PX", tonumber(ARGV[2]))
+  redis.call("HSET", jobKey, "processedOn", ARGV[3])
+  redis.call("HINCRBY", jobKey, "attemptsStarted", 1)
+  local result = {q, jobId}
+  for _, v in ipairs(redis.call("HGETALL", jobKey)) do
+    table.insert(result, v)
+  end
+  return result
+end
+
+for q = 1, nQueues do
+  local waitKey, activeKey, prefix = KEYS[2 * q - 1], KEYS[2 * q], ARGV[5 + q]
+  local fairClock, fairTags, fairReady = prefix .. "fair-clock", prefix .. "fair-tags", prefix .. "fair-ready"
+  local clock = tonumber(redis.call("GET", fairClock) or "0")
+
+  if fair then
+    -- Oldest jobs sit at the right end (producers LPUSH, consumers pop from the right).
+    for _ = 1, intake do
+      local jobId = redis.call("RPOP", waitKey)
+      if not jobId then
+        break
+      end
+      local jobKey = prefix .. jobId
+      if redis.call("EXISTS", jobKey) == 1 then
+        local tenant = tenantOf(jobKey)
+        redis.call("LPUSH", prefix .. "fair:" .. tenant, jobId)
+        if redis.call("ZSCORE", fairReady, tenant) == false then
+          local tag = math.max(clock, tonumber(redis.call("ZSCORE", fairTags, tenant) or "0"))
+          redis.call("ZADD", fairReady, tag, tenant)
+        end
+      end
+    end
+  end
+
+  -- Serve tenant heads (also drains lists left behind when fair share was switched off).
+  while true do
+    local head = redis.call("ZRANGE", fairReady, 0, 0, "WITHSCORES")
+    if #head == 0 then
+      break
+    end
+    local tenant, tag = head[1], math.max(clock, tonumber(head[2]))
+    local tenantKey = prefix .. "fair:" .. tenant
+    local jobId = redis.call("RPOP", tenantKey)
+    local more = redis.call("LLEN", tenantKey) > 0
+    if not more then
+      redis.call("ZREM", fairReady, tenant)
+    end
+    -- Jobs removed while waiting leave their id behind; skip them.
+    if jobId and redis.call("EXISTS", prefix .. jobId) == 1 then
+      redis.call("SET", fairClock, tostring(tag))
+      redis.call("ZADD", fairTags, tag + 1, tenant)
+      -- Tenants whose tag fell behind the clock would restart from the clock anyway.
+      redis.call("ZREMRANGEBYSCORE", fairTags, "-inf", "(" .. tag)
+      if more then
+        redis.call("ZADD", fairReady, tag + 1, tenant)
+      end
+      return claim(q, activeKey, prefix, jobId)
+    end
+  end
+
+  if not fair then
+    while true do
+      local jobId = redis.call("RPOP", waitKey)
+      if not jobId then
+        break
+      end
+      if redis.call("EXISTS", prefix .. jobId) == 1 then
+        return claim(q, activeKey, prefix, jobId)
+      end
+    end
+  end
+end
+return nil
+"""
+
+# KEYS: lock, stalled   ARGV: token, lockDurationMs, jobId
+_EXTEND_LOCK = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+  redis.call("PEXPIRE", KEYS[1], tonumber(ARGV[2]))
+  redis.call("SREM", KEYS[2], ARGV[3])
+  return 1
+end
+return 0
+"""
+
+# Shared Lua helpers for finished-job retention. Each call removes at most 1000 jobs so a
+# backlog of old entries is drained over several finishes instead of one long script.
+_TRIM_FINISHED_HELPERS = """
+local function removeJob(prefix, jobId)
+  redis.call("DEL", prefix .. jobId, prefix .. jobId .. ":logs", prefix .. jobId .. ":lock")
+end
+
+local function removeFromSet(setKey, prefix, ids)
+  for i = 1, #ids, 1000 do
+    local chunk = {unpack(ids, i, math.min(i + 999, #ids))}
+    for _, jobId in ipairs(chunk) do
+      removeJob(prefix, jobId)
+    end
+    redis.call("ZREM", setKey, unpack(chunk))
+  end
+end
+
+local function trimFinished(setKey, prefix, keepCount, keepAgeMs, now)
+  if keepAgeMs >= 0 then
+    local old = redis.call("ZRANGEBYSCORE", setKey, "-inf", now - keepAgeMs, "LIMIT", 0, 1000)
+    if #old > 0 then
+      removeFromSet(setKey, prefix, old)
+    end
+  end
+  if keepCount >= 0 then
+    local excess = redis.call("ZCARD", setKey) - keepCount
+    if excess > 0 then
+      removeFromSet(setKey, prefix, redis.call("ZRANGE", setKey, 0, math.min(excess, 1000) - 1))
+    end
+  end
+end
+
+local function jobOpts(jobKey)
+  local rawOpts = redis.call("HGET", jobKey, "opts")
+  if rawOpts then
+    local ok, decoded = pcall(cjson.decode, rawOpts)
+    if ok and type(decoded) == "table" then
+      return decoded
+    end
+  end
+  return {}
+end
+
+local function keepPolicy(opt, defaultCount, defaultAgeMs)
+  if opt == nil or opt == cjson.null then
+    return defaultCount, defaultAgeMs
+  end
+  if opt == true then
+    return 0, -1
+  end
+  if opt == false then
+    return -1, -1
+  end
+  if type(opt) == "number" then
+    return opt, -1
+  end
+  if type(opt) == "table" then
+    local age = tonumber(opt["age"])
+    return tonumber(opt["count"]) or -1, age and age * 1000 or -1
+  end
+  return defaultCount, defaultAgeMs
+end
+"""
+
+# KEYS: completed, failed   ARGV: nowMs
+# One-off migration: earlier workers kept completed/failed as lists. Convert them to the
+# BullMQ sorted sets (scored by now, since list entries carry no finish time).
+_MIGRATE_FINISHED_LISTS = """
+local migrated = 0
+for _, key in ipairs(KEYS) do
+  if redis.call("TYPE", key)["ok"] == "list" then
+    local ids = redis.call("LRANGE", key, 0, -1)
+    redis.call("DEL", key)
+    for i = 1, #ids, 1000 do
+      local args = {}
+      for j = i, math.min(i + 999, #ids) do
+        table.insert(args, ARGV[1])
+        table.insert(args, ids[j])
+      end
+      redis.call("ZADD", key, unpack(args))
+    end
+    migrated = migrated + #ids
+  end
+end
+return migrated
+"""
+
+# KEYS: active, target, job, lock, stalled, wait
+# ARGV: jobId, token, nowMs, field, value, retry ("1" = move back to wait if attempts remain),
+#       queueKeyPrefix, keepOptName ("removeOnComplete"/"removeOnFail"), defaultKeepCount, defaultKeepAgeMs
+# Returns: 1 finished, 2 re-queued for retry, -1 job missing, -2 lock not owned
+#
+# Finished jobs go into the completed/failed sorted set scored by finishedOn (as in BullMQ), and
+# the set is trimmed in the same script: by count and by age, following the job's
+# removeOnComplete/removeOnFail option (true | false | count | {count, age}) or the worker
+# defaults (-1 = unlimited). Trimmed jobs have their hashes deleted.
+_MOVE_TO_FINISHED = _TRIM_FINISHED_HELPERS + """
+if redis.call("EXISTS", KEYS[3]) == 0 then
+  redis.call("LREM", KEYS[1], 0, ARGV[1])
+  return -1
+end
+local owner = redis.call("GET", KEYS[4])
+if owner and owner ~= ARGV[2] then
+  return -2
+end
+if not owner and redis.call("LPOS", KEYS[1], ARGV[1]) == false then
+  return -2
+end
+redis.call("DEL", KEYS[4])
+redis.call("SREM", KEYS[5], ARGV[1])
+redis.call("LREM", KEYS[1], 0, ARGV[1])
+local attemptsMade = redis.call("HINCRBY", KEYS[3], "attemptsMade", 1)
+local opts = jobOpts(KEYS[3])
+if ARGV[6] == "1" then
+  local maxAttempts = tonumber(opts["attempts"]) or 1
+  if attemptsMade < maxAttempts then
+    redis.call("HSET", KEYS[3], ARGV[4], ARGV[5])
+    redis.call("LPUSH", KEYS[6], ARGV[1])
+    return 2
+  end
+end
+local keepCount, keepAgeMs = keepPolicy(opts[ARGV[8]], tonumber(ARGV[9]), tonumber(ARGV[10]))
+if keepCount == 0 then
+  removeJob(ARGV[7], ARGV[1])
+  return 1
+end
+redis.call("HSET", KEYS[3], ARGV[4], ARGV[5], "finishedOn", ARGV[3])
+redis.call("ZADD", KEYS[2], tonumber(ARGV[3]), ARGV[1])
+trimFinished(KEYS[2], ARGV[7], keepCount, keepAgeMs, tonumber(ARGV[3]))
+return 1
+"""
+
+# KEYS: stalled, active, wait, failed, stalledCheck
+# ARGV: queueKeyPrefix ("bull:<queue>:"), maxStalledCount, stalledIntervalMs, nowMs,
+#       defaultKeepFailedCount, defaultKeepFailedAgeMs, failedReason
+# Returns: {recovered ids..., "|", failed id, failed job data, ...}
+# Jobs still in `stalled` from the previous check had no lock renewal in between (their worker
+# died): move them back to wait (or to failed once they stalled too often, with the same
+# removeOnFail retention as _MOVE_TO_FINISHED). Then mark every currently active job as a stall
+# candidate; live workers clear the mark when renewing locks. Failed jobs come back with their
+# data so the caller can report them (their hash may already be trimmed).
+_MOVE_STALLED_JOBS_TO_WAIT = _TRIM_FINISHED_HELPERS + """
+if redis.call("SET", KEYS[5], ARGV[4], "PX", tonumber(ARGV[3]), "NX") == false then
+  return {}
+end
+local recovered = {}
+local failed = {}
+local stalling = redis.call("SMEMBERS", KEYS[1])
+for _, jobId in ipairs(stalling) do
+  local jobKey = ARGV[1] .. jobId
+  if redis.call("EXISTS", jobKey .. ":lock") == 0 then
+    local removed = redis.call("LREM", KEYS[2], 1, jobId)
+    if removed > 0 then
+      local stalledCount = redis.call("HINCRBY", jobKey, "stalledCounter", 1)
+      if stalledCount > tonumber(ARGV[2]) then
+        table.insert(failed, jobId)
+        table.insert(failed, redis.call("HGET", jobKey, "data") or "")
+        local keepCount, keepAgeMs = keepPolicy(jobOpts(jobKey)["removeOnFail"], tonumber(ARGV[5]), tonumber(ARGV[6]))
+        if keepCount == 0 then
+          removeJob(ARGV[1], jobId)
+        else
+          redis.call("HSET", jobKey, "failedReason", ARGV[7], "finishedOn", ARGV[4])
+          redis.call("ZADD", KEYS[4], tonumber(ARGV[4]), jobId)
+          trimFinished(KEYS[4], ARGV[1], keepCount, keepAgeMs, tonumber(ARGV[4]))
+        end
+      else
+        -- RPUSH: consumers pop from the right, so recovered jobs run next.
+        redis.call("RPUSH", KEYS[3], jobId)
+        table.insert(recovered, jobId)
+      end
+    end
+  end
+end
+redis.call("DEL", KEYS[1])
+local active = redis.call("LRANGE", KEYS[2], 0, -1)
+for i = 1, #active, 5000 do
+  redis.call("SADD", KEYS[1], unpack(active, i, math.min(i + 4999, #active)))
+end
+table.insert(recovered, "|")
+for _, item in ipairs(failed) do
+  table.insert(recovered, item)
+end
+return recovered
+"""
+
+
+def _as_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(float(value)) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
 
 class RedisClient:
     """Redis client for BullMQ job consumption"""
     
-    def __init__(self, redis_url: str):
+    def __init__(self, redis_url: str, client=None):
         """
         Initialize Redis client
         
         Args:
             redis_url: Redis connection URL (e.g., redis://localhost:6379)
+            client: Already-connected redis.Redis-compatible client (decode_responses=True) to use
+                instead of connecting to redis_url (load tests, in-process fakes)
         """
         self.redis_url = redis_url
-        self.client = None
+        self.client = client
         
         logger.info("Initializing Redis client: %s", self._redact_url(redis_url))
-        self._connect()
+        if self.client is None:
+            self._connect()
 
     @staticmethod
     def _redact_url(redis_url: str) -> str:
@@ -77,87 +424,302 @@ class RedisClient:
             logger.error(f"Failed to connect to Redis: {e}")
             raise
     
-    def consume_jobs(self, queue_name: str, job_handler: Callable[[Dict[str, Any]], bool], poll_interval: int = 1):
+    def _queue_keys(self, queue_name: str) -> Dict[str, str]:
+        prefix = f"bull:{queue_name}:"
+        return {
+            "prefix": prefix,
+            "wait": f"{prefix}wait",
+            "active": f"{prefix}active",
+            "completed": f"{prefix}completed",
+            "failed": f"{prefix}failed",
+            "stalled": f"{prefix}stalled",
+            "stalled_check": f"{prefix}stalled-check",
+        }
+
+    def check_stalled_jobs(
+        self,
+        queue_name: str,
+        max_stalled_count: int = 1,
+        stalled_interval_ms: int = 30000,
+        keep_failed: Tuple[int, int] = (-1, -1),
+        on_failed: Optional[Callable[[Dict[str, Any], str], None]] = None,
+    ) -> int:
         """
-        Consume jobs from BullMQ queue
-        
+        Run one BullMQ-style stalled-job check (at most once per interval across all workers)
+
         Args:
-            queue_name: Name of the queue to consume from
+            queue_name: Queue to check
+            max_stalled_count: Stalls allowed before a job is moved to failed
+            stalled_interval_ms: Minimum time between checks
+            keep_failed: Default (count, age seconds) retention for failed jobs, as in consume_jobs
+            on_failed: Called with (job data, reason) for each job moved to failed, so its owner
+                can be told (nothing else reports a job whose worker died)
+
+        Returns:
+            Number of jobs moved back to wait
+        """
+        keys = self._queue_keys(queue_name)
+        keep_count, keep_age_s = keep_failed
+        result = self._move_stalled(
+            keys=[keys["stalled"], keys["active"], keys["wait"], keys["failed"], keys["stalled_check"]],
+            args=[
+                keys["prefix"],
+                int(max_stalled_count),
+                int(stalled_interval_ms),
+                int(time.time() * 1000),
+                int(keep_count),
+                int(keep_age_s) * 1000 if keep_age_s >= 0 else -1,
+                _STALLED_REASON,
+            ],
+        )
+        if not result:
+            return 0
+        split = result.index("|")
+        recovered, failed = result[:split], result[split + 1 :]
+        if recovered:
+            logger.warning(f"Recovered {len(recovered)} stalled job(s) on {queue_name}: {', '.join(recovered)}")
+        failed_ids = failed[0::2]
+        if failed_ids:
+            logger.error(f"Failed {len(failed_ids)} job(s) on {queue_name} that stalled too often: {', '.join(failed_ids)}")
+        if on_failed is not None:
+            for job_id, raw_data in zip(failed[0::2], failed[1::2]):
+                try:
+                    job_data = json.loads(raw_data) if raw_data else {}
+                    on_failed(job_data if isinstance(job_data, dict) else {}, _STALLED_REASON)
+                except Exception as e:
+                    logger.error(f"Failed to report stalled job {job_id}: {e}")
+        return len(recovered)
+
+    def _register_scripts(self):
+        self._lock_active = self.client.register_script(_LOCK_ACTIVE_JOB)
+        self._extend_lock = self.client.register_script(_EXTEND_LOCK)
+        self._move_to_finished = self.client.register_script(_MOVE_TO_FINISHED)
+        self._move_stalled = self.client.register_script(_MOVE_STALLED_JOBS_TO_WAIT)
+        self._migrate_finished = self.client.register_script(_MIGRATE_FINISHED_LISTS)
+        self._pop_next = self.client.register_script(_POP_NEXT_JOB)
+
+    def consume_jobs(
+        self,
+        queues: Union[str, Sequence[QueueSpec]],
+        job_handler: Callable[[Dict[str, Any]], bool],
+        poll_interval: int = 1,
+        lock_duration_ms: int = 30000,
+        stalled_interval_ms: int = 30000,
+        max_stalled_count: int = 1,
+        keep_completed: Tuple[int, int] = (-1, -1),
+        keep_failed: Tuple[int, int] = (-1, -1),
+        scheduling: str = "weighted",
+        fair_share: bool = True,
+        fair_share_intake: int = 1000,
+        on_stalled_failure: Optional[Callable[[Dict[str, Any], str], None]] = None,
+    ):
+        """
+        Consume jobs from one or more BullMQ queues
+
+        Follows BullMQ's worker protocol: every active job holds a lock (renewed by a heartbeat
+        thread every lock_duration/2), state moves run as Lua scripts, and a periodic stalled
+        check moves jobs whose worker died (lock expired) back to wait.
+
+        With several queues, a QueueScheduler orders them for each pop (strict priority or
+        weighted round-robin) and one Lua script takes the first available job in that order,
+        applying per-tenant fair share within the queue. A popped job always lands in its own
+        queue's active list. When every queue is empty the worker blocks on the first listed
+        queue (the interactive one), so lower queues are picked up within `poll_interval`.
+
+        Args:
+            queues: Queue name, or QueueSpecs in priority order
             job_handler: Function to handle each job (returns True if successful)
             poll_interval: Seconds to wait between polls
+            lock_duration_ms: Job lock TTL
+            stalled_interval_ms: How often stalled jobs are checked for
+            max_stalled_count: Stalls allowed before a job is moved to failed
+            keep_completed: Default (count, age seconds) retention for completed jobs (-1 = unlimited);
+                a job's own removeOnComplete option takes precedence
+            keep_failed: Same for failed jobs / removeOnFail
+            scheduling: "weighted" or "priority" (see clients.queue_scheduling)
+            fair_share: Serve waiting jobs from per-tenant FIFOs, least-served tenant first
+            fair_share_intake: How many of the oldest waiting jobs each pop moves into the
+                per-tenant FIFOs (bounds the work of one pop; a backlog is taken in over
+                ceil(backlog / intake) pops)
+            on_stalled_failure: Called with (job data, reason) for each job the stalled check
+                moves to failed
         """
-        logger.info(f"Starting job consumption from queue: {queue_name}")
-        
-        # BullMQ queue keys
-        wait_key = f"bull:{queue_name}:wait"
-        active_key = f"bull:{queue_name}:active"
-        completed_key = f"bull:{queue_name}:completed"
-        failed_key = f"bull:{queue_name}:failed"
-        
-        while True:
-            try:
-                # Move job from wait to active (BRPOPLPUSH with timeout)
-                job_id = self.client.brpoplpush(wait_key, active_key, timeout=poll_interval)
-                
-                if not job_id:
-                    continue
-                
-                logger.info(f"Processing job: {job_id}")
-                
-                # Get job data (BullMQ stored jobs as Hash)
-                job_key = f"bull:{queue_name}:{job_id}"
-                job_hash = self.client.hgetall(job_key)
-                
-                if not job_hash:
-                    logger.error(f"Job data not found for {job_id}")
-                    self.client.lrem(active_key, 1, job_id)
-                    continue
-
-                logger.info(f"Raw job data keys: {job_hash.keys()}")
-                if 'data' in job_hash:
-                    logger.info(f"Job Data content: {job_hash['data']}")
-                
-                # Parse job data
+        specs = [QueueSpec(queues)] if isinstance(queues, str) else list(queues)
+        scheduler = QueueScheduler(specs, scheduling)
+        all_keys = {spec.name: self._queue_keys(spec.name) for spec in specs}
+        logger.info(
+            "Starting job consumption from queue(s): "
+            + ", ".join(f"{spec.name} (weight {spec.weight})" for spec in specs)
+            + f" [scheduling={scheduling}, fair_share={fair_share}]"
+        )
+
+        self._register_scripts()
+
+        for queue_name, keys in all_keys.items():
+            migrated = self._migrate_finished(keys=[keys["completed"], keys["failed"]], args=[int(time.time() * 1000)])
+            if migrated:
+                logger.info(f"Migrated {migrated} finished job id(s) on {queue_name} from lists to sorted sets")
+
+        worker_id = uuid.uuid4().hex
+        current: Dict[str, Optional[str]] = {"queue": None, "job_id": None, "token": None}
+        current_lock = threading.Lock()
+        stop = threading.Event()
+
+        def heartbeat():
+            renew_every = max(0.5, lock_duration_ms / 2000.0)
+            next_renew = time.monotonic() + renew_every
+            next_stalled_check = time.monotonic()
+            while not stop.wait(min(renew_every, 1.0)):
+                now = time.monotonic()
                 try:
-                    # BullMQ stores data in 'data' field, but sometimes it might be in root if not wrapped?
-                    # Check if 'data' exists, otherwise try to use the whole hash or look for specific fields
-                    if 'data' in job_hash:
-                        job_data_str = job_hash['data']
-                        job_data = json.loads(job_data_str) if job_data_str else {}
-                    else:
-                         # Fallback: maybe it's not wrapped? Or updated BullMQ version?
-                         # For now, let's assume empty and log warning
-                         logger.warning(f"No 'data' field in job hash for {job_id}")
-                         job_data = {}
-                except json.JSONDecodeError as e:
-                    logger.error(f"Failed to parse job data JSON: {e}")
-                    self.client.lrem(active_key, 1, job_id)
-                    continue
-                
-                # Process job
+                    if now >= next_renew:
+                        next_renew = now + renew_every
+                        with current_lock:
+                            queue_name, job_id, token = current["queue"], current["job_id"], current["token"]
+                        if job_id and token:
+                            keys = all_keys[queue_name]
+                            renewed = self._extend_lock(
+                                keys=[f"{keys['prefix']}{job_id}:lock", keys["stalled"]],
+                                args=[token, int(lock_duration_ms), job_id],
+                            )
+                            if not renewed:
+                                logger.warning(f"Lost lock for job {job_id}; it may be picked up by another worker")
+                    if now >= next_stalled_check:
+                        next_stalled_check = now + stalled_interval_ms / 1000.0
+                        for queue_name in all_keys:
+                            self.check_stalled_jobs(
+                                queue_name, max_stalled_count, stalled_interval_ms, keep_failed, on_stalled_failure
+                            )
+                except Exception as e:
+                    logger.warning(f"Queue heartbeat error: {e}")
+
+        heartbeat_thread = threading.Thread(target=heartbeat, name="bullmq-heartbeat", daemon=True)
+        heartbeat_thread.start()
+
+        def finish(queue_name: str, job_id: str, token: str, success: bool, reason: str = "") -> None:
+            keys = all_keys[queue_name]
+            if success:
+                target, field, value, retry = keys["completed"], "returnvalue", "true", "0"
+                keep_opt, (keep_count, keep_age_s) = "removeOnComplete", keep_completed
+            else:
+                target, field, value, retry = keys["failed"], "failedReason", reason or "job failed", "1"
+                keep_opt, (keep_count, keep_age_s) = "removeOnFail", keep_failed
+            outcome = self._move_to_finished(
+                keys=[keys["active"], target, f"{keys['prefix']}{job_id}", f"{keys['prefix']}{job_id}:lock", keys["stalled"], keys["wait"]],
+                args=[
+                    job_id,
+                    token,
+                    int(time.time() * 1000),
+                    field,
+                    value,
+                    retry,
+                    keys["prefix"],
+                    keep_opt,
+                    int(keep_count),
+                    int(keep_age_s) * 1000 if keep_age_s >= 0 else -1,
+                ],
+            )
+            if outcome == 1:
+                logger.info(f"Job {job_id} {'completed successfully' if success else 'failed'}")
+            elif outcome == 2:
+                logger.warning(f"Job {job_id} failed; re-queued (attempts remaining)")
+            elif outcome == -2:
+                logger.warning(f"Job {job_id} finished but its lock is held by another worker; not moving it")
+            else:
+                logger.error(f"Job {job_id} vanished before it could be finished")
+
+        def pop_next() -> Optional[Tuple[str, str, Dict[str, str]]]:
+            order = scheduler.order()
+            flat = self._pop_next(
+                keys=[key for name in order for key in (all_keys[name]["wait"], all_keys[name]["active"])],
+                args=[
+                    f"{worker_id}:",
+                    int(lock_duration_ms),
+                    int(time.time() * 1000),
+                    max(1, int(fair_share_intake)),
+                    "1" if fair_share else "0",
+                    *[all_keys[name]["prefix"] for name in order],
+                ],
+            )
+            if not flat:
+                return None
+            queue_name, job_id = order[int(flat[0]) - 1], flat[1]
+            return queue_name, job_id, dict(zip(flat[2::2], flat[3::2]))
+
+        def wait_for_job() -> Optional[Tuple[str, str, Dict[str, str]]]:
+            # Block on the first listed queue; lower queues are re-polled after the timeout.
+            queue_name = specs[0].name
+            keys = all_keys[queue_name]
+            job_id = self.client.brpoplpush(keys["wait"], keys["active"], timeout=poll_interval)
+            if not job_id:
+                return None
+            # Lock it atomically with reading its hash. If we crash before this, the job sits
+            # unlocked in active and the stalled check returns it to wait.
+            job_key = f"{keys['prefix']}{job_id}"
+            flat = self._lock_active(
+                keys=[keys["active"], job_key, f"{job_key}:lock"],
+                args=[job_id, f"{worker_id}:{job_id}", int(lock_duration_ms), int(time.time() * 1000)],
+            )
+            if not flat:
+                logger.error(f"Job data not found for {job_id}")
+                return None
+            return queue_name, job_id, dict(zip(flat[0::2], flat[1::2]))
+
+        try:
+            while True:
                 try:
-                    success = job_handler(job_data)
-                    
-                    if success:
-                        # Move to completed
-                        self.client.lrem(active_key, 1, job_id)
-                        self.client.lpush(completed_key, job_id)
-                        logger.info(f"Job {job_id} completed successfully")
-                    else:
-                        # Move to failed
-                        self.client.lrem(active_key, 1, job_id)
-                        self.client.lpush(failed_key, job_id)
-                        logger.error(f"Job {job_id} failed")
-                        
+                    popped = pop_next() or wait_for_job()
+                    if not popped:
+                        continue
+
+                    queue_name, job_id, job_hash = popped
+                    token = f"{worker_id}:{job_id}"
+                    scheduler.served(queue_name)
+
+                    logger.info(f"Processing job: {job_id} (queue {queue_name})")
+
+                    with current_lock:
+                        current["queue"], current["job_id"], current["token"] = queue_name, job_id, token
+
+                    # Parse job data
+                    try:
+                        if 'data' in job_hash:
+                            job_data_str = job_hash['data']
+                            job_data = json.loads(job_data_str) if job_data_str else {}
+                        else:
+                            logger.warning(f"No 'data' field in job hash for {job_id}")
+                            job_data = {}
+                    except json.JSONDecodeError as e:
+                        logger.error(f"Failed to parse job data JSON: {e}")
+                        finish(queue_name, job_id, token, False, f"invalid job data: {e}")
+                        continue
+
+                    # Queue metadata for the handler (tracing records the queue wait from it)
+                    if isinstance(job_data, dict):
+                        job_data["_queue"] = {
+                            "name": queue_name,
+                            "jobId": job_id,
+                            "timestamp": _as_int(job_hash.get("timestamp")),
+                            "delay": _as_int(job_hash.get("delay")),
+                        }
+
+                    # Process job
+                    try:
+                        success = job_handler(job_data)
+                        finish(queue_name, job_id, token, bool(success), "" if success else "job handler reported failure")
+                    except Exception as e:
+                        logger.error(f"Error processing job {job_id}: {e}", exc_info=True)
+                        finish(queue_name, job_id, token, False, str(e))
+                    finally:
+                        with current_lock:
+                            current["queue"], current["job_id"], current["token"] = None, None, None
+
+                except KeyboardInterrupt:
+                    logger.info("Job consumption interrupted")
+                    break
                 except Exception as e:
-                    logger.error(f"Error processing job {job_id}: {e}", exc_info=True)
-                    # Move to failed
-                    self.client.lrem(active_key, 1, job_id)
-                    self.client.lpush(failed_key, job_id)
-                    
-            except KeyboardInterrupt:
-                logger.info("Job consumption interrupted")
-                break
-            except Exception as e:
-                logger.error(f"Error in job consumption loop: {e}", exc_info=True)
-                time.sleep(poll_interval)
+                    logger.error(f"Error in job consumption loop: {e}", exc_info=True)
+                    time.sleep(poll_interval)
+        finally:
+            stop.set()
+            heartbeat_thread.join(timeout=5)
@@ -48,8 +48,31 @@ MINIO_SECURE = os.getenv("MINIO_SECURE", "false").lower() == "true"
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:3001")
 
 # Model paths
-SMPLX_MODEL_DIR = os.getenv("SMPLX_MODEL_DIR", _DEFAULT_SMPLX_DIR if os.path.isdir(_DEFAULT_SMPLX_DIR) else "/app/models/smplx")
+# Synced model volume (model_sync.py downloads into <MODELS_ROOT>/<source>/...).
+MODELS_ROOT = os.getenv("MODEL_SYNC_LOCAL_ROOT", "").strip() or "/app/models"
+
+
+def resolve_model_path(env_name: str, source: str, *parts: str, default: str = "", marker: str = "") -> str:
+    """
+    Single resolver for model asset locations: an explicit env override wins, then the synced
+    volume (<MODELS_ROOT>/<source>/<parts>, used only if it exists and contains `marker` when
+    given), then `default`. Loaders read assets in place from whatever this returns.
+    """
+    override = os.getenv(env_name, "").strip() if env_name else ""
+    if override:
+        return override
+    synced = os.path.join(MODELS_ROOT, source, *parts)
+    if os.path.exists(os.path.join(synced, marker) if marker else synced):
+        return synced
+    return default
+
+
+SMPLX_MODEL_DIR = resolve_model_path("SMPLX_MODEL_DIR", "smplx", default=_DEFAULT_SMPLX_DIR)
 PIXIE_MODEL_DIR = os.getenv("PIXIE_MODEL_DIR", _DEFAULT_PIXIE_DIR if os.path.isdir(_DEFAULT_PIXIE_DIR) else "/app/models/pixie")
+# PIXIE's data dir (pixie_model.tar, SMPL-X/FLAME assets); PIXIERunner points PIXIE's config here.
+PIXIE_DATA_DIR = resolve_model_path(
+    "PIXIE_DATA_DIR", "pixie", default=os.path.join(_DEFAULT_PIXIE_DIR, "data"), marker="pixie_model.tar"
+)
 
 # Processing configuration
 MAX_RETRIES = int(os.getenv("MAX_RETRIES", "3"))
@@ -61,11 +84,134 @@ GLTFPACK_PATH = _normalize_windows_dotenv_path(os.getenv("GLTFPACK_PATH", "gltfp
 # Optional fit-accuracy refinement (Option A: masks + silhouette targets -> refine betas)
 SAM3DBODY_ENABLED = os.getenv("SAM3DBODY_ENABLED", "false").lower() == "true"
 SAM3DBODY_REPO_DIR = os.getenv("SAM3DBODY_REPO_DIR", "").strip() or None
-SAM3DBODY_CHECKPOINT_PATH = os.getenv("SAM3DBODY_CHECKPOINT_PATH", "").strip()
-SAM3DBODY_MHR_PATH = os.getenv("SAM3DBODY_MHR_PATH", "").strip()
+SAM3DBODY_CHECKPOINT_PATH = resolve_model_path("SAM3DBODY_CHECKPOINT_PATH", "sam3d", "model.ckpt")
+SAM3DBODY_MHR_PATH = resolve_model_path("SAM3DBODY_MHR_PATH", "sam3d", "assets", "mhr_model.pt")
 SAM3DBODY_USE_MASK = os.getenv("SAM3DBODY_USE_MASK", "true").lower() == "true"
 SAM3DBODY_DETECTOR_PATH = os.getenv("SAM3DBODY_DETECTOR_PATH", "").strip()
 SAM3DBODY_SEGMENTOR_PATH = os.getenv("SAM3DBODY_SEGMENTOR_PATH", "").strip()
 SAM3DBODY_FOV_PATH = os.getenv("SAM3DBODY_FOV_PATH", "").strip()
+# The SAM2 segmentor only looks for checkpoints inside its repo (<segmentor path>/checkpoints), so
+# model_sync.py links the synced checkpoints there (MODEL_MATERIALIZE_MODE: auto tries reflink,
+# then hardlink, then symlink; "copy" forces a copy).
+SAM2_CHECKPOINTS_DIR = resolve_model_path("SAM2_CHECKPOINTS_DIR", "sam2", "checkpoints")
+MODEL_MATERIALIZE_MODE = os.getenv("MODEL_MATERIALIZE_MODE", "auto").strip().lower() or "auto"
 SILHOUETTE_REFINE_ENABLED = os.getenv("SILHOUETTE_REFINE_ENABLED", "true").lower() == "true"
 SILHOUETTE_TORSO_ERODE_PX = int(os.getenv("SILHOUETTE_TORSO_ERODE_PX", "8"))
+# Solver budget for fitting betas to the silhouette targets (BetaRefineConfig.max_nfev).
+BETA_REFINE_MAX_NFEV = int(os.getenv("BETA_REFINE_MAX_NFEV", "40"))
+
+# Pre-inference input quality gate (pipeline/input_quality.py): enforce | flag | off.
+# "enforce" fails jobs with an INPUT_QUALITY_FAIL_ON issue before PIXIE runs; "flag" (default)
+# only fails unreadable photos. Every other issue is added to the quality report's warnings.
+# The sharpness/exposure thresholds are uncalibrated: check them against real uploads
+# (benchmarks/eval_grid.py) before enforcing blurry/too_dark/too_bright.
+INPUT_QUALITY_GATE = os.getenv("INPUT_QUALITY_GATE", "flag").strip().lower()
+INPUT_QUALITY_FAIL_ON = [c.strip() for c in os.getenv("INPUT_QUALITY_FAIL_ON", "unreadable").split(",") if c.strip()]
+INPUT_QUALITY_MIN_SHARPNESS = float(os.getenv("INPUT_QUALITY_MIN_SHARPNESS", "40"))
+INPUT_QUALITY_DETECT_PEOPLE = os.getenv("INPUT_QUALITY_DETECT_PEOPLE", "true").lower() == "true"
+
+# Content-addressed result cache (skip stages whose inputs are unchanged on resubmission).
+# Bump PIPELINE_VERSION whenever a stage's output for the same inputs would change.
+PIPELINE_VERSION = os.getenv("PIPELINE_VERSION", "1").strip() or "1"
+# Stamped into quality_report.json ("measurementVersion"). Bump whenever MeasurementExtractor's
+# output for the same body changes (mapping, SMPL-Anthropometry upgrade), then run src/remeasure.py.
+MEASUREMENT_VERSION = os.getenv("MEASUREMENT_VERSION", "1").strip() or "1"
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "").strip() or os.path.join(_SERVICE_ROOT, ".cache", "results")
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "2048"))
+RESULT_CACHE_REMOTE_ENABLED = os.getenv("RESULT_CACHE_REMOTE_ENABLED", "false").lower() == "true"
+RESULT_CACHE_REMOTE_PREFIX = os.getenv("RESULT_CACHE_REMOTE_PREFIX", "cache").strip().strip("/") or "cache"
+RESULT_CACHE_REMOTE_TTL_DAYS = int(os.getenv("RESULT_CACHE_REMOTE_TTL_DAYS", "30"))
+
+# Retries + resumable stage checkpoints (MAX_RETRIES above = retries after the first attempt).
+RETRY_BACKOFF_SECONDS = float(os.getenv("RETRY_BACKOFF_SECONDS", "2"))
+RETRY_BACKOFF_MAX_SECONDS = float(os.getenv("RETRY_BACKOFF_MAX_SECONDS", "60"))
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", "").strip() or os.path.join(_SERVICE_ROOT, ".cache", "checkpoints")
+CHECKPOINT_MAX_MB = int(os.getenv("CHECKPOINT_MAX_MB", "1024"))
+CHECKPOINT_REMOTE_ENABLED = os.getenv("CHECKPOINT_REMOTE_ENABLED", "false").lower() == "true"
+# Remote checkpoints are deleted when their job completes; this lifecycle expiry catches the
+# ones of jobs that failed for good (0 disables).
+CHECKPOINT_REMOTE_TTL_DAYS = int(os.getenv("CHECKPOINT_REMOTE_TTL_DAYS", "7"))
+
+# Deadlines (PROCESSING_TIMEOUT above is the per-attempt budget). JOB_TIMEOUT bounds a job across
+# all attempts and backoffs (<= 0: unbounded); a retry is only started while at least
+# RETRY_MIN_BUDGET_SECONDS of it would remain after the backoff.
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", str(2 * PROCESSING_TIMEOUT)))
+RETRY_MIN_BUDGET_SECONDS = float(os.getenv("RETRY_MIN_BUDGET_SECONDS", "60"))
+# Optional stages (masks + refinement) must leave this much time for measure/export/upload...
+DEADLINE_RESERVE_SECONDS = float(os.getenv("DEADLINE_RESERVE_SECONDS", "30"))
+# ...and are skipped entirely when less than this remains for them.
+REFINE_MIN_BUDGET_SECONDS = float(os.getenv("REFINE_MIN_BUDGET_SECONDS", "20"))
+GLTFPACK_TIMEOUT_SECONDS = float(os.getenv("GLTFPACK_TIMEOUT_SECONDS", "120"))
+
+# BullMQ worker protocol (job locks, heartbeat, stalled-job recovery).
+# A job whose worker dies is returned to wait within roughly lock duration + stalled interval.
+QUEUE_LOCK_DURATION_MS = int(os.getenv("QUEUE_LOCK_DURATION_MS", "30000"))
+QUEUE_STALLED_INTERVAL_MS = int(os.getenv("QUEUE_STALLED_INTERVAL_MS", "30000"))
+QUEUE_MAX_STALLED_COUNT = int(os.getenv("QUEUE_MAX_STALLED_COUNT", "1"))
+
+# Finished-job retention (BullMQ removeOnComplete/removeOnFail defaults; -1 = unlimited).
+# A job's own removeOnComplete/removeOnFail option takes precedence.
+QUEUE_KEEP_COMPLETED_COUNT = int(os.getenv("QUEUE_KEEP_COMPLETED_COUNT", "1000"))
+QUEUE_KEEP_COMPLETED_AGE_SECONDS = int(os.getenv("QUEUE_KEEP_COMPLETED_AGE_SECONDS", "86400"))
+QUEUE_KEEP_FAILED_COUNT = int(os.getenv("QUEUE_KEEP_FAILED_COUNT", "5000"))
+QUEUE_KEEP_FAILED_AGE_SECONDS = int(os.getenv("QUEUE_KEEP_FAILED_AGE_SECONDS", "604800"))
+
+# Queues consumed by this worker: "name[:weight],..." in priority order (first = interactive;
+# the worker blocks on it while idle). QUEUE_SCHEDULING=weighted (round-robin by weight) or
+# priority (strict, listed order). Fair share moves waiting jobs into per-tenant FIFOs (job data
+# tenantId), QUEUE_FAIR_SHARE_INTAKE of the oldest per pop, and serves the least-served tenant.
+WORKER_QUEUES = os.getenv("WORKER_QUEUES", "avatar_build:10,avatar_backfill:1")
+QUEUE_SCHEDULING = os.getenv("QUEUE_SCHEDULING", "weighted").strip().lower()
+QUEUE_FAIR_SHARE_ENABLED = os.getenv("QUEUE_FAIR_SHARE_ENABLED", "true").lower() == "true"
+QUEUE_FAIR_SHARE_INTAKE = int(os.getenv("QUEUE_FAIR_SHARE_INTAKE", "1000"))
+
+# Pre-fork supervisor: load models once, fork WORKER_PROCESSES consumers sharing the weights
+# copy-on-write (1 = single process, no supervisor; N > 1 is CPU only). Torch/OpenCV threads
+# per process default to cores / WORKER_PROCESSES.
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))
+WORKER_THREADS_PER_PROCESS = int(os.getenv("WORKER_THREADS_PER_PROCESS", "0"))
+
+# Startup / readiness. Models load in the background while the queue connection is set up, then
+# each model runs one warm-up inference. /readyz (READINESS_PORT, 0 = off) returns 200 and the
+# Redis key <READINESS_REDIS_PREFIX>:<host>:<pid> exists only once the worker can take jobs.
+MODEL_WARMUP_ENABLED = os.getenv("MODEL_WARMUP_ENABLED", "true").lower() == "true"
+READINESS_PORT = int(os.getenv("READINESS_PORT", "8081"))
+READINESS_REDIS_ENABLED = os.getenv("READINESS_REDIS_ENABLED", "true").lower() == "true"
+READINESS_REDIS_PREFIX = os.getenv("READINESS_REDIS_PREFIX", "avatar-worker:ready")
+READINESS_REDIS_TTL_SECONDS = int(os.getenv("READINESS_REDIS_TTL_SECONDS", "30"))
+
+# Per-stage instrumentation (wall/CPU time, peak RSS, accelerator memory) is attached to every
+# job's quality report; with METRICS_ENABLED it is also exported as Prometheus histograms on
+# READINESS_PORT/metrics (needs prometheus_client).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# On-demand profiling: jobs with `"profile": true` in their data (or a mode name), plus this fraction
+# of all jobs, are profiled and the output uploaded to avatars/<jobId>/profile/ (see pipeline/profiling.py).
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_MODE = os.getenv("PROFILING_MODE", "sampling").strip().lower() or "sampling"
+PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "5"))
+PROFILING_TORCH_ENABLED = os.getenv("PROFILING_TORCH_ENABLED", "true").lower() == "true"
+
+# Distributed tracing (needs opentelemetry-sdk): continues the trace context in the job data and
+# emits spans for queue wait, stages, MinIO/API calls and gltfpack. none | console | file | otlp |
+# module:factory (OTLP endpoint/headers come from the standard OTEL_EXPORTER_OTLP_* variables).
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").strip() or "none"
+TRACING_FILE_PATH = os.getenv("TRACING_FILE_PATH", "").strip() or os.path.join(_SERVICE_ROOT, ".cache", "traces.jsonl")
+TRACING_SAMPLE_RATIO = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "avatar-worker").strip() or "avatar-worker"
+
+# Memory-mapped weights: checkpoints load with torch.load(mmap=True) and SMPL-X npz/pkl assets are
+# served from one-time .npy conversions in MODEL_MMAP_DIR; CPU model weights are re-homed onto
+# mmap'd snapshots so processes on a node share them via the page cache. Put MODEL_MMAP_DIR on
+# the models volume to keep conversions across restarts. Opt-in: the loaders are only hooked
+# while the models load (pipeline.mmap_weights.loading).
+MODEL_MMAP_ENABLED = os.getenv("MODEL_MMAP_ENABLED", "false").lower() == "true"
+MODEL_MMAP_DIR = os.getenv("MODEL_MMAP_DIR", "").strip() or os.path.join(_SERVICE_ROOT, ".cache", "mmap")
+
+# Model residency: models listed in MODEL_PRELOAD (pixie, measurer, masks) load at startup, the
+# rest on first use. MODEL_MEMORY_BUDGETS ("cpu=6000,cuda=10000", MB; empty = unlimited) caps the
+# resident footprint per device; least-recently-used models are offloaded/evicted and reloaded
+# on their next use.
+MODEL_PRELOAD = [n.strip() for n in os.getenv("MODEL_PRELOAD", "pixie,measurer,masks").split(",") if n.strip()]
+MODEL_MEMORY_BUDGETS = os.getenv("MODEL_MEMORY_BUDGETS", "")
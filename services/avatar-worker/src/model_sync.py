@@ -6,22 +6,46 @@ Goal: avoid manual SCP/rsync into RunPod volumes.
 If enabled, this script downloads required model assets from a private MinIO bucket
 into `/app/models/*` (typically a mounted RunPod Network Volume).
 
-It is intentionally conservative:
-- only downloads files that are missing locally
 - downloads by prefix (smplx/, pixie/, sam3d/, sam2/) so you can "mirror" folders into MinIO
+- files download concurrently; large files as ranged multipart GETs into a `.partial` file
+  whose completed parts are tracked, so an interrupted download resumes where it stopped
+- every download is verified (SHA-256 from the published manifest / object metadata,
+  otherwise the MD5 ETag of single-part uploads) before it replaces the destination
+- a local manifest (`.model_sync.json`) records what was synced: when the bucket publishes a
+  manifest revision (see infra/runpod/upload_models_to_minio.py) and it matches, the whole
+  tree is skipped without listing or stat-ing anything; otherwise unchanged files are
+  recognized by ETag/size from the listing alone
+- loaders read the synced volume in place (paths come from config.resolve_model_path); the
+  few assets a vendored repo only looks for inside itself (SAM2 checkpoints) are materialized
+  there as reflinks/hardlinks/symlinks, never copies
 """
 
 from __future__ import annotations
 
+import errno
+import fcntl
+import hashlib
+import json
 import logging
 import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Dict, List, Optional
 
 from minio import Minio
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger("model_sync")
 
+LOCAL_MANIFEST = ".model_sync.json"
+REMOTE_MANIFEST = "manifest.json"
+_MD5_ETAG = re.compile(r"^[0-9a-f]{32}$")
+_FICLONE = 0x40049409  # ioctl(dest_fd, FICLONE, src_fd): copy-on-write clone (btrfs, XFS, overlayfs on them)
+
 
 def env_bool(name: str, default: str = "false") -> bool:
     return os.getenv(name, default).strip().lower() in {"1", "true", "yes", "on"}
@@ -31,36 +55,410 @@ def env_str(name: str, default: str = "") -> str:
     return os.getenv(name, default).strip()
 
 
+def env_int(name: str, default: int) -> int:
+    value = env_str(name)
+    return int(value) if value else default
+
+
 def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
 
 
-def download_prefix(client: Minio, bucket: str, remote_prefix: str, local_root: Path) -> int:
-    downloaded = 0
-    remote_prefix = remote_prefix.lstrip("/")
-    if remote_prefix and not remote_prefix.endswith("/"):
-        remote_prefix += "/"
+@dataclass
+class RemoteFile:
+    object_name: str
+    rel: str  # path relative to the local base, e.g. "smplx/SMPLX_NEUTRAL.npz"
+    size: int
+    etag: str = ""
+    sha256: str = ""
+
+
+def file_digest(path: Path, algorithm: str = "sha256", chunk_size: int = 8 * 1024 * 1024) -> str:
+    h = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_local_manifest(base: Path) -> Dict:
+    try:
+        with open(base / LOCAL_MANIFEST, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict) and isinstance(data.get("files"), dict):
+            return data
+    except Exception:
+        pass
+    return {"revision": None, "files": {}}
 
-    ensure_dir(local_root)
 
-    logger.info(f"Syncing s3://{bucket}/{remote_prefix} -> {local_root}")
-    for obj in client.list_objects(bucket, prefix=remote_prefix, recursive=True):
+def save_local_manifest(base: Path, manifest: Dict) -> None:
+    tmp = base / f"{LOCAL_MANIFEST}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, base / LOCAL_MANIFEST)
+
+
+def fetch_remote_manifest(client: Minio, bucket: str, prefix_root: str, revision: str = "") -> Optional[Dict]:
+    """The manifest published by the uploader (latest, or a pinned revision), if any."""
+    root = f"{prefix_root}/" if prefix_root else ""
+    name = f"{root}manifests/{revision}.json" if revision else f"{root}{REMOTE_MANIFEST}"
+    response = None
+    try:
+        response = client.get_object(bucket, name)
+        data = json.loads(response.read().decode("utf-8"))
+        return data if isinstance(data, dict) and isinstance(data.get("files"), dict) else None
+    except Exception:
+        if revision:
+            raise
+        return None
+    finally:
+        if response is not None:
+            response.close()
+            response.release_conn()
+
+
+def list_remote_files(client: Minio, bucket: str, prefix_root: str, name: str) -> List[RemoteFile]:
+    remote_prefix = f"{prefix_root}/{name}".strip("/") + "/"
+    files = []
+    for obj in client.list_objects(bucket, prefix=remote_prefix, recursive=True, include_user_meta=True):
         if obj.is_dir:
             continue
-        rel = obj.object_name[len(remote_prefix) :] if obj.object_name.startswith(remote_prefix) else obj.object_name
-        dest = local_root / rel
-        if dest.exists() and dest.is_file() and dest.stat().st_size == obj.size:
-            continue
+        meta = {k.lower(): v for k, v in (obj.metadata or {}).items()}
+        files.append(
+            RemoteFile(
+                object_name=obj.object_name,
+                rel=f"{name}/{obj.object_name[len(remote_prefix):]}",
+                size=int(obj.size or 0),
+                etag=(obj.etag or "").strip('"'),
+                sha256=meta.get("x-amz-meta-sha256", "") or meta.get("sha256", ""),
+            )
+        )
+    return files
+
+
+def _verify(path: Path, remote: RemoteFile) -> None:
+    size = path.stat().st_size
+    if size != remote.size:
+        raise IOError(f"size mismatch for {remote.rel}: {size} != {remote.size}")
+    if remote.sha256:
+        digest = file_digest(path, "sha256")
+        if digest != remote.sha256:
+            raise IOError(f"SHA-256 mismatch for {remote.rel}")
+    elif _MD5_ETAG.match(remote.etag):
+        if file_digest(path, "md5") != remote.etag:
+            raise IOError(f"ETag (MD5) mismatch for {remote.rel}")
+    else:
+        logger.warning(f"No checksum available for {remote.rel} (multipart ETag, no SHA-256); size checked only")
+
+
+class Downloader:
+    """Resumable single/multipart downloads into `<dest>.partial` + `<dest>.partial.json`."""
+
+    def __init__(self, client: Minio, bucket: str, part_size: int, multipart_threshold: int, part_concurrency: int):
+        self.client = client
+        self.bucket = bucket
+        self.part_size = part_size
+        self.multipart_threshold = multipart_threshold
+        self.part_concurrency = part_concurrency
+
+    def _read_range(self, object_name: str, offset: int, length: int, write) -> None:
+        response = self.client.get_object(self.bucket, object_name, offset=offset, length=length)
+        try:
+            for chunk in response.stream(1024 * 1024):
+                write(chunk)
+        finally:
+            response.close()
+            response.release_conn()
+
+    def download(self, remote: RemoteFile, dest: Path) -> None:
         ensure_dir(dest.parent)
-        logger.info(f"Downloading {obj.object_name} ({obj.size} bytes) -> {dest}")
-        client.fget_object(bucket, obj.object_name, str(dest))
-        downloaded += 1
-    return downloaded
+        partial = dest.with_name(dest.name + ".partial")
+        state_path = dest.with_name(dest.name + ".partial.json")
+        identity = remote.sha256 or remote.etag
+
+        state = {}
+        if partial.exists() and state_path.exists():
+            try:
+                state = json.loads(state_path.read_text(encoding="utf-8"))
+            except Exception:
+                state = {}
+        if state.get("identity") != identity or state.get("size") != remote.size:
+            # Different (or unknown) remote version: start over.
+            partial.unlink(missing_ok=True)
+            state = {"identity": identity, "size": remote.size, "partSize": self.part_size, "done": []}
+        state_lock = threading.Lock()
+
+        def save_state() -> None:
+            tmp = state_path.with_name(state_path.name + ".tmp")
+            tmp.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(tmp, state_path)
+
+        if remote.size >= self.multipart_threshold:
+            part_size = int(state.get("partSize") or self.part_size)
+            n_parts = (remote.size + part_size - 1) // part_size
+            todo = [i for i in range(n_parts) if i not in set(state["done"])]
+            if len(todo) < n_parts:
+                logger.info(f"Resuming {remote.rel}: {n_parts - len(todo)}/{n_parts} part(s) already downloaded")
+            save_state()
+            fd = os.open(partial, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                os.ftruncate(fd, remote.size)
+
+                def fetch(index: int) -> None:
+                    pos = index * part_size
+
+                    def write(chunk: bytes) -> None:
+                        nonlocal pos
+                        os.pwrite(fd, chunk, pos)
+                        pos += len(chunk)
+
+                    self._read_range(remote.object_name, index * part_size, min(part_size, remote.size - index * part_size), write)
+                    with state_lock:
+                        state["done"].append(index)
+                        save_state()
+
+                with ThreadPoolExecutor(max_workers=self.part_concurrency) as pool:
+                    for future in as_completed([pool.submit(fetch, i) for i in todo]):
+                        future.result()
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        else:
+            offset = partial.stat().st_size if partial.exists() else 0
+            if offset > remote.size:
+                partial.unlink()
+                offset = 0
+            save_state()
+            if offset < remote.size:
+                if offset:
+                    logger.info(f"Resuming {remote.rel} at byte {offset}")
+                with open(partial, "ab") as f:
+                    self._read_range(remote.object_name, offset, remote.size - offset, f.write)
+            elif remote.size == 0:
+                partial.touch()
+
+        try:
+            _verify(partial, remote)
+        except Exception:
+            partial.unlink(missing_ok=True)
+            state_path.unlink(missing_ok=True)
+            raise
+        os.replace(partial, dest)
+        state_path.unlink(missing_ok=True)
+
+
+def sync(
+    client: Minio,
+    bucket: str,
+    prefix_root: str,
+    sources: List[str],
+    base: Path,
+    concurrency: int = 8,
+    part_size: int = 32 * 1024 * 1024,
+    multipart_threshold: int = 64 * 1024 * 1024,
+    part_concurrency: int = 4,
+    verify_local: bool = False,
+    revision: str = "",
+) -> int:
+    """
+    Sync `sources` (top-level prefixes) into `base`.
+
+    Returns:
+        Number of files downloaded
+
+    Raises:
+        RuntimeError: If any file failed to download or verify
+    """
+    ensure_dir(base)
+    local = load_local_manifest(base)
+    remote_manifest = fetch_remote_manifest(client, bucket, prefix_root, revision)
+
+    if remote_manifest is not None:
+        remote_revision = str(remote_manifest.get("revision") or "")
+        if (
+            remote_revision
+            and remote_revision == local.get("revision")
+            and sorted(sources) == sorted(local.get("sources") or [])
+            and not verify_local
+        ):
+            logger.info(f"Model tree already at revision {remote_revision}; nothing to do.")
+            return 0
+        root = f"{prefix_root}/" if prefix_root else ""
+        remote_files = [
+            RemoteFile(
+                object_name=f"{root}{rel}",
+                rel=rel,
+                size=int(entry.get("size", 0)),
+                etag=str(entry.get("etag", "")),
+                sha256=str(entry.get("sha256", "")),
+            )
+            for rel, entry in remote_manifest["files"].items()
+            if rel.split("/", 1)[0] in sources
+        ]
+        logger.info(f"Using published manifest revision {remote_revision or '?'} ({len(remote_files)} file(s))")
+    else:
+        remote_revision = ""
+        remote_files = []
+        for name in sources:
+            logger.info(f"Listing s3://{bucket}/{prefix_root}/{name}/".replace("//", "/"))
+            remote_files.extend(list_remote_files(client, bucket, prefix_root, name))
+
+    def up_to_date(remote: RemoteFile) -> bool:
+        dest = base / remote.rel
+        known = local["files"].get(remote.rel)
+        identity_match = known is not None and known.get("size") == remote.size and (
+            (remote.sha256 and known.get("sha256") == remote.sha256) or (remote.etag and known.get("etag") == remote.etag)
+        )
+        if identity_match and not verify_local:
+            return True
+        if not dest.is_file() or dest.stat().st_size != remote.size:
+            return False
+        if identity_match:
+            return True
+        # Present but unknown to the manifest (older sync): trust it only if a checksum agrees.
+        try:
+            _verify(dest, remote)
+            return True
+        except Exception:
+            return False
+
+    pending = [r for r in remote_files if not up_to_date(r)]
+    pending_rels = {r.rel for r in pending}
+    for r in remote_files:
+        if r.rel not in pending_rels:
+            local["files"][r.rel] = {"size": r.size, "etag": r.etag, "sha256": r.sha256}
+
+    total_bytes = sum(r.size for r in pending)
+    logger.info(f"{len(pending)} of {len(remote_files)} file(s) to download ({total_bytes / 1e6:.0f} MB)")
+
+    downloader = Downloader(client, bucket, part_size, multipart_threshold, part_concurrency)
+    failures = []
+    manifest_lock = threading.Lock()
+
+    def run(remote: RemoteFile) -> None:
+        last_error = None
+        for attempt in range(2):
+            try:
+                logger.info(f"Downloading {remote.object_name} ({remote.size} bytes) -> {base / remote.rel}")
+                downloader.download(remote, base / remote.rel)
+                with manifest_lock:
+                    local["files"][remote.rel] = {"size": remote.size, "etag": remote.etag, "sha256": remote.sha256}
+                    save_local_manifest(base, {**local, "revision": None})
+                return
+            except Exception as e:
+                last_error = e
+                logger.warning(f"Download of {remote.rel} failed (attempt {attempt + 1}): {e}")
+        raise RuntimeError(f"{remote.rel}: {last_error}")
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = [pool.submit(run, r) for r in pending]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                failures.append(str(e))
+
+    if failures:
+        save_local_manifest(base, {**local, "revision": None})
+        raise RuntimeError(f"{len(failures)} file(s) failed to sync: {'; '.join(failures[:5])}")
+
+    local["revision"] = remote_revision or None
+    local["sources"] = sorted(sources)
+    save_local_manifest(base, local)
+    return len(pending)
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+
+
+def _link_file(src: Path, dst: Path, mode: str) -> str:
+    """Materialize `src` at `dst` without copying its bytes; returns the method used."""
+    methods = {
+        "auto": ["reflink", "hardlink", "symlink"],
+        "reflink": ["reflink"],
+        "hardlink": ["hardlink"],
+        "symlink": ["symlink"],
+        "copy": ["copy"],
+    }.get(mode)
+    if methods is None:
+        raise ValueError(f"Unknown MODEL_MATERIALIZE_MODE: {mode}")
+
+    tmp = dst.with_name(f".{dst.name}.materialize")
+    last_error: Optional[Exception] = None
+    for method in methods:
+        try:
+            tmp.unlink(missing_ok=True)
+            if method == "reflink":
+                _reflink(src, tmp)
+            elif method == "hardlink":
+                os.link(src, tmp)
+            elif method == "symlink":
+                os.symlink(src.resolve(), tmp)
+            else:
+                shutil.copy2(src, tmp)
+            os.replace(tmp, dst)
+            return method
+        except OSError as e:
+            last_error = e
+            tmp.unlink(missing_ok=True)
+            # EXDEV/EPERM/EOPNOTSUPP/ENOTTY/EINVAL: this method is unsupported here; try the next one.
+            if e.errno not in {errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EMLINK}:
+                raise
+    raise last_error or OSError(f"Could not materialize {src} -> {dst}")
+
+
+def materialize_dir(src_dir: Path, dst_dir: Path, mode: str = "auto") -> int:
+    """
+    Make every file under `src_dir` available under `dst_dir` (same relative paths) without copying.
+
+    Files already pointing at the same data (same inode, or a symlink to the source) are left alone.
+
+    Returns:
+        Number of files (re)materialized
+    """
+    if not src_dir.is_dir() or src_dir.resolve() == dst_dir.resolve():
+        return 0
+    count = 0
+    used: Dict[str, int] = {}
+    for src in sorted(p for p in src_dir.rglob("*") if p.is_file() and not p.name.endswith((".partial", ".partial.json"))):
+        dst = dst_dir / src.relative_to(src_dir)
+        ensure_dir(dst.parent)
+        try:
+            if dst.exists() and os.path.samefile(src, dst):
+                continue
+        except OSError:
+            pass
+        method = _link_file(src, dst, mode)
+        used[method] = used.get(method, 0) + 1
+        count += 1
+    if count:
+        summary = ", ".join(f"{n} {m}" for m, n in sorted(used.items()))
+        logger.info(f"Materialized {src_dir} -> {dst_dir} ({summary})")
+    return count
+
+
+def materialize_assets() -> None:
+    """Expose synced assets at the vendor paths that cannot be pointed at the volume directly."""
+    from config import MODEL_MATERIALIZE_MODE, SAM2_CHECKPOINTS_DIR, SAM3DBODY_SEGMENTOR_PATH
+
+    segmentor_repo = SAM3DBODY_SEGMENTOR_PATH or "/app/vendors/sam2"
+    if SAM2_CHECKPOINTS_DIR and os.path.isdir(segmentor_repo):
+        materialize_dir(Path(SAM2_CHECKPOINTS_DIR), Path(segmentor_repo) / "checkpoints", MODEL_MATERIALIZE_MODE)
 
 
 def main() -> int:
     if not env_bool("MODEL_SYNC_ENABLED", "false"):
         logger.info("MODEL_SYNC_ENABLED is false; skipping model sync.")
+        try:
+            materialize_assets()
+        except Exception as e:
+            logger.warning(f"Could not materialize model assets: {e}")
         return 0
 
     endpoint = env_str("MODEL_SYNC_MINIO_ENDPOINT")
@@ -68,7 +466,7 @@ def main() -> int:
     secret_key = env_str("MODEL_SYNC_MINIO_SECRET_KEY")
     bucket = env_str("MODEL_SYNC_MINIO_BUCKET", "trifitted-models")
     secure = env_bool("MODEL_SYNC_MINIO_SECURE", "true")
-    prefix_root = env_str("MODEL_SYNC_PREFIX", "").lstrip("/")
+    prefix_root = env_str("MODEL_SYNC_PREFIX", "").strip("/")
 
     if not endpoint or not access_key or not secret_key:
         logger.error("MODEL_SYNC_ENABLED=true but MODEL_SYNC_MINIO_* credentials are not fully set.")
@@ -81,13 +479,30 @@ def main() -> int:
     client = Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=secure)
 
     base = Path(env_str("MODEL_SYNC_LOCAL_ROOT", "/app/models"))
-    total_downloaded = 0
-    for name in sources:
-        remote = f"{prefix_root}/{name}".strip("/")
-        local = base / name
-        total_downloaded += download_prefix(client, bucket=bucket, remote_prefix=remote, local_root=local)
+    try:
+        downloaded = sync(
+            client,
+            bucket=bucket,
+            prefix_root=prefix_root,
+            sources=sources,
+            base=base,
+            concurrency=env_int("MODEL_SYNC_CONCURRENCY", 8),
+            part_size=env_int("MODEL_SYNC_PART_SIZE_MB", 32) * 1024 * 1024,
+            multipart_threshold=env_int("MODEL_SYNC_MULTIPART_THRESHOLD_MB", 64) * 1024 * 1024,
+            part_concurrency=env_int("MODEL_SYNC_PART_CONCURRENCY", 4),
+            verify_local=env_bool("MODEL_SYNC_VERIFY", "false"),
+            revision=env_str("MODEL_SYNC_REVISION"),
+        )
+    except Exception as e:
+        logger.error(f"Model sync failed: {e}")
+        return 1
 
-    logger.info(f"Model sync complete; downloaded {total_downloaded} file(s).")
+    logger.info(f"Model sync complete; downloaded {downloaded} file(s).")
+    try:
+        materialize_assets()
+    except Exception as e:
+        logger.error(f"Could not materialize model assets: {e}")
+        return 1
     return 0
 
 
@@ -0,0 +1,11 @@
+"""
+avatar_params.json: the compact, canonical avatar description persisted next to avatar.glb
+
+It holds the betas, PIXIE codes, height, confidence, sources and skin color of an avatar, so
+its meshes can be rebuilt (pose / height / LOD changes) or re-measured without rerunning the
+photos through PIXIE. Kept free of heavy imports: src/remeasure.py's worker processes read it.
+"""
+
+AVATAR_PARAMS_FILENAME = "avatar_params.json"
+# 2: adds pixieCodes (full PIXIE shape/expression codes + jaw), so rebuilds reproduce the original body
+AVATAR_PARAMS_VERSION = 2
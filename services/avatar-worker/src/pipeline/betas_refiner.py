@@ -14,6 +14,8 @@ from typing import Dict, Optional
 
 import numpy as np
 
+from pipeline import instrumentation
+
 logger = logging.getLogger(__name__)
 
 
@@ -26,6 +28,10 @@ class BetaRefineConfig:
     weight_reg: float = 0.08
 
 
+class _BudgetExhausted(Exception):
+    pass
+
+
 def _as_betas10(betas: np.ndarray) -> np.ndarray:
     b = np.asarray(betas, dtype=np.float32).reshape(-1)
     if b.size < 10:
@@ -40,12 +46,14 @@ def refine_betas_to_targets(
     height_cm: float,
     targets: Dict[str, float],
     config: Optional[BetaRefineConfig] = None,
+    deadline=None,
 ) -> np.ndarray:
     """
     Refine 10D betas to match target circumferences (cm) derived from silhouettes.
 
     measurement_extractor: instance of MeasurementExtractor (services/avatar-worker/src/pipeline/measurements.py)
     targets: expects keys chestCm/waistCm/hipCm
+    deadline: optional Deadline; when it expires mid-solve, the best betas evaluated so far are returned
     """
     cfg = config or BetaRefineConfig()
 
@@ -69,7 +77,12 @@ def refine_betas_to_targets(
             "hipCm": float(m.get("hipCm") or 0.0) * s,
         }
 
+    best = {"x": init.copy(), "cost": np.inf, "evaluations": 0}
+
     def residuals(x: np.ndarray) -> np.ndarray:
+        if deadline is not None and deadline.expired():
+            raise _BudgetExhausted()
+        best["evaluations"] += 1  # includes finite-difference Jacobian evaluations
         pred = predict(_as_betas10(x))
         res = []
         if "chestCm" in targets:
@@ -81,13 +94,27 @@ def refine_betas_to_targets(
 
         # regularize betas towards 0 (and towards init a bit) to avoid implausible shapes
         res.extend(((x - init) * cfg.weight_reg).tolist())
-        return np.asarray(res, dtype=np.float64)
+        r = np.asarray(res, dtype=np.float64)
+
+        cost = 0.5 * float(np.dot(r, r))
+        if cost < best["cost"]:
+            best["x"] = np.asarray(x, dtype=np.float32).copy()
+            best["cost"] = cost
+        return r
 
     # keep betas bounded; typical SMPL-X betas are around [-3, 3]
     bounds = (-4.0 * np.ones(10), 4.0 * np.ones(10))
-    result = least_squares(residuals, init, bounds=bounds, max_nfev=cfg.max_nfev)
+    try:
+        result = least_squares(residuals, init, bounds=bounds, max_nfev=cfg.max_nfev)
+    except _BudgetExhausted:
+        instrumentation.annotate(evaluations=int(best["evaluations"]), stoppedAtDeadline=True)
+        logger.warning("Beta refinement stopped at deadline; using best betas so far (cost=%.4f)", float(best["cost"]))
+        return _as_betas10(best["x"])
 
     refined = _as_betas10(result.x)
+    instrumentation.annotate(
+        nfev=int(result.nfev), evaluations=int(best["evaluations"]), cost=float(result.cost), success=bool(result.success)
+    )
     logger.info(
         "Beta refinement: success=%s cost=%.4f nfev=%s",
         bool(result.success),
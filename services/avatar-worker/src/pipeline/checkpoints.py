@@ -0,0 +1,139 @@
+"""
+Job-scoped stage checkpoints.
+
+Each completed stage of a job (PIXIE, refinement, measurement, export, upload) saves its
+output under a key derived from (job id, stage). When a job is retried after a transient
+failure, it resumes from the last completed stage instead of re-running inference.
+
+Storage is a ResultCache (local directory, optionally mirrored to MinIO so another pod can
+resume the job). Values are stored as JSON plus an .npz of their numpy arrays (loaded with
+allow_pickle=False), never pickled: a checkpoint fetched from the bucket is data, not code.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_NAMESPACE = "checkpoints"
+_VALUE_FILE = "value.json"
+_ARRAYS_FILE = "arrays.npz"
+# A JSON object standing in for a numpy array: {"__ndarray__": <name in arrays.npz>}
+_ARRAY_REF = "__ndarray__"
+
+# Stages of an avatar build, in pipeline order.
+STAGES = ("pixie", "shape", "measure", "export", "upload")
+
+
+def _encode(value: Any, arrays: Dict[str, Any]) -> Any:
+    """Make a value JSON-serializable, moving numpy arrays into `arrays` (tuples become lists)."""
+    import numpy as np
+
+    if isinstance(value, np.ndarray):
+        name = f"a{len(arrays)}"
+        arrays[name] = value
+        return {_ARRAY_REF: name}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(k): _encode(v, arrays) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v, arrays) for v in value]
+    return value
+
+
+def _decode(value: Any, arrays) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and _ARRAY_REF in value:
+            return arrays[value[_ARRAY_REF]]
+        return {k: _decode(v, arrays) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v, arrays) for v in value]
+    return value
+
+
+class JobCheckpoints:
+    """Stage checkpoints for a single job"""
+
+    def __init__(self, store, job_id: str):
+        """
+        Args:
+            store: ResultCache used as the backing store (None disables checkpointing)
+            job_id: Job ID the checkpoints belong to
+        """
+        self.store = store
+        self.job_id = job_id
+
+    def _key(self, stage: str) -> str:
+        return self.store.key("checkpoint", self.job_id, stage)
+
+    def load(self, stage: str) -> Optional[Any]:
+        """Return the saved value of a completed stage, or None."""
+        if self.store is None:
+            return None
+        entry_dir = self.store.get_dir(_NAMESPACE, self._key(stage))
+        if entry_dir is None or not os.path.isfile(os.path.join(entry_dir, _VALUE_FILE)):
+            return None
+        try:
+            import numpy as np
+
+            with open(os.path.join(entry_dir, _VALUE_FILE), "r", encoding="utf-8") as f:
+                encoded = json.load(f)
+            arrays_path = os.path.join(entry_dir, _ARRAYS_FILE)
+            if os.path.isfile(arrays_path):
+                with np.load(arrays_path, allow_pickle=False) as npz:
+                    arrays = {name: npz[name] for name in npz.files}
+            else:
+                arrays = {}
+            value = _decode(encoded, arrays)
+            logger.info(f"Job {self.job_id}: resuming from '{stage}' checkpoint")
+            return value
+        except Exception as e:
+            logger.warning(f"Job {self.job_id}: unreadable '{stage}' checkpoint ({e}); recomputing")
+            return None
+
+    def save(self, stage: str, value: Any) -> None:
+        """Persist a stage's output (best-effort)."""
+        if self.store is None:
+            return
+        try:
+            import numpy as np
+
+            arrays: Dict[str, Any] = {}
+            encoded = _encode(value, arrays)
+            with tempfile.TemporaryDirectory() as tmp:
+                files = {_VALUE_FILE: os.path.join(tmp, _VALUE_FILE)}
+                with open(files[_VALUE_FILE], "w", encoding="utf-8") as f:
+                    json.dump(encoded, f)
+                if arrays:
+                    files[_ARRAYS_FILE] = os.path.join(tmp, _ARRAYS_FILE)
+                    np.savez(files[_ARRAYS_FILE], **arrays)
+                self.store.put_files(_NAMESPACE, self._key(stage), files)
+        except Exception as e:
+            logger.warning(f"Job {self.job_id}: failed to checkpoint '{stage}': {e}")
+
+    def load_file(self, stage: str, name: str) -> Optional[str]:
+        """Return the path of a file saved by a completed stage, or None."""
+        if self.store is None:
+            return None
+        path = self.store.get_file(_NAMESPACE, self._key(stage), name)
+        if path is not None:
+            logger.info(f"Job {self.job_id}: resuming from '{stage}' checkpoint")
+        return path
+
+    def save_file(self, stage: str, name: str, path: str) -> None:
+        if self.store is None:
+            return
+        self.store.put_files(_NAMESPACE, self._key(stage), {name: path})
+
+    def clear(self) -> None:
+        """Drop this job's checkpoints, local and remote (called once the job completes)."""
+        if self.store is None:
+            return
+        for stage in STAGES:
+            self.store.delete(_NAMESPACE, self._key(stage), remote=True)
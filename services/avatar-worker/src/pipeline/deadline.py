@@ -0,0 +1,72 @@
+"""
+Job deadlines
+
+A job-level Deadline (JOB_TIMEOUT) bounds a job across all its attempts. Each attempt runs
+against a child of it capped at PROCESSING_TIMEOUT, which is passed down to every stage. Compute stages check it cooperatively (between PIXIE views, GrabCut iterations and
+least-squares evaluations), subprocesses get the remaining time as a hard timeout, and
+optional stages (silhouette refinement) are skipped or cut short when the budget runs low.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(RuntimeError):
+    """Raised when a job exceeds its processing budget."""
+
+
+class Deadline:
+    """Monotonic-clock deadline (None = unbounded)"""
+
+    def __init__(self, seconds: Optional[float] = None):
+        """
+        Args:
+            seconds: Budget in seconds from now; None or <= 0 means no deadline
+        """
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + float(seconds) if seconds and seconds > 0 else math.inf
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def has_budget(self, seconds: float) -> bool:
+        """True if at least `seconds` remain."""
+        return self.remaining() >= seconds
+
+    def check(self, stage: str = "") -> None:
+        """Raise DeadlineExceeded if the deadline has passed."""
+        if self.expired():
+            where = f" during {stage}" if stage else ""
+            raise DeadlineExceeded(f"Processing timeout exceeded{where} after {self.elapsed():.1f}s")
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """
+        Remaining time as a subprocess timeout (seconds), optionally capped. None when unbounded.
+        """
+        remaining = self.remaining()
+        if cap is not None:
+            remaining = min(remaining, float(cap))
+        if math.isinf(remaining):
+            return None
+        return max(0.0, remaining)
+
+    def child(self, reserve_seconds: float = 0.0, budget: Optional[float] = None) -> "Deadline":
+        """
+        A deadline that ends `reserve_seconds` earlier, leaving time for later mandatory stages,
+        and, given a `budget` > 0, no later than `budget` seconds from now.
+        """
+        sub = Deadline()
+        sub.started_at = self.started_at
+        sub.expires_at = self.expires_at - float(reserve_seconds)
+        if budget and budget > 0:
+            sub.expires_at = min(sub.expires_at, time.monotonic() + float(budget))
+        return sub
@@ -0,0 +1,265 @@
+"""
+Pre-inference input quality gate.
+
+Cheap checks on downscaled copies of the job photos, run before PIXIE so that photos which
+cannot produce a usable avatar fail fast with reasons the user can act on:
+
+- sharpness: 90th percentile of per-tile Laplacian variance (robust to plain backgrounds)
+- exposure: mean luma and the fractions of crushed / blown-out pixels
+- person presence: OpenCV's HOG people detector (no person / several people)
+- framing: head or feet cut off by the frame edge, person too small in the frame
+
+JPEGs are decoded at reduced resolution (IMREAD_REDUCED_COLOR_4) and people are detected at
+256 px, so a view typically costs a few tens of milliseconds on CPU. Every problem is reported as an issue with a code; the caller
+decides which codes fail the job and which are only flagged in the quality report.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ISSUE_CODES = (
+    "unreadable",
+    "blurry",
+    "too_dark",
+    "too_bright",
+    "no_person",
+    "multiple_people",
+    "head_cropped",
+    "feet_cropped",
+    "person_too_small",
+)
+
+# HOG's 64x128 training window keeps ~1/8 of its height free above the head and below the feet.
+_HOG_PAD = 0.125
+_HOG_MIN_WINDOW = 128
+
+_hog = None
+_hog_missing_logged = False
+
+
+@dataclass
+class InputQualityConfig:
+    analysis_side: int = 640
+    detection_side: int = 256
+    tiles: int = 8
+    min_sharpness: float = 40.0
+    min_brightness: float = 40.0
+    max_brightness: float = 225.0
+    max_clipped_fraction: float = 0.4
+    detect_people: bool = True
+    min_person_score: float = 0.5
+    min_person_height: float = 0.4
+    edge_margin: float = 0.01
+
+
+@dataclass
+class QualityIssue:
+    code: str
+    view: str
+    message: str
+
+    def to_dict(self) -> dict:
+        return {"code": self.code, "view": self.view, "message": self.message}
+
+
+@dataclass
+class ViewQuality:
+    view: str
+    sharpness: float = 0.0
+    brightness: float = 0.0
+    dark_fraction: float = 0.0
+    bright_fraction: float = 0.0
+    people: Optional[int] = None
+    person_box: Optional[Tuple[float, float, float, float]] = None
+    issues: List[QualityIssue] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "sharpness": round(self.sharpness, 1),
+            "brightness": round(self.brightness, 1),
+            "darkFraction": round(self.dark_fraction, 3),
+            "brightFraction": round(self.bright_fraction, 3),
+            "people": self.people,
+            "personBox": [round(v, 3) for v in self.person_box] if self.person_box else None,
+            "issues": [issue.code for issue in self.issues],
+        }
+
+
+@dataclass
+class InputQualityReport:
+    views: Dict[str, ViewQuality]
+    seconds: float
+
+    @property
+    def issues(self) -> List[QualityIssue]:
+        return [issue for view in self.views.values() for issue in view.issues]
+
+    def blocking(self, fail_on: List[str]) -> List[QualityIssue]:
+        return [issue for issue in self.issues if issue.code in fail_on]
+
+    def to_dict(self) -> dict:
+        return {
+            "views": {name: view.to_dict() for name, view in self.views.items()},
+            "issues": [issue.to_dict() for issue in self.issues],
+            "ms": round(self.seconds * 1000.0, 1),
+        }
+
+
+def _people_detector():
+    """The HOG people detector, or None when this OpenCV build has no HOG (OpenCV 5 moved it out)."""
+    global _hog, _hog_missing_logged
+    if _hog is None and hasattr(cv2, "HOGDescriptor"):
+        _hog = cv2.HOGDescriptor()
+        _hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+    if _hog is None and not _hog_missing_logged:
+        logger.warning("cv2.HOGDescriptor is unavailable; skipping person presence and framing checks")
+        _hog_missing_logged = True
+    return _hog
+
+
+def _read_reduced(image_path: str, min_side: int) -> Optional[np.ndarray]:
+    """
+    Decode at 1/4 resolution (DCT scaling: phone photos come out at ~750-1000 px), falling back to
+    a full decode for images too small for that.
+    """
+    image = cv2.imread(image_path, cv2.IMREAD_REDUCED_COLOR_4)
+    if image is not None and max(image.shape[:2]) < min_side:
+        image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    return image
+
+
+def _fit(image: np.ndarray, max_side: int) -> np.ndarray:
+    h, w = image.shape[:2]
+    scale = max_side / float(max(h, w))
+    if scale >= 1.0:
+        return image
+    return cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+
+
+def _sharpness(gray: np.ndarray, tiles: int) -> float:
+    # Stretch contrast first: Laplacian variance scales with contrast, and dark photos are
+    # reported as such rather than as blurry.
+    lo, hi = np.percentile(gray, (1, 99))
+    stretched = ((gray.astype(np.float32) - float(lo)) * (255.0 / max(float(hi - lo), 1.0))).astype(np.float32)
+    lap = cv2.Laplacian(stretched, cv2.CV_32F)
+    h, w = lap.shape
+    th, tw = h // tiles, w // tiles
+    if th < 2 or tw < 2:
+        return float(lap.var())
+    per_tile = lap[: th * tiles, : tw * tiles].reshape(tiles, th, tiles, tw).var(axis=(1, 3))
+    return float(np.percentile(per_tile, 90))
+
+
+def _detect_people(image: np.ndarray, config: InputQualityConfig) -> Optional[List[Tuple[float, float, float, float, float]]]:
+    """
+    People as (x0, y0, x1, y1, score), body extent in fractions of the image (detector padding
+    removed), largest first; None when no detector is available.
+    """
+    detector = _people_detector()
+    if detector is None:
+        return None
+    small = _fit(image, config.detection_side)
+    h, w = small.shape[:2]
+    # Pad so the detection window can extend past a body that fills the frame.
+    pad_y, pad_x = int(h * _HOG_PAD * 1.5), int(w * 0.1)
+    padded = cv2.copyMakeBorder(small, pad_y, pad_y, pad_x, pad_x, cv2.BORDER_REPLICATE)
+    if min(padded.shape[:2]) < _HOG_MIN_WINDOW:
+        return []
+    rects, weights = detector.detectMultiScale(padded, winStride=(8, 8), padding=(8, 8), scale=1.15)
+    if len(rects) == 0:
+        return []
+    scores = np.asarray(weights, dtype=np.float32).reshape(-1)
+    boxes = [list(map(int, r)) for r in rects]
+    keep = cv2.dnn.NMSBoxes(boxes, scores.tolist(), config.min_person_score, 0.3)
+    people = []
+    for i in np.asarray(keep).reshape(-1):
+        x, y, bw, bh = boxes[int(i)]
+        top = y + bh * _HOG_PAD - pad_y
+        bottom = y + bh * (1.0 - _HOG_PAD) - pad_y
+        left, right = x + bw * 0.25 - pad_x, x + bw * 0.75 - pad_x
+        people.append((left / w, top / h, right / w, bottom / h, float(scores[int(i)])))
+    return sorted(people, key=lambda p: p[3] - p[1], reverse=True)
+
+
+def assess_view(image_path: str, view: str, config: InputQualityConfig | None = None) -> ViewQuality:
+    """Run every check on one photo; see the module docstring."""
+    config = config or InputQualityConfig()
+    result = ViewQuality(view=view)
+    image = _read_reduced(image_path, config.analysis_side)
+    if image is None:
+        result.issues.append(QualityIssue("unreadable", view, f"The {view} photo could not be decoded; upload a JPEG or PNG image."))
+        return result
+
+    image = _fit(image, config.analysis_side)
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    result.sharpness = _sharpness(gray, config.tiles)
+    result.brightness = float(gray.mean())
+    result.dark_fraction = float((gray <= 10).mean())
+    result.bright_fraction = float((gray >= 245).mean())
+
+    if result.brightness < config.min_brightness or result.dark_fraction > config.max_clipped_fraction:
+        result.issues.append(QualityIssue("too_dark", view, f"The {view} photo is too dark; take it in a brighter, evenly lit room."))
+    elif result.brightness > config.max_brightness or result.bright_fraction > config.max_clipped_fraction:
+        result.issues.append(QualityIssue("too_bright", view, f"The {view} photo is overexposed; avoid direct light or a bright window behind you."))
+    elif result.sharpness < config.min_sharpness:
+        # Badly exposed photos also lose detail; the exposure is the actionable reason then.
+        result.issues.append(QualityIssue("blurry", view, f"The {view} photo is blurry; hold the camera steady and make sure the body is in focus."))
+
+    if not config.detect_people:
+        return result
+
+    people = _detect_people(image, config)
+    if people is None:
+        return result
+    if not people:
+        result.people = 0
+        result.issues.append(QualityIssue("no_person", view, f"No person was found in the {view} photo; stand fully in frame, facing the camera."))
+        return result
+    main = people[0]
+    # Detections nested in the subject (body parts at another scale) or much smaller than it
+    # (background clutter) do not count as another person.
+    result.people = 1 + sum(
+        1
+        for p in people[1:]
+        if (p[3] - p[1]) >= 0.5 * (main[3] - main[1]) and not (main[0] <= (p[0] + p[2]) / 2 <= main[2])
+    )
+    if result.people > 1:
+        result.issues.append(QualityIssue("multiple_people", view, f"More than one person is visible in the {view} photo; only the person being measured should be in frame."))
+
+    x0, y0, x1, y1, _ = people[0]
+    result.person_box = (max(0.0, x0), max(0.0, y0), min(1.0, x1), min(1.0, y1))
+    if y0 < config.edge_margin:
+        result.issues.append(QualityIssue("head_cropped", view, f"The head is cut off in the {view} photo; leave some space above the head."))
+    if y1 > 1.0 - config.edge_margin:
+        result.issues.append(QualityIssue("feet_cropped", view, f"The feet are cut off in the {view} photo; make sure the whole body, including the feet, is visible."))
+    if (min(1.0, y1) - max(0.0, y0)) < config.min_person_height:
+        result.issues.append(QualityIssue("person_too_small", view, f"The person is too small in the {view} photo; move closer so the body fills most of the frame height."))
+    return result
+
+
+def assess_inputs(photos: Dict[str, str], config: InputQualityConfig | None = None) -> InputQualityReport:
+    """
+    Assess the job photos.
+
+    Args:
+        photos: view name ("front"/"side") -> local image path (only views that were downloaded)
+        config: Thresholds
+
+    Returns:
+        Metrics and issues per view
+    """
+    started = time.perf_counter()
+    views = {view: assess_view(path, view, config) for view, path in photos.items()}
+    report = InputQualityReport(views=views, seconds=time.perf_counter() - started)
+    if report.issues:
+        logger.info(f"Input quality issues ({report.seconds * 1000:.0f}ms): {', '.join(f'{i.view}:{i.code}' for i in report.issues)}")
+    return report
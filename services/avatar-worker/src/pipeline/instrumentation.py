@@ -0,0 +1,305 @@
+"""
+Per-stage job instrumentation
+
+Stages (download, skin, PIXIE encode/decode, masks, silhouette targets, refinement,
+measurement, export, optimization, upload) are wrapped in `stage(name)`, which records:
+
+- wall time and process CPU time
+- peak RSS during the stage (VmHWM, reset per stage through /proc/self/clear_refs; falls
+  back to the process-lifetime ru_maxrss where that is not permitted)
+- peak accelerator memory (torch.cuda peak allocated bytes, when CUDA is in use)
+- free-form attributes set with `annotate()` (e.g. refinement nfev, cache hits)
+
+Every stage is observed into Prometheus histograms (served on /metrics next to the
+readiness probes; prometheus_client is optional) and, while a `job()` is active, appended
+to that job's report, which the worker attaches to the job's quality report.
+
+Each stage is also a tracing span (`stage <name>`, see tracing.py) carrying the same attributes.
+
+Stages nest (PIXIE encode inside PIXIE); an outer stage's peaks include its inner stages.
+The current job/stage is tracked per thread, so helper threads are not attributed to a job.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pipeline import tracing
+
+logger = logging.getLogger(__name__)
+
+_SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160, 320)
+_BYTES_BUCKETS = tuple(float(mb) * 1024 * 1024 for mb in (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768))
+_NFEV_BUCKETS = (1, 5, 10, 20, 30, 40, 60, 100)
+
+_local = threading.local()
+_metrics_lock = threading.Lock()
+_metrics: Optional[Dict[str, Any]] = None
+_clear_refs_ok = True
+
+
+@dataclass
+class StageRecord:
+    name: str
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_bytes: int = 0
+    peak_accelerator_bytes: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "stage": self.name,
+            "wallSeconds": round(self.wall_seconds, 4),
+            "cpuSeconds": round(self.cpu_seconds, 4),
+            "peakRssBytes": int(self.peak_rss_bytes),
+        }
+        if self.peak_accelerator_bytes:
+            out["peakAcceleratorBytes"] = int(self.peak_accelerator_bytes)
+        if self.attributes:
+            out["attributes"] = dict(self.attributes)
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+@dataclass
+class JobMetrics:
+    """Stage records of one job (all attempts)."""
+
+    job_id: str
+    job_type: str
+    started_at: float = field(default_factory=time.monotonic)
+    stages: List[StageRecord] = field(default_factory=list)
+    outcome: str = "unknown"
+
+    def report(self) -> Dict[str, Any]:
+        totals: Dict[str, Dict[str, float]] = {}
+        for s in self.stages:
+            t = totals.setdefault(s.name, {"count": 0, "wallSeconds": 0.0, "cpuSeconds": 0.0})
+            t["count"] += 1
+            t["wallSeconds"] = round(t["wallSeconds"] + s.wall_seconds, 4)
+            t["cpuSeconds"] = round(t["cpuSeconds"] + s.cpu_seconds, 4)
+        return {
+            "jobWallSeconds": round(time.monotonic() - self.started_at, 4),
+            "stages": [s.to_dict() for s in self.stages],
+            "totals": totals,
+        }
+
+
+def _get_metrics() -> Optional[Dict[str, Any]]:
+    """Create the Prometheus metrics on first use (prometheus_client is optional)."""
+    global _metrics
+    if _metrics is not None:
+        return _metrics or None
+    with _metrics_lock:
+        if _metrics is None:
+            try:
+                from prometheus_client import Counter, Histogram
+            except Exception:
+                logger.info("prometheus_client not installed; stage metrics are only attached to job reports")
+                _metrics = {}
+                return None
+            _metrics = {
+                "wall": Histogram(
+                    "avatar_stage_duration_seconds", "Wall time per pipeline stage", ["stage"], buckets=_SECONDS_BUCKETS
+                ),
+                "cpu": Histogram(
+                    "avatar_stage_cpu_seconds", "Process CPU time per pipeline stage", ["stage"], buckets=_SECONDS_BUCKETS
+                ),
+                "rss": Histogram(
+                    "avatar_stage_peak_rss_bytes", "Peak resident set size during a stage", ["stage"], buckets=_BYTES_BUCKETS
+                ),
+                "accel": Histogram(
+                    "avatar_stage_peak_accelerator_bytes",
+                    "Peak accelerator memory allocated during a stage",
+                    ["stage"],
+                    buckets=_BYTES_BUCKETS,
+                ),
+                "errors": Counter("avatar_stage_errors_total", "Stages that raised", ["stage"]),
+                "nfev": Histogram(
+                    "avatar_refine_nfev", "Function evaluations per beta refinement", buckets=_NFEV_BUCKETS
+                ),
+                "jobs": Counter("avatar_jobs_total", "Jobs processed", ["type", "outcome"]),
+                "job_wall": Histogram(
+                    "avatar_job_duration_seconds", "Wall time per job (all attempts)", ["type"], buckets=_SECONDS_BUCKETS
+                ),
+            }
+    return _metrics or None
+
+
+def render_metrics() -> Optional[Tuple[bytes, str]]:
+    """
+    Prometheus exposition of this process' metrics (or of all worker processes when
+    PROMETHEUS_MULTIPROC_DIR is set, as under the pre-fork supervisor).
+
+    Returns:
+        (body, content type), or None when prometheus_client is not installed
+    """
+    try:
+        from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+    except Exception:
+        return None
+    _get_metrics()
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def _read_hwm() -> int:
+    """Peak RSS in bytes since the last reset (VmHWM), else the process-lifetime maximum."""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except Exception:
+        pass
+    try:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+    except Exception:
+        return 0
+
+
+def _reset_hwm() -> None:
+    global _clear_refs_ok
+    if not _clear_refs_ok:
+        return
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+    except Exception:
+        _clear_refs_ok = False
+
+
+def _cuda():
+    """torch.cuda when torch is already imported and CUDA is initialized (never imports torch)."""
+    torch = sys.modules.get("torch")
+    try:
+        if torch is not None and torch.cuda.is_available() and torch.cuda.is_initialized():
+            return torch.cuda
+    except Exception:
+        pass
+    return None
+
+
+def _stack() -> List[StageRecord]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def current_job() -> Optional[JobMetrics]:
+    return getattr(_local, "job", None)
+
+
+@contextmanager
+def job(job_id: str, job_type: str) -> Iterator[JobMetrics]:
+    """Collect stage records for one job on this thread; counts the job's outcome on exit."""
+    previous = current_job()
+    metrics = JobMetrics(job_id=job_id, job_type=job_type)
+    _local.job = metrics
+    try:
+        yield metrics
+    finally:
+        _local.job = previous
+        prom = _get_metrics()
+        if prom is not None:
+            prom["jobs"].labels(type=job_type, outcome=metrics.outcome).inc()
+            prom["job_wall"].labels(type=job_type).observe(time.monotonic() - metrics.started_at)
+
+
+def annotate(**attributes: Any) -> None:
+    """Attach attributes to the innermost active stage (no-op outside a stage)."""
+    stack = _stack()
+    if stack:
+        stack[-1].attributes.update(attributes)
+
+
+@contextmanager
+def stage(name: str, **attributes: Any) -> Iterator[StageRecord]:
+    """Time a stage and record its resource peaks."""
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    record = StageRecord(name=name, attributes=dict(attributes))
+    cuda = _cuda()
+
+    # The peak counters are process-wide and about to be reset: fold what the parent has
+    # seen so far into it first.
+    if parent is not None:
+        parent.peak_rss_bytes = max(parent.peak_rss_bytes, _read_hwm())
+        if cuda is not None:
+            parent.peak_accelerator_bytes = max(parent.peak_accelerator_bytes, int(cuda.max_memory_allocated()))
+    _reset_hwm()
+    if cuda is not None:
+        cuda.reset_peak_memory_stats()
+
+    stack.append(record)
+    wall0 = time.perf_counter()
+    cpu0 = time.process_time()
+    with tracing.span(f"stage {name}", record.attributes) as span:
+        try:
+            yield record
+        except BaseException as e:
+            record.error = type(e).__name__
+            raise
+        finally:
+            record.wall_seconds = time.perf_counter() - wall0
+            record.cpu_seconds = time.process_time() - cpu0
+            record.peak_rss_bytes = max(record.peak_rss_bytes, _read_hwm())
+            cuda = cuda or _cuda()  # CUDA may have been initialized during the stage
+            if cuda is not None:
+                record.peak_accelerator_bytes = max(record.peak_accelerator_bytes, int(cuda.max_memory_allocated()))
+            stack.pop()
+            if parent is not None:
+                parent.peak_rss_bytes = max(parent.peak_rss_bytes, record.peak_rss_bytes)
+                parent.peak_accelerator_bytes = max(parent.peak_accelerator_bytes, record.peak_accelerator_bytes)
+            _observe(record)
+            tracing.set_attributes(
+                span,
+                {
+                    **record.attributes,
+                    "stage.cpu_seconds": round(record.cpu_seconds, 4),
+                    "stage.peak_rss_bytes": int(record.peak_rss_bytes),
+                    "stage.peak_accelerator_bytes": int(record.peak_accelerator_bytes) or None,
+                },
+            )
+
+
+def _observe(record: StageRecord) -> None:
+    job_metrics = current_job()
+    if job_metrics is not None:
+        job_metrics.stages.append(record)
+    logger.debug(
+        f"Stage {record.name}: {record.wall_seconds:.3f}s wall, {record.cpu_seconds:.3f}s CPU, "
+        f"peak RSS {record.peak_rss_bytes / 1e6:.0f}MB"
+    )
+    prom = _get_metrics()
+    if prom is None:
+        return
+    prom["wall"].labels(stage=record.name).observe(record.wall_seconds)
+    prom["cpu"].labels(stage=record.name).observe(record.cpu_seconds)
+    if record.peak_rss_bytes:
+        prom["rss"].labels(stage=record.name).observe(record.peak_rss_bytes)
+    if record.peak_accelerator_bytes:
+        prom["accel"].labels(stage=record.name).observe(record.peak_accelerator_bytes)
+    if record.error:
+        prom["errors"].labels(stage=record.name).inc()
+    nfev = record.attributes.get("nfev")
+    if isinstance(nfev, (int, float)):
+        prom["nfev"].observe(nfev)
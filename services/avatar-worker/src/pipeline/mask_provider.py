@@ -32,10 +32,44 @@ class MaskResult:
     raw: Optional[Dict[str, Any]] = None
 
 
+def _run_grabcut(img: np.ndarray, rect: tuple[int, int, int, int], iterations: int = 5, deadline=None) -> np.ndarray:
+    """
+    Rect-initialized GrabCut, run one iteration per call so a deadline can stop it between
+    iterations (a single multi-iteration cv2.grabCut call cannot be interrupted).
+    """
+    mask = np.zeros(img.shape[:2], np.uint8)
+    bgd_model = np.zeros((1, 65), np.float64)
+    fgd_model = np.zeros((1, 65), np.float64)
+
+    cv2.grabCut(img, mask, rect, bgd_model, fgd_model, 1, cv2.GC_INIT_WITH_RECT)
+    for _ in range(max(0, iterations - 1)):
+        if deadline is not None:
+            deadline.check("GrabCut")
+        cv2.grabCut(img, mask, None, bgd_model, fgd_model, 1, cv2.GC_EVAL)
+
+    return np.where((mask == cv2.GC_FGD) | (mask == cv2.GC_PR_FGD), 255, 0).astype(np.uint8)
+
+
+def write_warmup_image(path: str, width: int = 512, height: int = 768) -> None:
+    """Write a plain synthetic 'person' image (dark ellipse on light background) for model warm-up."""
+    img = np.full((height, width, 3), 200, dtype=np.uint8)
+    cv2.ellipse(img, (width // 2, height // 2), (width // 6, int(height * 0.42)), 0, 0, 360, (70, 60, 50), -1)
+    cv2.circle(img, (width // 2, int(height * 0.12)), width // 12, (90, 110, 150), -1)
+    cv2.imwrite(path, img)
+
+
 class MaskProvider:
-    def generate(self, image_path: str, out_dir: str, prefix: str) -> MaskResult:
+    def generate(self, image_path: str, out_dir: str, prefix: str, deadline=None) -> MaskResult:
         raise NotImplementedError
 
+    def cache_key(self) -> Dict[str, Any]:
+        """Settings that affect the produced mask (part of the result-cache key)."""
+        return {"provider": type(self).__name__}
+
+    def warm_up(self) -> None:
+        """Load any lazily-built models ahead of the first job (no-op for model-free providers)."""
+        return None
+
 
 class GrabCutMaskProvider(MaskProvider):
     """
@@ -44,7 +78,7 @@ class GrabCutMaskProvider(MaskProvider):
     Works best with mostly clean backgrounds; intended as a fallback when SAM3DB is unavailable.
     """
 
-    def generate(self, image_path: str, out_dir: str, prefix: str) -> MaskResult:
+    def generate(self, image_path: str, out_dir: str, prefix: str, deadline=None) -> MaskResult:
         os.makedirs(out_dir, exist_ok=True)
 
         img = cv2.imread(image_path, cv2.IMREAD_COLOR)
@@ -58,12 +92,7 @@ class GrabCutMaskProvider(MaskProvider):
             int(width * 0.8),
             int(height * 0.9),
         )
-        mask = np.zeros((height, width), np.uint8)
-        bgd_model = np.zeros((1, 65), np.float64)
-        fgd_model = np.zeros((1, 65), np.float64)
-
-        cv2.grabCut(img, mask, rect, bgd_model, fgd_model, 5, cv2.GC_INIT_WITH_RECT)
-        mask_bin = np.where((mask == cv2.GC_FGD) | (mask == cv2.GC_PR_FGD), 255, 0).astype(np.uint8)
+        mask_bin = _run_grabcut(img, rect, iterations=5, deadline=deadline)
 
         out_path = os.path.join(out_dir, f"{prefix}_mask.png")
         cv2.imwrite(out_path, mask_bin)
@@ -191,40 +220,48 @@ class Sam3DBodyMaskProvider(MaskProvider):
 
         device = torch.device("cuda")
 
-        model, model_cfg = load_sam_3d_body(self.checkpoint_path, device=device, mhr_path=self.mhr_path)
+        from pipeline import mmap_weights
 
-        human_detector = None
-        human_segmentor = None
-        fov_estimator = None
+        # Map the checkpoints instead of reading them into host memory before the GPU copy.
+        for path in (self.checkpoint_path, self.mhr_path, self.detector_path, self.segmentor_path, self.fov_path):
+            if path:
+                mmap_weights.register_checkpoint(path)
 
-        try:
-            from tools.build_detector import HumanDetector
+        with mmap_weights.loading():
+            model, model_cfg = load_sam_3d_body(self.checkpoint_path, device=device, mhr_path=self.mhr_path)
 
-            human_detector = HumanDetector(name=self.detector_name, device=device, path=self.detector_path)
-        except Exception as e:
-            logger.warning(f"SAM3DB: detector unavailable ({e}); using full image.")
+            human_detector = None
+            human_segmentor = None
+            fov_estimator = None
 
-        if self.use_mask:
-            if device.type != "cuda":
-                logger.warning("SAM3DB: SAM2 mask inference is disabled on CPU; using bbox-only + GrabCut fallback masks.")
-            elif not self.segmentor_path:
-                logger.warning("SAM3DB: SAM3DBODY_SEGMENTOR_PATH is empty; using bbox-only + GrabCut fallback masks.")
-            else:
-                try:
-                    from tools.build_sam import HumanSegmentor
+            try:
+                from tools.build_detector import HumanDetector
 
-                    human_segmentor = HumanSegmentor(
-                        name=self.segmentor_name, device=device, path=self.segmentor_path
-                    )
-                except Exception as e:
-                    logger.warning(f"SAM3DB: segmentor unavailable ({e}); masks will be missing.")
+                human_detector = HumanDetector(name=self.detector_name, device=device, path=self.detector_path)
+            except Exception as e:
+                logger.warning(f"SAM3DB: detector unavailable ({e}); using full image.")
 
-        try:
-            from tools.build_fov_estimator import FOVEstimator
+            if self.use_mask:
+                if device.type != "cuda":
+                    logger.warning("SAM3DB: SAM2 mask inference is disabled on CPU; using bbox-only + GrabCut fallback masks.")
+                elif not self.segmentor_path:
+                    logger.warning("SAM3DB: SAM3DBODY_SEGMENTOR_PATH is empty; using bbox-only + GrabCut fallback masks.")
+                else:
+                    try:
+                        from tools.build_sam import HumanSegmentor
+
+                        human_segmentor = HumanSegmentor(
+                            name=self.segmentor_name, device=device, path=self.segmentor_path
+                        )
+                    except Exception as e:
+                        logger.warning(f"SAM3DB: segmentor unavailable ({e}); masks will be missing.")
 
-            fov_estimator = FOVEstimator(name=self.fov_name, device=device, path=self.fov_path)
-        except Exception as e:
-            logger.warning(f"SAM3DB: fov estimator unavailable ({e}); using default FOV.")
+            try:
+                from tools.build_fov_estimator import FOVEstimator
+
+                fov_estimator = FOVEstimator(name=self.fov_name, device=device, path=self.fov_path)
+            except Exception as e:
+                logger.warning(f"SAM3DB: fov estimator unavailable ({e}); using default FOV.")
 
         self._estimator = SAM3DBodyEstimator(
             sam_3d_body_model=model,
@@ -234,7 +271,33 @@ class Sam3DBodyMaskProvider(MaskProvider):
             fov_estimator=fov_estimator,
         )
 
-    def _grabcut_from_bbox(self, image_path: str, bbox: list[float], out_path: str) -> None:
+    def warm_up(self) -> None:
+        """
+        Build the estimator (SAM3D Body + detector/segmentor/FOV) now instead of on the first job,
+        and run it once on a synthetic image.
+        """
+        self._build_estimator()
+        if self._estimator is None:
+            if self._disabled_reason:
+                logger.warning(f"SAM3DB disabled; jobs will use GrabCut masks: {self._disabled_reason}")
+            return
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            image_path = os.path.join(tmp, "warmup.jpg")
+            write_warmup_image(image_path)
+            self.generate(image_path, tmp, "warmup")
+
+    def cache_key(self) -> Dict[str, Any]:
+        return {
+            "provider": type(self).__name__,
+            "checkpoint": os.path.basename(self.checkpoint_path),
+            "segmentor": bool(self.segmentor_path),
+            "useMask": self.use_mask,
+            "bboxThresh": self.bbox_thresh,
+        }
+
+    def _grabcut_from_bbox(self, image_path: str, bbox: list[float], out_path: str, deadline=None) -> None:
         img = cv2.imread(image_path, cv2.IMREAD_COLOR)
         if img is None:
             raise RuntimeError(f"Failed to read image: {image_path}")
@@ -247,21 +310,17 @@ class Sam3DBodyMaskProvider(MaskProvider):
         y1 = max(0, min(height, y1))
         rect = (x0, y0, max(1, x1 - x0), max(1, y1 - y0))
 
-        mask = np.zeros((height, width), np.uint8)
-        bgd_model = np.zeros((1, 65), np.float64)
-        fgd_model = np.zeros((1, 65), np.float64)
-        cv2.grabCut(img, mask, rect, bgd_model, fgd_model, 5, cv2.GC_INIT_WITH_RECT)
-        mask_bin = np.where((mask == cv2.GC_FGD) | (mask == cv2.GC_PR_FGD), 255, 0).astype(np.uint8)
+        mask_bin = _run_grabcut(img, rect, iterations=5, deadline=deadline)
         cv2.imwrite(out_path, mask_bin)
 
-    def generate(self, image_path: str, out_dir: str, prefix: str) -> MaskResult:
+    def generate(self, image_path: str, out_dir: str, prefix: str, deadline=None) -> MaskResult:
         os.makedirs(out_dir, exist_ok=True)
         self._build_estimator()
 
         if self._estimator is None:
             # Best-effort fallback: still produce a silhouette so the downstream refinement can proceed.
             provider = GrabCutMaskProvider()
-            result = provider.generate(image_path, out_dir, prefix)
+            result = provider.generate(image_path, out_dir, prefix, deadline=deadline)
 
             meta_path = os.path.join(out_dir, f"{prefix}_sam3db.json")
             meta = {
@@ -285,6 +344,8 @@ class Sam3DBodyMaskProvider(MaskProvider):
                 raw=meta,
             )
 
+        if deadline is not None:
+            deadline.check("SAM3D mask inference")
         try:
             outputs = self._estimator.process_one_image(  # type: ignore[union-attr]
                 image_path,
@@ -320,7 +381,7 @@ class Sam3DBodyMaskProvider(MaskProvider):
             bbox = best.get("bbox")
             if bbox is None:
                 raise RuntimeError("SAM3DB output has no bbox; cannot produce fallback mask.")
-            self._grabcut_from_bbox(image_path, bbox=bbox, out_path=out_path)
+            self._grabcut_from_bbox(image_path, bbox=bbox, out_path=out_path, deadline=deadline)
         else:
             mask_u8 = (mask.astype(np.uint8) * 255) if mask.max() <= 1 else mask.astype(np.uint8)
             cv2.imwrite(out_path, mask_u8)
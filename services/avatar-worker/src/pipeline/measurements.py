@@ -9,15 +9,37 @@ import sys
 import os
 import logging
 import numpy as np
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import torch
 
+from pipeline import mmap_weights
+
 # Add SMPL-Anthropometry to path
 SMPL_ANTHRO_PATH = os.path.join(os.path.dirname(__file__), "SMPL-Anthropometry")
 sys.path.insert(0, SMPL_ANTHRO_PATH)
 
 logger = logging.getLogger(__name__)
 
+# SMPL-Anthropometry measurement names mapped by MeasurementExtractor. Changing this set or the
+# mapping changes stored measurements: bump MEASUREMENT_VERSION and re-measure (src/remeasure.py).
+_REQUIRED_MEASUREMENTS = [
+    "height",
+    "shoulder breadth",
+    "shoulder to crotch height",
+    "arm right length",
+    "inside leg height",
+    "neck circumference",
+    "chest circumference",
+    "waist circumference",
+    "hip circumference",
+    "wrist right circumference",
+    "bicep right circumference",
+    "forearm right circumference",
+    "thigh left circumference",
+    "calf left circumference",
+    "ankle left circumference",
+]
+
 
 class MeasurementExtractor:
     """Extract body measurements from SMPL-X models"""
@@ -65,7 +87,10 @@ class MeasurementExtractor:
             logger.info(f"SMPL-Anthro data root: {data_root}")
             logger.info(f"SMPL-Anthro body model root: {body_model_root}")
             logger.info(f"SMPL-Anthro model ext: {os.environ.get('SMPL_ANTHRO_MODEL_EXT')}")
-            self.measurer = MeasureBody("smplx")
+            mmap_weights.register_arrays_dir(self.smplx_model_dir)
+            with mmap_weights.loading():
+                self.measurer = MeasureBody("smplx")
+            mmap_weights.rebind_modules(self.measurer, "measure")
             
             logger.info("SMPL-Anthropometry loaded successfully")
             
@@ -76,6 +101,12 @@ class MeasurementExtractor:
             logger.error(f"Failed to load measurement system: {e}")
             raise
     
+    def warm_up(self) -> None:
+        """Measure a mean-shape body once so the first job skips SMPL-X/measurement set-up costs."""
+        if self.measurer is None:
+            return
+        self.extract_measurements({"betas": np.zeros(10, dtype=np.float32)})
+
     def extract_measurements(self, smplx_params: Dict[str, Any]) -> Dict[str, float]:
         """
         Extract body measurements from SMPL-X parameters
@@ -110,51 +141,8 @@ class MeasurementExtractor:
                 betas = torch.tensor(betas_raw, dtype=torch.float32).reshape(1, -1)[:, :10]
                 self.measurer.from_body_model(gender="neutral", shape=betas)
 
-            # Compute measurements (SMPL-Anthropometry does not populate `measurements` until `measure()` is called).
-            required = [
-                "height",
-                "shoulder breadth",
-                "shoulder to crotch height",
-                "arm right length",
-                "inside leg height",
-                "neck circumference",
-                "chest circumference",
-                "waist circumference",
-                "hip circumference",
-                "wrist right circumference",
-                "bicep right circumference",
-                "forearm right circumference",
-                "thigh left circumference",
-                "calf left circumference",
-                "ankle left circumference",
-            ]
-
-            self.measurer.measurements = {}
-            self.measurer.measure(required)
-            measurements_dict = self.measurer.measurements
-
-            shoulder_breadth = measurements_dict.get("shoulder breadth", 0.0)
-
-            # Convert to our schema (SMPL-Anthropometry returns cm)
-            measurements = {
-                "chestCm": float(measurements_dict.get("chest circumference", 0.0)),
-                "waistCm": float(measurements_dict.get("waist circumference", 0.0)),
-                "hipCm": float(measurements_dict.get("hip circumference", 0.0)),
-                "shoulderCm": float(shoulder_breadth),
-                "sleeveCm": float(measurements_dict.get("arm right length", 0.0)),
-                "lengthCm": float(measurements_dict.get("shoulder to crotch height", 0.0)),
-                "neckCm": float(measurements_dict.get("neck circumference", 0.0)),
-                "bicepCm": float(measurements_dict.get("bicep right circumference", 0.0)),
-                "forearmCm": float(measurements_dict.get("forearm right circumference", 0.0)),
-                "wristCm": float(measurements_dict.get("wrist right circumference", 0.0)),
-                "thighCm": float(measurements_dict.get("thigh left circumference", 0.0)),
-                "calfCm": float(measurements_dict.get("calf left circumference", 0.0)),
-                "ankleCm": float(measurements_dict.get("ankle left circumference", 0.0)),
-                "insideLegCm": float(measurements_dict.get("inside leg height", 0.0)),
-                "shoulderBreadthCm": float(shoulder_breadth),
-                "heightCm": float(measurements_dict.get("height", 0.0)),
-            }
-            
+            measurements = self._measure_loaded_body()
+
             logger.info(f"Extracted {len(measurements)} measurements")
             return measurements
             
@@ -163,6 +151,61 @@ class MeasurementExtractor:
             logger.warning("Falling back to placeholder measurements")
             return self._generate_placeholder_measurements()
     
+    def extract_measurements_batch(self, vertices: np.ndarray) -> List[Optional[Dict[str, float]]]:
+        """
+        Measure several canonical (T-pose, height-scaled) meshes with one loaded measurer.
+
+        SMPL-Anthropometry measures one body at a time, so this is a loop over the bodies; the
+        saving is loading the measurer once (the vertices come from one batched SMPL-X pass).
+
+        Args:
+            vertices: (B, V, 3) SMPL-X vertices, e.g. PIXIERunner.measurement_vertices_from_betas
+
+        Returns:
+            Measurements per body (same schema as extract_measurements), None where measuring failed
+        """
+        if self.measurer is None:
+            return [self._generate_placeholder_measurements() for _ in range(len(vertices))]
+
+        results: List[Optional[Dict[str, float]]] = []
+        for verts in np.asarray(vertices, dtype=np.float32):
+            try:
+                self.measurer.from_verts(torch.from_numpy(verts))
+                results.append(self._measure_loaded_body())
+            except Exception as e:
+                logger.warning(f"Measurement extraction failed for one body in batch: {e}")
+                results.append(None)
+        return results
+
+    def _measure_loaded_body(self) -> Dict[str, float]:
+        """Measure the body currently loaded into the measurer and map it to our schema."""
+        # SMPL-Anthropometry does not populate `measurements` until `measure()` is called.
+        self.measurer.measurements = {}
+        self.measurer.measure(_REQUIRED_MEASUREMENTS)
+        measurements_dict = self.measurer.measurements
+
+        shoulder_breadth = measurements_dict.get("shoulder breadth", 0.0)
+
+        # Convert to our schema (SMPL-Anthropometry returns cm)
+        return {
+            "chestCm": float(measurements_dict.get("chest circumference", 0.0)),
+            "waistCm": float(measurements_dict.get("waist circumference", 0.0)),
+            "hipCm": float(measurements_dict.get("hip circumference", 0.0)),
+            "shoulderCm": float(shoulder_breadth),
+            "sleeveCm": float(measurements_dict.get("arm right length", 0.0)),
+            "lengthCm": float(measurements_dict.get("shoulder to crotch height", 0.0)),
+            "neckCm": float(measurements_dict.get("neck circumference", 0.0)),
+            "bicepCm": float(measurements_dict.get("bicep right circumference", 0.0)),
+            "forearmCm": float(measurements_dict.get("forearm right circumference", 0.0)),
+            "wristCm": float(measurements_dict.get("wrist right circumference", 0.0)),
+            "thighCm": float(measurements_dict.get("thigh left circumference", 0.0)),
+            "calfCm": float(measurements_dict.get("calf left circumference", 0.0)),
+            "ankleCm": float(measurements_dict.get("ankle left circumference", 0.0)),
+            "insideLegCm": float(measurements_dict.get("inside leg height", 0.0)),
+            "shoulderBreadthCm": float(shoulder_breadth),
+            "heightCm": float(measurements_dict.get("height", 0.0)),
+        }
+
     def _generate_placeholder_measurements(self) -> Dict[str, float]:
         """Generate placeholder measurements for testing"""
         return {
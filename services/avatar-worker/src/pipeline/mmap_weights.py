@@ -0,0 +1,317 @@
+"""
+Memory-mapped model weight loading
+
+The vendored loaders (PIXIE, SMPL-Anthropometry via `smplx`, SAM3D Body) read their weights
+with torch.load / numpy.load / pickle.load and deserialize them fully into process memory.
+This module makes those reads memory-mapped without patching the vendored code:
+
+- Checkpoints registered with `register_checkpoint` are loaded with torch.load(mmap=True).
+  Legacy (non-zip) checkpoints such as pixie_model.tar are converted once to the zip format
+  under the mmap cache dir, since only that format can be mapped.
+- SMPL-X `.npz` / `.pkl` assets registered with `register_arrays` are converted once to a
+  directory of `.npy` files; numpy.load / pickle.load on the original path then return a
+  mapping of read-only memory-mapped arrays (arrays a loader never touches are never read).
+- `rebind_to_mmap` re-homes a loaded CPU module's parameters/buffers onto a memory-mapped
+  snapshot of its state_dict, so every process on the node shares one copy of the weights
+  through the page cache instead of holding a private one.
+
+Opt-in (MODEL_MMAP_ENABLED): `configure` enables the module; nothing is patched until a
+loader enters `loading()`. While at least one `loading()` block is active, torch.load /
+numpy.load / pickle.load are swapped for hooks; the last block to exit restores the
+originals. The hooks only act on registered paths, so other loads that happen to run in
+that window (another thread, a non-model file) get the regular loaders.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import zipfile
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_META_FILE = "_meta.pkl"
+
+_lock = threading.Lock()
+_cache_dir: Optional[str] = None
+_checkpoints: Dict[str, str] = {}  # original abs path -> mmap-capable path (filled lazily)
+_arrays: Dict[str, Optional[str]] = {}  # original abs path -> converted .npy dir (filled lazily)
+_enabled = False
+_active_loads = 0  # open loading() blocks; the hooks are installed while > 0
+_orig_torch_load = None
+_orig_np_load = np.load
+_orig_pickle_load = pickle.load
+
+
+def _fingerprint(path: str) -> str:
+    st = os.stat(path)
+    digest = hashlib.sha1(f"{os.path.abspath(path)}:{st.st_size}:{int(st.st_mtime)}".encode("utf-8")).hexdigest()
+    return digest[:16]
+
+
+class MmapArrays(Mapping):
+    """NpzFile-like read-only mapping over a directory of .npy files (memory-mapped on access)."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, _META_FILE), "rb") as f:
+            meta = pickle.load(f)
+        self.files = list(meta["arrays"]) + list(meta["objects"])
+        self._arrays = set(meta["arrays"])
+        self._objects: Dict[str, Any] = meta["objects"]
+        self._loaded: Dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._objects:
+            return self._objects[key]
+        if key not in self._arrays:
+            raise KeyError(key)
+        if key not in self._loaded:
+            self._loaded[key] = _orig_np_load(os.path.join(self.directory, f"{key}.npy"), mmap_mode="r")
+        return self._loaded[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.files)
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def close(self) -> None:
+        self._loaded.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _convert_arrays(path: str) -> Optional[str]:
+    """Convert an .npz/.pkl array bundle into <cache>/<name>-<fingerprint>.npyd (once)."""
+    out_dir = os.path.join(_cache_dir, f"{os.path.basename(path)}-{_fingerprint(path)}.npyd")
+    if os.path.isfile(os.path.join(out_dir, _META_FILE)):
+        return out_dir
+
+    if path.lower().endswith(".npz"):
+        with _orig_np_load(path, allow_pickle=True) as npz:
+            data = {k: npz[k] for k in npz.files}
+    else:
+        with open(path, "rb") as f:
+            data = _orig_pickle_load(f, encoding="latin1")
+    if not isinstance(data, dict):
+        return None
+
+    os.makedirs(_cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=_cache_dir)
+    try:
+        arrays, objects = [], {}
+        for key, value in data.items():
+            if isinstance(value, np.ndarray) and value.dtype != object:
+                np.save(os.path.join(staging, f"{key}.npy"), np.ascontiguousarray(value))
+                arrays.append(key)
+            else:
+                objects[key] = value
+        with open(os.path.join(staging, _META_FILE), "wb") as f:
+            pickle.dump({"arrays": arrays, "objects": objects}, f)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.replace(staging, out_dir)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    logger.info(f"mmap: converted {path} -> {out_dir}")
+    return out_dir
+
+
+def _mmap_checkpoint_path(path: str) -> str:
+    """Return a zip-format copy of `path` (the original if it already is one)."""
+    if zipfile.is_zipfile(path):
+        return path
+    out = os.path.join(_cache_dir, f"{os.path.basename(path)}-{_fingerprint(path)}.pt")
+    if not os.path.isfile(out):
+        import torch
+
+        os.makedirs(_cache_dir, exist_ok=True)
+        obj = _orig_torch_load(path, map_location="cpu", weights_only=False)
+        fd, tmp = tempfile.mkstemp(prefix=".staging-", suffix=".pt", dir=_cache_dir)
+        os.close(fd)
+        try:
+            torch.save(obj, tmp)
+            os.replace(tmp, out)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        logger.info(f"mmap: converted legacy checkpoint {path} -> {out}")
+    return out
+
+
+def _path_of(f: Any) -> Optional[str]:
+    if isinstance(f, (str, os.PathLike)):
+        return os.path.abspath(os.fspath(f))
+    name = getattr(f, "name", None)
+    return os.path.abspath(name) if isinstance(name, str) else None
+
+
+def _resolve_arrays(path: Optional[str]) -> Optional[str]:
+    if path is None or path not in _arrays:
+        return None
+    with _lock:
+        if _arrays[path] is None:
+            try:
+                _arrays[path] = _convert_arrays(path) or ""
+            except Exception as e:
+                logger.warning(f"mmap: could not convert {path} ({e}); loading it normally")
+                _arrays[path] = ""
+        return _arrays[path] or None
+
+
+def _torch_load(f, *args, **kwargs):
+    path = _path_of(f) if isinstance(f, (str, os.PathLike)) else None
+    if path is not None and path in _checkpoints and "mmap" not in kwargs:
+        try:
+            with _lock:
+                if not _checkpoints[path]:
+                    _checkpoints[path] = _mmap_checkpoint_path(path)
+                mapped = _checkpoints[path]
+            return _orig_torch_load(mapped, *args, mmap=True, **kwargs)
+        except Exception as e:
+            logger.warning(f"mmap: falling back to a regular load of {path}: {e}")
+    return _orig_torch_load(f, *args, **kwargs)
+
+
+def _np_load(file, *args, **kwargs):
+    directory = _resolve_arrays(_path_of(file))
+    if directory is not None:
+        return MmapArrays(directory)
+    return _orig_np_load(file, *args, **kwargs)
+
+
+def _pickle_load(file, *args, **kwargs):
+    directory = _resolve_arrays(_path_of(file))
+    if directory is not None:
+        return dict(MmapArrays(directory))
+    return _orig_pickle_load(file, *args, **kwargs)
+
+
+def configure(cache_dir: str) -> None:
+    """Enable mmap loading for later `loading()` blocks (idempotent). Patches nothing by itself."""
+    global _enabled, _cache_dir, _orig_torch_load
+    import torch
+
+    with _lock:
+        _cache_dir = os.path.abspath(cache_dir)
+        if _enabled:
+            return
+        _orig_torch_load = torch.load
+        _enabled = True
+    logger.info(f"mmap weight loading enabled (cache: {_cache_dir})")
+
+
+@contextmanager
+def loading():
+    """
+    Scope of a model load: registered checkpoints and array bundles read inside it are
+    memory-mapped. A no-op unless `configure` was called. Re-entrant and safe to use from
+    several loader threads at once.
+    """
+    global _active_loads
+    if not _enabled:
+        yield
+        return
+    import torch
+
+    with _lock:
+        if _active_loads == 0:
+            torch.load, np.load, pickle.load = _torch_load, _np_load, _pickle_load
+        _active_loads += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            _active_loads -= 1
+            if _active_loads == 0:
+                torch.load, np.load, pickle.load = _orig_torch_load, _orig_np_load, _orig_pickle_load
+
+
+def register_checkpoint(path: str) -> None:
+    if _enabled and os.path.isfile(path):
+        _checkpoints.setdefault(os.path.abspath(path), "")
+
+
+def register_arrays(path: str) -> None:
+    if _enabled and os.path.isfile(path) and path.lower().endswith((".npz", ".pkl")):
+        _arrays.setdefault(os.path.abspath(path), None)
+
+
+def register_arrays_dir(directory: str) -> None:
+    """Register every .npz/.pkl file directly inside `directory`."""
+    if not _enabled or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        register_arrays(os.path.join(directory, name))
+
+
+def rebind_to_mmap(module, name: str) -> int:
+    """
+    Point a CPU module's parameters/buffers at a memory-mapped snapshot of its state_dict.
+
+    The snapshot (<cache>/<name>.state.pt) is rewritten when the weights change.
+
+    Returns:
+        Bytes now backed by the shared mapping (0 if skipped)
+    """
+    if not _enabled:
+        return 0
+    import torch
+
+    state = module.state_dict()
+    if not state or any(t.device.type != "cpu" for t in state.values()):
+        return 0
+    fingerprint = hashlib.sha1()
+    for key, tensor in state.items():
+        fingerprint.update(f"{key}:{tuple(tensor.shape)}:{tensor.dtype}".encode("utf-8"))
+        flat = tensor.detach().reshape(-1)
+        mid = flat.numel() // 2
+        for sample in (flat[:64], flat[mid : mid + 64], flat[-64:]):
+            fingerprint.update(sample.float().numpy().tobytes())
+    snapshot = os.path.join(_cache_dir, f"{name}-{fingerprint.hexdigest()[:16]}.state.pt")
+    if not os.path.isfile(snapshot):
+        os.makedirs(_cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".staging-", suffix=".pt", dir=_cache_dir)
+        os.close(fd)
+        try:
+            torch.save({k: v.detach().contiguous() for k, v in state.items()}, tmp)
+            os.replace(tmp, snapshot)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    mapped = _orig_torch_load(snapshot, map_location="cpu", mmap=True, weights_only=True)
+    module.load_state_dict(mapped, assign=True)
+    total = sum(t.numel() * t.element_size() for t in mapped.values())
+    logger.info(f"mmap: {name} weights ({total / 1e6:.0f} MB) now shared via {os.path.basename(snapshot)}")
+    return total
+
+
+def rebind_modules(owner, prefix: str) -> int:
+    """rebind_to_mmap() every torch.nn.Module attribute of `owner` (best-effort)."""
+    if not _enabled:
+        return 0
+    import torch
+
+    total = 0
+    for attr, value in list(vars(owner).items()):
+        if isinstance(value, torch.nn.Module):
+            try:
+                total += rebind_to_mmap(value, f"{prefix}.{attr}")
+            except Exception as e:
+                logger.warning(f"mmap: could not share {prefix}.{attr} weights: {e}")
+    return total
@@ -9,22 +9,26 @@ import subprocess
 import logging
 import os
 
+from pipeline import tracing
+
 logger = logging.getLogger(__name__)
 
 
 class GLBOptimizer:
     """Optimize GLB files using gltfpack"""
     
-    def __init__(self, gltfpack_path: str = "gltfpack", require_gltfpack: bool = False):
+    def __init__(self, gltfpack_path: str = "gltfpack", require_gltfpack: bool = False, timeout_seconds: float = 120):
         """
         Initialize GLB optimizer
         
         Args:
             gltfpack_path: Path to gltfpack binary
             require_gltfpack: If true, fail the job when gltfpack is missing or errors
+            timeout_seconds: Hard limit for a single gltfpack run
         """
         self.gltfpack_path = gltfpack_path
         self.require_gltfpack = require_gltfpack
+        self.timeout_seconds = timeout_seconds
         logger.info(f"Initializing GLB optimizer with gltfpack: {gltfpack_path}")
 
         if any(ord(ch) < 32 for ch in gltfpack_path):
@@ -36,7 +40,7 @@ class GLBOptimizer:
                 gltfpack_path,
             )
         
-    def optimize(self, input_path: str, output_path: str, target_triangles: int = 10000) -> str:
+    def optimize(self, input_path: str, output_path: str, target_triangles: int = 10000, deadline=None) -> str:
         """
         Optimize GLB file
         
@@ -44,6 +48,8 @@ class GLBOptimizer:
             input_path: Path to input GLB file
             output_path: Path to save optimized GLB file
             target_triangles: Target triangle count (default: 10000)
+            deadline: Optional Deadline; gltfpack is killed when the remaining budget
+                (capped at timeout_seconds) runs out
             
         Returns:
             Path to optimized GLB file
@@ -62,12 +68,17 @@ class GLBOptimizer:
                 "-tc",  # Compress textures
             ]
             
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            timeout = deadline.timeout(cap=self.timeout_seconds) if deadline is not None else self.timeout_seconds
+
+            # subprocess.run kills the child when the timeout expires.
+            with tracing.span("gltfpack", {"gltfpack.target_triangles": target_triangles, "gltfpack.timeout_s": timeout}):
+                result = subprocess.run(
+                    cmd,
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    timeout=timeout,
+                )
             
             logger.info(f"gltfpack output: {result.stdout}")
             
@@ -81,6 +92,14 @@ class GLBOptimizer:
             
             return output_path
             
+        except subprocess.TimeoutExpired:
+            logger.error(f"gltfpack killed after exceeding its time budget ({input_path})")
+            if deadline is not None:
+                deadline.check("GLB optimization")
+            if self.require_gltfpack:
+                raise RuntimeError("gltfpack timed out") from None
+            logger.warning("Using unoptimized GLB file")
+            return input_path
         except subprocess.CalledProcessError as e:
             logger.error(f"gltfpack failed: {e.stderr}")
             if self.require_gltfpack:
@@ -7,32 +7,65 @@ SMPL-X parameters and meshes.
 
 import sys
 import os
+import tempfile
 import numpy as np
 import torch
 import trimesh
-from typing import Dict, Any
+from typing import Dict, Any, List, Sequence, Tuple
 import logging
 
+from pipeline import instrumentation, mmap_weights
+from pipeline.deadline import DeadlineExceeded
+
 # Add PIXIE to path
 PIXIE_PATH = os.path.join(os.path.dirname(__file__), "PIXIE")
 sys.path.insert(0, PIXIE_PATH)
 
 logger = logging.getLogger(__name__)
 
+# Encoding cache entries: tensors in an .npz, other codedict fields as JSON (never pickled).
+_CODEDICT_NAMESPACE = "pixie-codedict"
+_CODEDICT_TENSORS_FILE = "tensors.npz"
+_CODEDICT_FIELDS_FILE = "fields.json"
+
+
+def _redirect_data_paths(node, old_dir: str, new_dir: str) -> None:
+    """
+    Rewrite paths under PIXIE's bundled data dir in its config to `new_dir` (in place). A path
+    is only redirected when the file exists under `new_dir`; assets missing there keep their
+    bundled PIXIE/data path.
+    """
+    if os.path.abspath(old_dir) == os.path.abspath(new_dir):
+        return
+    old_dir = os.path.abspath(old_dir)
+    for key, value in list(node.items()):
+        if isinstance(value, dict):
+            _redirect_data_paths(value, old_dir, new_dir)
+        elif isinstance(value, str) and os.path.isabs(value) and os.path.abspath(value).startswith(old_dir + os.sep):
+            new_path = os.path.join(new_dir, os.path.relpath(os.path.abspath(value), old_dir))
+            if os.path.exists(new_path):
+                node[key] = new_path
+            else:
+                logger.info(f"PIXIE asset {os.path.basename(value)} not in {new_dir}; using {value}")
+
 
 class PIXIERunner:
     """PIXIE model runner for SMPL-X body reconstruction"""
     
-    def __init__(self, model_dir: str, smplx_model_dir: str):
+    def __init__(self, model_dir: str, smplx_model_dir: str, encoding_cache=None, data_dir: str | None = None):
         """
         Initialize PIXIE model
         
         Args:
             model_dir: Path to PIXIE model directory
             smplx_model_dir: Path to SMPL-X model directory
+            encoding_cache: Optional ResultCache for per-view codedicts (keyed by photo hash)
+            data_dir: PIXIE data dir (pixie_model.tar + assets), read in place; default PIXIE/data
         """
         self.model_dir = model_dir
         self.smplx_model_dir = smplx_model_dir
+        self.data_dir = os.path.abspath(data_dir) if data_dir else os.path.join(PIXIE_PATH, "data")
+        self.encoding_cache = encoding_cache
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.model = None
         self.smplx_model = None
@@ -46,24 +79,119 @@ class PIXIERunner:
             logger.error(f"Failed to load PIXIE models: {e}")
             logger.warning("PIXIE model loading failed - using placeholder mode")
 
-    def _encode_decode(self, image_path: str):
+    def _encoding_cache_key(self, image_path: str) -> str | None:
+        if self.encoding_cache is None:
+            return None
+        from pipeline.result_cache import file_sha256
+
+        use_tex = os.getenv("PIXIE_USE_TEX", "false").lower() == "true"
+        return self.encoding_cache.key("pixie-codedict-npz", file_sha256(image_path), {"useTex": use_tex})
+
+    def _load_cached_codedict(self, cache_key: str | None) -> Dict[str, Any] | None:
+        """
+        Load a cached codedict: tensors from an .npz (allow_pickle=False), everything else
+        from JSON. Entries may come from the MinIO mirror, so nothing is unpickled.
+        """
+        if cache_key is None:
+            return None
+        entry_dir = self.encoding_cache.get_dir(_CODEDICT_NAMESPACE, cache_key)
+        if entry_dir is None or not os.path.isfile(os.path.join(entry_dir, _CODEDICT_TENSORS_FILE)):
+            return None
+        try:
+            import json
+
+            codedict: Dict[str, Any] = {}
+            fields_path = os.path.join(entry_dir, _CODEDICT_FIELDS_FILE)
+            if os.path.isfile(fields_path):
+                with open(fields_path, "r", encoding="utf-8") as f:
+                    codedict.update(json.load(f))
+            with np.load(os.path.join(entry_dir, _CODEDICT_TENSORS_FILE), allow_pickle=False) as npz:
+                for name in npz.files:
+                    codedict[name] = torch.from_numpy(npz[name]).to(self.device)
+            return codedict
+        except Exception as e:
+            logger.warning(f"Failed to load cached PIXIE codedict ({e}); re-encoding")
+            return None
+
+    def _store_cached_codedict(self, cache_key: str | None, codedict: Dict[str, Any]) -> None:
+        if cache_key is None:
+            return
+        try:
+            import json
+
+            tensors = {k: v.detach().cpu().numpy() for k, v in codedict.items() if torch.is_tensor(v)}
+            fields = {k: v for k, v in codedict.items() if not torch.is_tensor(v)}
+            with tempfile.TemporaryDirectory() as tmp:
+                files = {_CODEDICT_TENSORS_FILE: os.path.join(tmp, _CODEDICT_TENSORS_FILE)}
+                np.savez(files[_CODEDICT_TENSORS_FILE], **tensors)
+                if fields:
+                    files[_CODEDICT_FIELDS_FILE] = os.path.join(tmp, _CODEDICT_FIELDS_FILE)
+                    with open(files[_CODEDICT_FIELDS_FILE], "w", encoding="utf-8") as f:
+                        json.dump(fields, f)
+                self.encoding_cache.put_files(_CODEDICT_NAMESPACE, cache_key, files)
+        except Exception as e:
+            logger.warning(f"Failed to cache PIXIE codedict: {e}")
+
+    def _encode(self, image_path: str) -> Dict[str, Any]:
+        """
+        Run the PIXIE encoder on one view. Codedicts are cached per photo hash, so a
+        resubmission only re-encodes views whose photo actually changed.
+        """
+        return self._encode_many([image_path])[0]
+
+    def _encode_many(self, image_paths: List[str]) -> List[Dict[str, Any]]:
+        """Encode several views; cache misses go through the encoder in one batched forward pass."""
+        codedicts: List[Dict[str, Any] | None] = [None] * len(image_paths)
+        cache_keys: List[str | None] = [None] * len(image_paths)
+        misses = []
+        for i, image_path in enumerate(image_paths):
+            try:
+                cache_keys[i] = self._encoding_cache_key(image_path)
+            except Exception as e:
+                logger.warning(f"PIXIE encoding cache unavailable: {e}")
+            codedicts[i] = self._load_cached_codedict(cache_keys[i])
+            if codedicts[i] is not None:
+                logger.info(f"PIXIE encoding cache hit for {os.path.basename(image_path)}")
+            else:
+                misses.append(i)
+
+        if misses:
+            with instrumentation.stage("pixie_encode", batch=len(misses)):
+                encoded = self._encode_uncached_batch([image_paths[i] for i in misses])
+            for i, codedict in zip(misses, encoded):
+                codedicts[i] = codedict
+                self._store_cached_codedict(cache_keys[i], codedict)
+
+        return codedicts  # type: ignore[return-value]
+
+    def _encode_uncached(self, image_path: str) -> Dict[str, Any]:
+        return self._encode_uncached_batch([image_path])[0]
+
+    def _encode_uncached_batch(self, image_paths: List[str]) -> List[Dict[str, Any]]:
+        """One encoder forward pass over all views (TestData crops to fixed sizes, so they stack)."""
         from pixielib.datasets.body_datasets import TestData
         from pixielib.utils import util
 
-        testdata = TestData(image_path, iscrop=False, body_detector="none", device=str(self.device))
-        batch = testdata[0]
-        util.move_dict_to_device(batch, str(self.device))
-        batch["image"] = batch["image"].unsqueeze(0)
-        batch["image_hd"] = batch["image_hd"].unsqueeze(0)
+        samples = []
+        for image_path in image_paths:
+            testdata = TestData(image_path, iscrop=False, body_detector="none", device=str(self.device))
+            sample = testdata[0]
+            util.move_dict_to_device(sample, str(self.device))
+            samples.append(sample)
+        batch = dict(samples[0])
+        batch["image"] = torch.stack([sample["image"] for sample in samples])
+        batch["image_hd"] = torch.stack([sample["image_hd"] for sample in samples])
 
         data = {"body": batch}
 
         with torch.no_grad():
             param_dict = self.model.encode(data, threthold=True, keep_local=True, copy_and_paste=False)
-            codedict = param_dict["body"]
-            opdict = self.model.decode(codedict, param_type="body")
-
-        return codedict, opdict
+        body = param_dict["body"]
+        n = len(image_paths)
+        return [
+            {k: (v[i : i + 1] if torch.is_tensor(v) and v.dim() > 0 and v.shape[0] == n else v) for k, v in body.items()}
+            for i in range(n)
+        ]
 
     def _decode_tpose_vertices(self, codedict: Dict[str, Any]) -> torch.Tensor:
         return self.model.decode_Tpose(codedict)
@@ -129,32 +257,104 @@ class PIXIERunner:
         verts2[:, :, 1:2] = verts2[:, :, 1:2] - min_y
         return verts2
 
-    def build_meshes_from_betas(self, betas10: np.ndarray, height_cm: float) -> Dict[str, Any]:
+    def _canonical_inputs(
+        self, betas: np.ndarray, codes: Sequence[Dict[str, Any] | None]
+    ) -> Tuple[torch.Tensor, torch.Tensor | None, torch.Tensor]:
+        """
+        SMPL-X shape, expression and jaw inputs for canonical bodies.
+
+        Each body starts from its full PIXIE codes when they are known (see `pixie_codes`), with
+        the first shape components replaced by its betas (silhouette refinement only fits
+        those). Bodies without codes get zeros and a closed jaw, i.e. a betas-only body.
+
+        Args:
+            betas: (B, >=10) SMPL-X shape parameters (first 10 are used)
+            codes: Per body, the persisted PIXIE codes or None
+        """
+        betas = np.asarray(betas, dtype=np.float32).reshape(len(codes), -1)[:, :10]
+        batch_size = betas.shape[0]
+        n_shape = max([betas.shape[1]] + [len(c["shape"]) for c in codes if c and c.get("shape") is not None])
+        n_exp = int(self.model.cfg.model.n_exp) if hasattr(self.model, "cfg") else 0
+
+        shape = np.zeros((batch_size, n_shape), dtype=np.float32)
+        exp = np.zeros((batch_size, n_exp), dtype=np.float32)
+        jaw = np.tile(np.eye(3, dtype=np.float32), (batch_size, 1, 1, 1))
+        for i, body_codes in enumerate(codes):
+            if not body_codes:
+                continue
+            if body_codes.get("shape") is not None:
+                full = np.asarray(body_codes["shape"], dtype=np.float32).reshape(-1)
+                shape[i, : len(full)] = full
+            if body_codes.get("expression") is not None and n_exp:
+                expression = np.asarray(body_codes["expression"], dtype=np.float32).reshape(-1)[:n_exp]
+                exp[i, : len(expression)] = expression
+            if body_codes.get("jawPose") is not None:
+                jaw[i, 0] = np.asarray(body_codes["jawPose"], dtype=np.float32).reshape(3, 3)
+        shape[:, : betas.shape[1]] = betas
+
+        return (
+            torch.tensor(shape, device=self.device),
+            torch.tensor(exp, device=self.device) if n_exp else None,
+            torch.tensor(jaw, device=self.device),
+        )
+
+    @staticmethod
+    def pixie_codes(codedict: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        The parts of a PIXIE codedict that shape the canonical body: the full shape code (not
+        just the first 10 betas), the expression code and the jaw rotation. Persisting these
+        lets build_meshes_from_betas reproduce the mesh PIXIE decoded.
+        """
+
+        def first(key: str) -> np.ndarray | None:
+            value = codedict.get(key)
+            if value is None or not torch.is_tensor(value):
+                return None
+            return value.detach().cpu().numpy()[0]
+
+        jaw = first("jaw_pose")
+        return {
+            "shape": first("shape"),
+            "expression": first("exp"),
+            "jawPose": jaw.reshape(3, 3) if jaw is not None and jaw.size == 9 else None,
+        }
+
+    def build_meshes_from_betas(
+        self,
+        betas10: np.ndarray,
+        height_cm: float,
+        display_pose: str | None = None,
+        arm_down_deg: float | None = None,
+        codes: Dict[str, Any] | None = None,
+    ) -> Dict[str, Any]:
         """
         Build the canonical (T-pose) mesh for measurements and the display mesh for rendering,
-        using only SMPL-X shape parameters.
+        from SMPL-X shape parameters.
+
+        Args:
+            betas10: SMPL-X shape parameters (first 10 are used)
+            height_cm: Target height for scaling
+            display_pose: Override AVATAR_DISPLAY_POSE (apose/tpose; pixie falls back to apose)
+            arm_down_deg: Override AVATAR_APOSE_ARM_DOWN_DEG
+            codes: The job's PIXIE codes (`pixie_codes`). Without them the body is built from
+                the 10 betas alone and differs from the mesh PIXIE decoded.
         """
         if self.model is None:
             return self._generate_placeholder_params()
 
-        shape = torch.tensor(np.asarray(betas10, dtype=np.float32).reshape(1, -1)[:, :10], device=self.device)
-        # PIXIE SMPLX expects n_shape, but will accept fewer and pad internally via shapedirs slicing.
-        # Provide zeros for expression/jaw.
-        exp = torch.zeros((1, self.model.cfg.model.n_exp), device=self.device, dtype=torch.float32) if hasattr(self.model, "cfg") else None
-        jaw = torch.eye(3, device=self.device, dtype=torch.float32).view(1, 1, 3, 3)
+        shape, exp, jaw = self._canonical_inputs(betas10, [codes])
 
         # T-pose / neutral body pose
         tpose_verts, _, _ = self.model.smplx(shape_params=shape, expression_params=exp, jaw_pose=jaw)
 
         # Display pose
-        pose = os.getenv("AVATAR_DISPLAY_POSE", "apose").lower()
+        pose = (display_pose or os.getenv("AVATAR_DISPLAY_POSE", "apose")).lower()
+        arm_down = float(arm_down_deg) if arm_down_deg is not None else float(os.getenv("AVATAR_APOSE_ARM_DOWN_DEG", "25"))
         if pose == "tpose":
             display_verts = tpose_verts
-        elif pose == "apose":
-            display_verts = self._decode_apose_vertices({"shape": shape, "exp": exp, "jaw_pose": jaw}, float(os.getenv("AVATAR_APOSE_ARM_DOWN_DEG", "25")))
         else:
-            # If asked for pixie pose but we only have betas, fall back to apose.
-            display_verts = self._decode_apose_vertices({"shape": shape, "exp": exp, "jaw_pose": jaw}, float(os.getenv("AVATAR_APOSE_ARM_DOWN_DEG", "25")))
+            # apose (and pixie: we have no body pose here, so fall back to apose).
+            display_verts = self._decode_apose_vertices({"shape": shape, "exp": exp, "jaw_pose": jaw}, arm_down)
 
         tpose_verts = self._scale_and_ground_vertices(tpose_verts, height_cm)
         display_verts = self._scale_and_ground_vertices(display_verts, height_cm)
@@ -165,6 +365,33 @@ class PIXIERunner:
             "displayMesh": {"vertices": display_verts.detach().cpu().numpy()[0], "faces": faces},
         }
 
+    def measurement_vertices_from_betas(
+        self,
+        betas: np.ndarray,
+        heights_cm: List[float | None],
+        codes: Sequence[Dict[str, Any] | None] | None = None,
+    ) -> np.ndarray | None:
+        """
+        Canonical (T-pose, height-scaled) vertices for many bodies in one SMPL-X forward pass: the
+        mesh build_meshes_from_betas returns under "mesh", without the display pose.
+
+        Args:
+            betas: (B, >=10) SMPL-X shape parameters
+            heights_cm: Target height per body (None leaves the body unscaled)
+            codes: Per body, its PIXIE codes (`pixie_codes`) or None
+
+        Returns:
+            (B, V, 3) float32 vertices, or None when PIXIE/SMPL-X is not loaded
+        """
+        if self.model is None:
+            return None
+
+        shape, exp, jaw = self._canonical_inputs(betas, list(codes) if codes is not None else [None] * len(heights_cm))
+        with torch.no_grad():
+            tpose_verts, _, _ = self.model.smplx(shape_params=shape, expression_params=exp, jaw_pose=jaw)
+            scaled = [self._scale_and_ground_vertices(tpose_verts[i : i + 1], h) for i, h in enumerate(heights_cm)]
+        return torch.cat(scaled, dim=0).detach().cpu().numpy()
+
     def _select_display_vertices(self, codedict: Dict[str, Any], posed_vertices: torch.Tensor | None) -> torch.Tensor:
         pose = os.getenv("AVATAR_DISPLAY_POSE", "apose").lower()
         if pose == "pixie" and posed_vertices is not None:
@@ -177,11 +404,12 @@ class PIXIERunner:
         logger.warning(f"Unknown AVATAR_DISPLAY_POSE={pose!r}; falling back to apose")
         return self._decode_apose_vertices(codedict, arm_down_degrees=25)
 
-    def process_images(self, front_image_path: str, side_image_path: str | None, height_cm: float) -> Dict[str, Any]:
+    def process_images(self, front_image_path: str, side_image_path: str | None, height_cm: float, deadline=None) -> Dict[str, Any]:
         """
         Process front + (optional) side images to generate SMPL-X parameters.
 
         Current strategy (simple + robust): run PIXIE on each image and fuse the shape (betas) by averaging.
+        If a deadline is given it is checked before each view is encoded.
         """
         logger.info(f"Processing images (front={front_image_path}, side={side_image_path}), height: {height_cm}cm")
 
@@ -189,13 +417,18 @@ class PIXIERunner:
             logger.warning("PIXIE model not loaded - using placeholder")
             return self._generate_placeholder_params()
 
+        if deadline is not None:
+            deadline.check("PIXIE encode (front)")
+
         side_ok = bool(side_image_path) and os.path.exists(side_image_path) and os.path.getsize(side_image_path) > 0
         if not side_ok:
             return self.process_image(front_image_path, height_cm)
 
         try:
-            codedict_front, _ = self._encode_decode(front_image_path)
-            codedict_side, _ = self._encode_decode(side_image_path)  # type: ignore[arg-type]
+            codedict_front = self._encode(front_image_path)
+            if deadline is not None:
+                deadline.check("PIXIE encode (side)")
+            codedict_side = self._encode(side_image_path)  # type: ignore[arg-type]
 
             shape_front = codedict_front.get("shape")
             shape_side = codedict_side.get("shape")
@@ -203,46 +436,114 @@ class PIXIERunner:
                 logger.warning("PIXIE did not return shape for one of the images; falling back to front only")
                 return self.process_image(front_image_path, height_cm)
 
-            # Fuse betas (shape) by averaging; keep pose/expression from front.
-            fused_shape = (shape_front + shape_side) / 2.0
-
-            fused_codedict: Dict[str, Any] = {}
-            for key, value in codedict_front.items():
-                if torch.is_tensor(value):
-                    fused_codedict[key] = value.clone()
-                else:
-                    fused_codedict[key] = value
-            fused_codedict["shape"] = fused_shape
-
-            fused_opdict = self.model.decode(fused_codedict, param_type="body")
-
-            posed_verts_t = fused_opdict["vertices"]
-            tpose_verts_t = self._decode_tpose_vertices(fused_codedict)
-            display_verts_t = self._select_display_vertices(fused_codedict, posed_vertices=posed_verts_t)
-
-            tpose_verts_t = self._scale_and_ground_vertices(tpose_verts_t, height_cm)
-            display_verts_t = self._scale_and_ground_vertices(display_verts_t, height_cm)
-
-            verts = tpose_verts_t.detach().cpu().numpy()[0]
-            display_verts = display_verts_t.detach().cpu().numpy()[0]
-            faces = self.model.smplx.faces_tensor.detach().cpu().numpy()
-
-            betas_np = fused_shape.detach().cpu().numpy()[0]
-
-            return {
-                "betas": betas_np[:10],
-                "confidence": 0.9,
-                "placeholder": False,
-                "mesh": {"vertices": verts, "faces": faces},
-                "displayMesh": {"vertices": display_verts, "faces": faces},
-                "heightCm": float(height_cm),
-                "sources": {"front": True, "side": True},
-            }
+            return self._params_from_views(codedict_front, codedict_side, height_cm)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"PIXIE multi-view processing failed: {e}", exc_info=True)
             logger.warning("Falling back to front-only PIXIE output")
             return self.process_image(front_image_path, height_cm)
     
+    def process_images_batch(
+        self, items: List[Tuple[str, str | None, float]], max_batch: int = 8
+    ) -> List[Dict[str, Any]]:
+        """
+        `process_images` for many subjects: their views go through the encoder in batches of up
+        to `max_batch` images, then each subject is fused and decoded on its own.
+
+        Args:
+            items: (front image path, side image path or None, height in cm) per subject
+            max_batch: Images per encoder forward pass
+
+        Returns:
+            SMPL-X parameters per subject, in order (placeholder parameters for a subject whose
+            front view could not be processed)
+        """
+        if self.model is None:
+            logger.warning("PIXIE model not loaded - using placeholder")
+            return [self._generate_placeholder_params() for _ in items]
+
+        views = []
+        for i, (front, side, _) in enumerate(items):
+            views.append((i, "front", front))
+            if side and os.path.exists(side) and os.path.getsize(side) > 0:
+                views.append((i, "side", side))
+
+        codedicts: Dict[Tuple[int, str], Dict[str, Any] | None] = {}
+        for start in range(0, len(views), max(1, int(max_batch))):
+            chunk = views[start : start + max(1, int(max_batch))]
+            try:
+                encoded = self._encode_many([path for _, _, path in chunk])
+            except Exception as e:
+                logger.warning(f"Batched PIXIE encode failed ({e}); encoding these views one at a time")
+                encoded = []
+                for _, _, path in chunk:
+                    try:
+                        encoded.append(self._encode(path))
+                    except Exception as view_error:
+                        logger.error(f"PIXIE encode failed for {path}: {view_error}")
+                        encoded.append(None)
+            for (i, view, _), codedict in zip(chunk, encoded):
+                codedicts[(i, view)] = codedict
+
+        results = []
+        for i, (front, _, height_cm) in enumerate(items):
+            front_codedict, side_codedict = codedicts.get((i, "front")), codedicts.get((i, "side"))
+            try:
+                if front_codedict is None:
+                    raise RuntimeError(f"front view {front} could not be encoded")
+                results.append(self._params_from_views(front_codedict, side_codedict, height_cm))
+            except Exception as e:
+                logger.error(f"PIXIE processing failed for {front}: {e}")
+                results.append(self._generate_placeholder_params())
+        return results
+
+    def _params_from_views(
+        self, codedict_front: Dict[str, Any], codedict_side: Dict[str, Any] | None, height_cm: float
+    ) -> Dict[str, Any]:
+        """
+        Decode SMPL-X parameters and meshes from the front codedict, fusing the side view's
+        shape (betas averaged; pose/expression from the front) when it has one.
+        """
+        fused = (
+            codedict_side is not None
+            and codedict_front.get("shape") is not None
+            and codedict_side.get("shape") is not None
+        )
+        codedict = codedict_front
+        if fused:
+            codedict = {k: (v.clone() if torch.is_tensor(v) else v) for k, v in codedict_front.items()}
+            codedict["shape"] = (codedict_front["shape"] + codedict_side["shape"]) / 2.0
+
+        with instrumentation.stage("pixie_decode"), torch.no_grad():
+            opdict = self.model.decode(codedict, param_type="body")
+            posed_verts_t = opdict["vertices"]
+            tpose_verts_t = self._decode_tpose_vertices(codedict)
+            display_verts_t = self._select_display_vertices(codedict, posed_vertices=posed_verts_t)
+
+        tpose_verts_t = self._scale_and_ground_vertices(tpose_verts_t, height_cm)
+        display_verts_t = self._scale_and_ground_vertices(display_verts_t, height_cm)
+
+        verts = tpose_verts_t.detach().cpu().numpy()[0]
+        display_verts = display_verts_t.detach().cpu().numpy()[0]
+        faces = self.model.smplx.faces_tensor.detach().cpu().numpy()
+
+        betas = codedict.get("shape")
+        betas_np = betas.detach().cpu().numpy()[0] if betas is not None else np.zeros(10)
+
+        params = {
+            "betas": betas_np[:10],
+            "pixieCodes": self.pixie_codes(codedict),
+            "confidence": 0.9 if fused else 0.85,
+            "placeholder": False,
+            "mesh": {"vertices": verts, "faces": faces},
+            "displayMesh": {"vertices": display_verts, "faces": faces},
+            "heightCm": float(height_cm),
+        }
+        if fused:
+            params["sources"] = {"front": True, "side": True}
+        return params
+
     def _load_models(self):
         """Load PIXIE and SMPL-X models"""
         try:
@@ -253,7 +554,8 @@ class PIXIERunner:
             # Load PIXIE model
             logger.info("Loading PIXIE model...")
             pixie_cfg.device = "cuda" if self.device.type == "cuda" else "cpu"
-            pixie_cfg.pretrained_modelpath = os.path.join(PIXIE_PATH, "data", "pixie_model.tar")
+            _redirect_data_paths(pixie_cfg, os.path.join(PIXIE_PATH, "data"), self.data_dir)
+            pixie_cfg.pretrained_modelpath = os.path.join(self.data_dir, "pixie_model.tar")
 
             # Avoid requiring the optional FLAME albedo file (FLAME_albedo_from_BFM.npz) unless explicitly enabled.
             pixie_cfg.model.use_tex = os.getenv("PIXIE_USE_TEX", "false").lower() == "true"
@@ -261,11 +563,17 @@ class PIXIERunner:
             if not os.path.exists(pixie_cfg.pretrained_modelpath):
                 raise FileNotFoundError(
                     f"Missing PIXIE weights at {pixie_cfg.pretrained_modelpath}. "
-                    "PIXIE/data in this repo is incomplete; follow PIXIE instructions to download pixie_model.tar and required assets."
+                    "Sync the pixie/ assets (MODEL_SYNC_*) or set PIXIE_DATA_DIR; follow PIXIE instructions to download pixie_model.tar and required assets."
                 )
 
-            self.model = PIXIE(config=pixie_cfg, device=str(self.device))
+            # No-ops unless mmap loading is enabled (see pipeline.mmap_weights).
+            mmap_weights.register_checkpoint(pixie_cfg.pretrained_modelpath)
+            mmap_weights.register_arrays_dir(self.data_dir)
+
+            with mmap_weights.loading():
+                self.model = PIXIE(config=pixie_cfg, device=str(self.device))
             self.smplx_model = None
+            mmap_weights.rebind_modules(self.model, "pixie")
             
             logger.info("PIXIE and SMPL-X models loaded successfully")
             
@@ -276,6 +584,23 @@ class PIXIERunner:
             logger.error(f"Failed to load models: {e}")
             raise
     
+    def warm_up(self) -> None:
+        """
+        Run one encode + decode on a synthetic image so the first real job does not pay for
+        lazy initialization (kernel selection, allocator growth, first-touch of weight pages).
+        """
+        if self.model is None:
+            return
+        with tempfile.TemporaryDirectory() as tmp:
+            image_path = os.path.join(tmp, "warmup.jpg")
+            from pipeline.mask_provider import write_warmup_image
+
+            write_warmup_image(image_path)
+            codedict = self._encode_uncached(image_path)
+            with torch.no_grad():
+                self.model.decode(codedict, param_type="body")
+                self.build_meshes_from_betas(np.zeros(10, dtype=np.float32), 170.0)
+
     def process_image(self, image_path: str, height_cm: float) -> Dict[str, Any]:
         """
         Process image to generate SMPL-X parameters
@@ -294,30 +619,7 @@ class PIXIERunner:
             return self._generate_placeholder_params()
         
         try:
-            codedict, opdict = self._encode_decode(image_path)
-
-            posed_verts_t = opdict["vertices"]
-            tpose_verts_t = self._decode_tpose_vertices(codedict)
-            display_verts_t = self._select_display_vertices(codedict, posed_vertices=posed_verts_t)
-
-            tpose_verts_t = self._scale_and_ground_vertices(tpose_verts_t, height_cm)
-            display_verts_t = self._scale_and_ground_vertices(display_verts_t, height_cm)
-
-            verts = tpose_verts_t.detach().cpu().numpy()[0]
-            display_verts = display_verts_t.detach().cpu().numpy()[0]
-            faces = self.model.smplx.faces_tensor.detach().cpu().numpy()
-
-            betas = codedict.get("shape")
-            betas_np = betas.detach().cpu().numpy()[0] if betas is not None else np.zeros(10)
-
-            return {
-                "betas": betas_np[:10],
-                "confidence": 0.85,
-                "placeholder": False,
-                "mesh": {"vertices": verts, "faces": faces},
-                "displayMesh": {"vertices": display_verts, "faces": faces},
-                "heightCm": float(height_cm),
-            }
+            return self._params_from_views(self._encode(image_path), None, height_cm)
         except Exception as e:
             logger.error(f"PIXIE processing failed: {e}", exc_info=True)
             logger.warning("Falling back to placeholder parameters")
@@ -0,0 +1,213 @@
+"""
+On-demand per-job profiling
+
+A job is profiled when its data sets `"profile": true` (or a mode name, see below), or when it
+is picked by PROFILING_SAMPLE_RATE. A profiled job runs inside `JobProfiler`, which writes its
+output to a scratch directory and uploads it to `avatars/<job_id>/profile/` when the job ends
+(success or failure):
+
+- mode "sampling" (default): a background thread samples the job thread's Python stack every
+  PROFILING_SAMPLE_INTERVAL_MS and writes `stacks.folded` (collapsed stacks, for flamegraph.pl,
+  speedscope or inferno). Low overhead, wall-clock attribution.
+- mode "cprofile": deterministic cProfile of the job thread; writes `profile.pstats` (snakeviz,
+  gprof2dot, flameprof) and `profile.txt` (top functions by cumulative time). Exact call counts,
+  but inflates the cost of Python-heavy code.
+
+Model stages additionally wrap themselves in `model_stage(name)`, which runs torch.profiler
+(CPU, plus CUDA when in use) while a session is active and writes `torch_<stage>.json`
+(Chrome trace, open in chrome://tracing or Perfetto) and `torch_<stage>.txt` (op summary).
+
+When a job is not profiled nothing is installed: `model_stage` returns a shared no-op context.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sampling", "cprofile")
+
+_local = threading.local()
+_NULL = contextlib.nullcontext()
+_CONTENT_TYPES = {".json": "application/json", ".txt": "text/plain", ".folded": "text/plain"}
+
+
+def requested_mode(job_data: Dict[str, Any], sample_rate: float, default_mode: str) -> Optional[str]:
+    """
+    Profiling mode for a job, or None when it is not profiled.
+
+    Args:
+        job_data: `profile` may be true/false or a mode name ("sampling"/"cprofile")
+        sample_rate: Fraction of other jobs to profile (0 disables sampling)
+        default_mode: Mode used for `profile: true` and sampled jobs
+    """
+    if default_mode not in PROFILE_MODES:
+        default_mode = "sampling"
+    flag = job_data.get("profile")
+    if isinstance(flag, str):
+        flag = flag.strip().lower()
+        if flag in PROFILE_MODES:
+            return flag
+        flag = flag in ("1", "true", "yes")
+    if flag:
+        return default_mode
+    if sample_rate > 0 and random.random() < sample_rate:
+        return default_mode
+    return None
+
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack into collapsed-stack counts."""
+
+    def __init__(self, thread_id: int, interval_seconds: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval_seconds
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def write_folded(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _session() -> Optional["JobProfiler"]:
+    return getattr(_local, "session", None)
+
+
+class JobProfiler:
+    """
+    Profile one job on the current thread and upload the output to object storage.
+
+    Use as a context manager around the whole job (all attempts).
+    """
+
+    def __init__(
+        self,
+        job_id: str,
+        storage,
+        mode: str = "sampling",
+        sample_interval_ms: float = 5.0,
+        torch_enabled: bool = True,
+    ):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.job_id = job_id
+        self.storage = storage
+        self.mode = mode
+        self.sample_interval = max(0.0005, float(sample_interval_ms) / 1000.0)
+        self.torch_enabled = torch_enabled
+        self.out_dir = ""
+        self._stage_counts: Counter = Counter()
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_StackSampler] = None
+        self._started = 0.0
+
+    def __enter__(self) -> "JobProfiler":
+        self.out_dir = tempfile.mkdtemp(prefix=f"profile-{self.job_id}-")
+        self._started = time.perf_counter()
+        if self.mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = _StackSampler(threading.get_ident(), self.sample_interval)
+            self._sampler.start()
+        _local.session = self
+        logger.info(f"Profiling job {self.job_id} ({self.mode})")
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _local.session = None
+        wall = time.perf_counter() - self._started
+        try:
+            if self._profile is not None:
+                self._profile.disable()
+                self._profile.dump_stats(os.path.join(self.out_dir, "profile.pstats"))
+                text = io.StringIO()
+                pstats.Stats(self._profile, stream=text).sort_stats("cumulative").print_stats(80)
+                with open(os.path.join(self.out_dir, "profile.txt"), "w", encoding="utf-8") as f:
+                    f.write(text.getvalue())
+            if self._sampler is not None:
+                self._sampler.stop()
+                self._sampler.write_folded(os.path.join(self.out_dir, "stacks.folded"))
+            self._upload(wall)
+        except Exception as e:
+            logger.warning(f"Failed to write/upload profile for job {self.job_id}: {e}")
+        finally:
+            shutil.rmtree(self.out_dir, ignore_errors=True)
+
+    def _upload(self, wall: float) -> None:
+        prefix = f"avatars/{self.job_id}/profile"
+        uploaded = 0
+        for name in sorted(os.listdir(self.out_dir)):
+            content_type = _CONTENT_TYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+            self.storage.upload_file(os.path.join(self.out_dir, name), f"{prefix}/{name}", content_type=content_type)
+            uploaded += 1
+        samples = f", {self._sampler.samples} samples" if self._sampler is not None else ""
+        logger.info(f"Uploaded {uploaded} profile files for job {self.job_id} to {prefix}/ ({wall:.1f}s{samples})")
+
+    @contextlib.contextmanager
+    def _torch_stage(self, name: str) -> Iterator[None]:
+        try:
+            import torch
+            from torch.profiler import ProfilerActivity, profile
+        except Exception:
+            yield
+            return
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available() and torch.cuda.is_initialized():
+            activities.append(ProfilerActivity.CUDA)
+        self._stage_counts[name] += 1
+        n = self._stage_counts[name]
+        base = os.path.join(self.out_dir, f"torch_{name}" + (f"_{n}" if n > 1 else ""))
+        with profile(activities=activities) as prof:
+            yield
+        try:
+            prof.export_chrome_trace(base + ".json")
+            sort_by = "self_cuda_time_total" if len(activities) > 1 else "self_cpu_time_total"
+            with open(base + ".txt", "w", encoding="utf-8") as f:
+                f.write(prof.key_averages().table(sort_by=sort_by, row_limit=40))
+        except Exception as e:
+            logger.warning(f"Failed to export torch profile for stage {name}: {e}")
+
+
+def model_stage(name: str):
+    """torch.profiler around a model stage while the current thread's job is profiled; else a no-op."""
+    session = _session()
+    if session is None or not session.torch_enabled:
+        return _NULL
+    return session._torch_stage(name)
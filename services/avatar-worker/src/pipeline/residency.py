@@ -0,0 +1,241 @@
+"""
+Model residency manager
+
+Keeps the worker's models (PIXIE, the SMPL-Anthropometry measurer, the mask provider with
+SAM3D Body's estimator/detector/segmentor/FOV models) resident only while memory allows:
+
+- models are registered with a loader and loaded on first use (or preloaded at startup)
+- each resident model's footprint is measured per device from the torch tensors it holds
+  (re-measured on every budget check, so lazily-built parts such as SAM3D's estimator count)
+- when a device exceeds its budget, least-recently-used models are offloaded (moved to CPU,
+  if the model supports `.to()` and the CPU budget allows) or evicted; an evicted model is
+  reloaded transparently on its next use (cheap with memory-mapped weights)
+
+Eviction only drops the manager's reference: a job still holding the object keeps it alive
+until it finishes, so budgets are enforced between uses, never mid-inference.
+"""
+
+from __future__ import annotations
+
+import gc
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def parse_budgets(value: str) -> Dict[str, int]:
+    """Parse "cpu=6000,cuda=10000" (MB) into {"cpu": bytes, "cuda": bytes}; empty = unlimited."""
+    budgets: Dict[str, int] = {}
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        device, _, mb = item.partition("=")
+        if not mb.strip():
+            raise ValueError(f"Invalid memory budget: {item!r} (expected device=MB)")
+        budgets[device.strip().lower()] = int(float(mb) * 1024 * 1024)
+    return budgets
+
+
+def measure_footprint(obj: Any, max_depth: int = 4) -> Dict[str, int]:
+    """
+    Bytes held in torch tensors reachable from `obj` (module parameters/buffers, tensor
+    attributes), per device type. Shared storages are counted once.
+    """
+    try:
+        import torch
+    except Exception:
+        return {}
+
+    seen_objs = set()
+    seen_storages = set()
+    totals: Dict[str, int] = {}
+
+    def add_tensor(t) -> None:
+        try:
+            key = (t.device.type, t.untyped_storage().data_ptr())
+            if key in seen_storages:
+                return
+            seen_storages.add(key)
+            totals[t.device.type] = totals.get(t.device.type, 0) + t.untyped_storage().nbytes()
+        except Exception:
+            pass
+
+    def walk(value: Any, depth: int) -> None:
+        if value is None or id(value) in seen_objs or depth > max_depth:
+            return
+        seen_objs.add(id(value))
+        if isinstance(value, torch.Tensor):
+            add_tensor(value)
+        elif isinstance(value, torch.nn.Module):
+            for t in value.parameters():
+                add_tensor(t)
+            for t in value.buffers():
+                add_tensor(t)
+        elif isinstance(value, dict):
+            for v in value.values():
+                walk(v, depth + 1)
+        elif isinstance(value, (list, tuple)):
+            for v in value:
+                walk(v, depth + 1)
+        elif hasattr(value, "__dict__") and not isinstance(value, type):
+            for v in vars(value).values():
+                walk(v, depth + 1)
+
+    walk(obj, 0)
+    return totals
+
+
+@dataclass
+class _Entry:
+    name: str
+    loader: Callable[[], Any]
+    obj: Any = None
+    loads: int = 0
+    last_used: float = 0.0
+    footprint: Dict[str, int] = field(default_factory=dict)
+    offloaded_from: Optional[str] = None
+
+
+class ModelResidency:
+    """Load-on-first-use model registry with per-device memory budgets and LRU eviction."""
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            budgets: Bytes per device type ("cpu", "cuda"); missing/<= 0 = unlimited
+        """
+        self.budgets = {k: v for k, v in (budgets or {}).items() if v and v > 0}
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()  # LRU order: oldest first
+        self._lock = threading.RLock()
+        if self.budgets:
+            summary = ", ".join(f"{d}={b / 1e6:.0f}MB" for d, b in self.budgets.items())
+            logger.info(f"Model residency budgets: {summary}")
+
+    def register(self, name: str, loader: Callable[[], Any], obj: Any = None) -> None:
+        """Register a model (optionally already loaded)."""
+        with self._lock:
+            self._entries[name] = _Entry(name=name, loader=loader, obj=obj, loads=1 if obj is not None else 0)
+            if obj is not None:
+                self._entries[name].last_used = time.monotonic()
+
+    def is_resident(self, name: str) -> bool:
+        with self._lock:
+            entry = self._entries.get(name)
+            return entry is not None and entry.obj is not None
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it if needed, and enforce budgets around it."""
+        with self._lock:
+            entry = self._entries[name]
+            if entry.obj is None:
+                started = time.monotonic()
+                entry.obj = entry.loader()
+                entry.loads += 1
+                logger.info(
+                    f"Residency: loaded {name} in {time.monotonic() - started:.1f}s"
+                    + (f" (reload #{entry.loads - 1})" if entry.loads > 1 else "")
+                )
+            elif entry.offloaded_from is not None:
+                entry.obj.to(entry.offloaded_from)
+                logger.info(f"Residency: moved {name} back to {entry.offloaded_from}")
+                entry.offloaded_from = None
+            entry.last_used = time.monotonic()
+            self._entries.move_to_end(name)
+            self._enforce(keep=name)
+            return entry.obj
+
+    def preload(self, *names: str) -> None:
+        for name in names:
+            if name in self._entries:
+                self.get(name)
+
+    def evict(self, name: str) -> bool:
+        """Drop a resident model (it is reloaded on next use)."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.obj is None:
+                return False
+            entry.obj = None
+            entry.footprint = {}
+            entry.offloaded_from = None
+        gc.collect()
+        try:
+            import torch
+
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except Exception:
+            pass
+        logger.info(f"Residency: evicted {name}")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                name: {
+                    "resident": entry.obj is not None,
+                    "loads": entry.loads,
+                    "footprintBytes": dict(entry.footprint),
+                }
+                for name, entry in self._entries.items()
+            }
+
+    def _usage(self) -> Dict[str, int]:
+        usage: Dict[str, int] = {}
+        for entry in self._entries.values():
+            if entry.obj is None:
+                continue
+            entry.footprint = measure_footprint(entry.obj)
+            for device, nbytes in entry.footprint.items():
+                usage[device] = usage.get(device, 0) + nbytes
+        return usage
+
+    def _enforce(self, keep: str) -> None:
+        if not self.budgets:
+            return
+        usage = self._usage()
+        for device, budget in self.budgets.items():
+            if usage.get(device, 0) <= budget:
+                continue
+            for entry in list(self._entries.values()):
+                if usage.get(device, 0) <= budget:
+                    break
+                if entry.name == keep or entry.obj is None or not entry.footprint.get(device):
+                    continue
+                freed = entry.footprint[device]
+                if device != "cpu" and self._offload_to_cpu(entry, usage):
+                    usage[device] -= freed
+                    continue
+                for d, nbytes in entry.footprint.items():
+                    usage[d] = usage.get(d, 0) - nbytes
+                self.evict(entry.name)
+            if usage.get(device, 0) > budget:
+                logger.warning(
+                    f"Residency: {device} usage {usage[device] / 1e6:.0f}MB exceeds budget "
+                    f"{budget / 1e6:.0f}MB with only in-use models left ({keep})"
+                )
+
+    def _offload_to_cpu(self, entry: _Entry, usage: Dict[str, int]) -> bool:
+        """Move a model to CPU instead of dropping it, when it supports `.to()` and CPU has room."""
+        to = getattr(entry.obj, "to", None)
+        if not callable(to):
+            return False
+        moving = sum(n for d, n in entry.footprint.items() if d != "cpu")
+        cpu_budget = self.budgets.get("cpu")
+        if cpu_budget is not None and usage.get("cpu", 0) + moving > cpu_budget:
+            return False
+        try:
+            to("cpu")
+        except Exception as e:
+            logger.warning(f"Residency: offloading {entry.name} to CPU failed ({e}); evicting")
+            return False
+        usage["cpu"] = usage.get("cpu", 0) + moving
+        entry.offloaded_from = next((d for d, n in entry.footprint.items() if d != "cpu" and n), None)
+        logger.info(f"Residency: offloaded {entry.name} to CPU ({moving / 1e6:.0f}MB)")
+        return True
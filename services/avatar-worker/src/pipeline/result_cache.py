@@ -0,0 +1,314 @@
+"""
+Content-addressed result cache.
+
+Stage outputs (per-view PIXIE codedicts, masks, silhouette targets, refined betas) are
+stored under a key derived from the content of their inputs (photo hashes, relevant
+settings) plus the pipeline version. A resubmission with the same photos then skips
+every stage whose inputs are unchanged.
+
+Layout (local and remote are mirrors of each other):
+    <root>/<namespace>/<key[:2]>/<key>/entry.json   (manifest: file names + sizes)
+    <root>/<namespace>/<key[:2]>/<key>/<files...>
+
+Eviction:
+- local: LRU by entry mtime (touched on every hit), bounded by `max_bytes`
+- remote (MinIO): bucket lifecycle rule expiring objects under the cache prefix after N days
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST = "entry.json"
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Stream a file through SHA-256 and return the hex digest."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Local + (optional) MinIO mirrored cache of stage outputs."""
+
+    def __init__(
+        self,
+        root_dir: str,
+        version: str,
+        max_bytes: int = 2 * 1024 * 1024 * 1024,
+        storage=None,
+        remote_prefix: str = "cache",
+        remote_ttl_days: int = 0,
+        remote_rule_id: str = "tryfitted-result-cache-expiry",
+    ):
+        """
+        Args:
+            root_dir: Local cache directory
+            version: Pipeline version; part of every key so a bump invalidates old entries
+            max_bytes: Local size budget (LRU eviction beyond this)
+            storage: Optional StorageClient used to mirror entries into MinIO
+            remote_prefix: Object prefix for remote entries
+            remote_ttl_days: If > 0, install a lifecycle rule expiring remote entries
+            remote_rule_id: ID of that lifecycle rule (one per store sharing a bucket)
+        """
+        self.root_dir = os.path.abspath(root_dir)
+        self.version = str(version)
+        self.max_bytes = int(max_bytes)
+        self.storage = storage
+        self.remote_prefix = remote_prefix.strip("/")
+        self.remote_rule_id = remote_rule_id
+        os.makedirs(self.root_dir, exist_ok=True)
+        logger.info(f"Initialized result cache: {self.root_dir} (version={self.version}, max={self.max_bytes} bytes)")
+
+        if self.storage is not None and remote_ttl_days > 0:
+            self._ensure_remote_expiry(remote_ttl_days)
+
+    def key(self, *parts: Any) -> str:
+        """Build a content key from JSON-serializable parts (plus the pipeline version)."""
+        payload = json.dumps([self.version, *parts], sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, namespace: str, key: str) -> str:
+        return os.path.join(self.root_dir, namespace, key[:2], key)
+
+    def _remote_name(self, namespace: str, key: str, name: str) -> str:
+        return f"{self.remote_prefix}/{namespace}/{key[:2]}/{key}/{name}"
+
+    # --- read -------------------------------------------------------------------------
+
+    def get_dir(self, namespace: str, key: str) -> Optional[str]:
+        """
+        Return the local directory of a cached entry, fetching it from MinIO on a local miss.
+
+        Returns:
+            Directory path, or None on a miss
+        """
+        entry_dir = self._entry_dir(namespace, key)
+        if os.path.isfile(os.path.join(entry_dir, _MANIFEST)):
+            try:
+                os.utime(entry_dir, None)
+            except OSError:
+                pass
+            return entry_dir
+
+        if self.storage is None:
+            return None
+        return self._fetch_remote(namespace, key)
+
+    def get_file(self, namespace: str, key: str, name: str) -> Optional[str]:
+        entry_dir = self.get_dir(namespace, key)
+        if entry_dir is None:
+            return None
+        path = os.path.join(entry_dir, name)
+        return path if os.path.isfile(path) else None
+
+    def get_json(self, namespace: str, key: str) -> Optional[Any]:
+        path = self.get_file(namespace, key, "value.json")
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Result cache: corrupt entry {namespace}/{key} ({e}); ignoring")
+            return None
+
+    # --- write ------------------------------------------------------------------------
+
+    def put_files(self, namespace: str, key: str, files: Dict[str, str]) -> Optional[str]:
+        """
+        Store files (name -> source path) as one entry. Best-effort: failures are logged, not raised.
+
+        Returns:
+            Entry directory, or None if the entry could not be written
+        """
+        entry_dir = self._entry_dir(namespace, key)
+        parent = os.path.dirname(entry_dir)
+        try:
+            os.makedirs(parent, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix=".staging-", dir=parent)
+            sizes: Dict[str, int] = {}
+            for name, src in files.items():
+                dest = os.path.join(staging, name)
+                shutil.copyfile(src, dest)
+                sizes[name] = os.path.getsize(dest)
+            with open(os.path.join(staging, _MANIFEST), "w", encoding="utf-8") as f:
+                json.dump({"version": self.version, "createdAt": time.time(), "files": sizes}, f)
+
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(staging, entry_dir)
+        except Exception as e:
+            logger.warning(f"Result cache: failed to store {namespace}/{key}: {e}")
+            return None
+
+        if self.storage is not None:
+            self._push_remote(namespace, key, entry_dir)
+
+        self.evict()
+        return entry_dir
+
+    def put_json(self, namespace: str, key: str, value: Any) -> Optional[str]:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "value.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            return self.put_files(namespace, key, {"value.json": path})
+
+    def delete(self, namespace: str, key: str, remote: bool = False) -> None:
+        """
+        Drop a local entry, and with `remote` its MinIO copy (otherwise that is left to the
+        lifecycle expiry). Best-effort.
+        """
+        shutil.rmtree(self._entry_dir(namespace, key), ignore_errors=True)
+        if not remote or self.storage is None:
+            return
+        try:
+            # Manifest first: without it the remote entry reads as a miss even if the rest stays.
+            self.storage.delete_file(self._remote_name(namespace, key, _MANIFEST))
+            self.storage.delete_prefix(self._remote_name(namespace, key, ""))
+        except Exception as e:
+            logger.warning(f"Result cache: failed to delete {namespace}/{key} from MinIO: {e}")
+
+    # --- remote mirror ----------------------------------------------------------------
+
+    def _push_remote(self, namespace: str, key: str, entry_dir: str) -> None:
+        try:
+            names = [n for n in os.listdir(entry_dir) if n != _MANIFEST]
+            for name in names:
+                self.storage.upload_file(os.path.join(entry_dir, name), self._remote_name(namespace, key, name))
+            # Manifest last: its presence marks a complete remote entry.
+            self.storage.upload_file(
+                os.path.join(entry_dir, _MANIFEST),
+                self._remote_name(namespace, key, _MANIFEST),
+                content_type="application/json",
+            )
+        except Exception as e:
+            logger.warning(f"Result cache: failed to mirror {namespace}/{key} to MinIO: {e}")
+
+    def _fetch_remote(self, namespace: str, key: str) -> Optional[str]:
+        entry_dir = self._entry_dir(namespace, key)
+        parent = os.path.dirname(entry_dir)
+        staging = None
+        try:
+            os.makedirs(parent, exist_ok=True)
+            manifest_name = self._remote_name(namespace, key, _MANIFEST)
+            if hasattr(self.storage, "exists") and not self.storage.exists(manifest_name):
+                return None
+            staging = tempfile.mkdtemp(prefix=".fetch-", dir=parent)
+            manifest_path = os.path.join(staging, _MANIFEST)
+            self.storage.download_file(manifest_name, manifest_path)
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            for name in (manifest.get("files") or {}):
+                self.storage.download_file(self._remote_name(namespace, key, name), os.path.join(staging, name))
+            os.replace(staging, entry_dir)
+            staging = None
+            logger.info(f"Result cache: fetched {namespace}/{key} from MinIO")
+            return entry_dir
+        except Exception:
+            # Missing remote entry is the common case; stay quiet.
+            return None
+        finally:
+            if staging is not None:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def _ensure_remote_expiry(self, ttl_days: int) -> None:
+        """
+        Make sure the bucket has a lifecycle rule expiring remote cache entries after `ttl_days`.
+
+        set_bucket_lifecycle replaces the bucket's whole lifecycle configuration, so the current
+        one is read first and only our rule (matched by its ID) is added or updated. Nothing is
+        written when the rule is already in place.
+        """
+        try:
+            from minio.commonconfig import ENABLED, Filter
+            from minio.lifecycleconfig import Expiration, LifecycleConfig, Rule
+
+            client = getattr(self.storage, "client", None)
+            bucket = getattr(self.storage, "bucket", None)
+            if client is None or bucket is None:
+                return
+            rule_id = self.remote_rule_id
+            prefix = f"{self.remote_prefix}/"
+            current = client.get_bucket_lifecycle(bucket)
+            rules = list(current.rules) if current is not None else []
+            existing = next((r for r in rules if r.rule_id == rule_id), None)
+            if (
+                existing is not None
+                and existing.status == ENABLED
+                and existing.rule_filter is not None
+                and existing.rule_filter.prefix == prefix
+                and existing.expiration is not None
+                and existing.expiration.days == int(ttl_days)
+            ):
+                return
+
+            rule = Rule(
+                ENABLED,
+                rule_filter=Filter(prefix=prefix),
+                rule_id=rule_id,
+                expiration=Expiration(days=int(ttl_days)),
+            )
+            rules = [r for r in rules if r.rule_id != rule_id] + [rule]
+            client.set_bucket_lifecycle(bucket, LifecycleConfig(rules))
+            logger.info(f"Result cache: remote entries under {prefix} expire after {ttl_days} day(s)")
+        except Exception as e:
+            logger.warning(f"Result cache: could not set remote lifecycle rule: {e}")
+
+    # --- eviction ---------------------------------------------------------------------
+
+    def evict(self) -> int:
+        """
+        Evict least-recently-used local entries until the cache fits `max_bytes`.
+
+        Returns:
+            Number of evicted entries
+        """
+        entries = []
+        total = 0
+        for dirpath, dirnames, filenames in os.walk(self.root_dir):
+            if _MANIFEST not in filenames:
+                continue
+            dirnames[:] = []
+            size = 0
+            for name in filenames:
+                try:
+                    size += os.path.getsize(os.path.join(dirpath, name))
+                except OSError:
+                    pass
+            try:
+                mtime = os.path.getmtime(dirpath)
+            except OSError:
+                continue
+            entries.append((mtime, size, dirpath))
+            total += size
+
+        if total <= self.max_bytes:
+            return 0
+
+        evicted = 0
+        for _, size, dirpath in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(dirpath, ignore_errors=True)
+            total -= size
+            evicted += 1
+
+        logger.info(f"Result cache: evicted {evicted} entr{'y' if evicted == 1 else 'ies'} (now {total} bytes)")
+        return evicted
@@ -47,6 +47,17 @@ class SilhouetteTargets:
             "debug": self.debug,
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "SilhouetteTargets":
+        return cls(
+            height_px=int(data["heightPx"]),
+            px_to_cm=float(data["pxToCm"]),
+            chest_cm=float(data["chestCm"]),
+            waist_cm=float(data["waistCm"]),
+            hip_cm=float(data["hipCm"]),
+            debug=data.get("debug") or {},
+        )
+
 
 def _read_mask(mask_path: str) -> np.ndarray:
     mask = cv2.imread(mask_path, cv2.IMREAD_GRAYSCALE)
@@ -9,7 +9,10 @@ from minio import Minio
 from minio.error import S3Error
 import logging
 import os
-from typing import Optional
+import shutil
+from typing import Iterator, Optional
+
+from pipeline import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -98,12 +101,31 @@ class StorageClient:
         """
         try:
             logger.info(f"Downloading {object_name} from MinIO to {file_path}")
-            self.client.fget_object(self.bucket, object_name, file_path)
+            with tracing.span("minio.download", {"minio.bucket": self.bucket, "minio.object": object_name}) as span:
+                self.client.fget_object(self.bucket, object_name, file_path)
+                tracing.set_attributes(span, {"minio.bytes": os.path.getsize(file_path)})
             return file_path
         except S3Error as e:
             logger.error(f"Failed to download {object_name}: {e}")
             raise
     
+    def exists(self, object_name: str) -> bool:
+        """
+        Check whether an object exists in MinIO
+
+        Args:
+            object_name: Object name in MinIO
+
+        Returns:
+            True if the object exists, False otherwise
+        """
+        try:
+            with tracing.span("minio.stat", {"minio.bucket": self.bucket, "minio.object": object_name}):
+                self.client.stat_object(self.bucket, object_name)
+            return True
+        except S3Error:
+            return False
+
     def upload_file(self, file_path: str, object_name: str, content_type: Optional[str] = None) -> str:
         """
         Upload file to MinIO
@@ -131,12 +153,14 @@ class StorageClient:
                 }
                 content_type = content_type_map.get(ext, "application/octet-stream")
             
-            self.client.fput_object(
-                self.bucket,
-                object_name,
-                file_path,
-                content_type=content_type
-            )
+            attributes = {"minio.bucket": self.bucket, "minio.object": object_name, "minio.bytes": os.path.getsize(file_path)}
+            with tracing.span("minio.upload", attributes):
+                self.client.fput_object(
+                    self.bucket,
+                    object_name,
+                    file_path,
+                    content_type=content_type
+                )
             
             logger.info(f"Successfully uploaded {object_name}")
             return object_name
@@ -145,6 +169,46 @@ class StorageClient:
             logger.error(f"Failed to upload {file_path}: {e}")
             raise
     
+    def delete_file(self, object_name: str) -> None:
+        """
+        Delete an object from MinIO (deleting a missing object is not an error)
+
+        Args:
+            object_name: Object name in MinIO
+        """
+        with tracing.span("minio.delete", {"minio.bucket": self.bucket, "minio.object": object_name}):
+            self.client.remove_object(self.bucket, object_name)
+
+    def delete_prefix(self, prefix: str) -> int:
+        """
+        Delete every object under a prefix
+
+        Args:
+            prefix: Object name prefix ending in "/" (e.g. "checkpoints/<namespace>/ab/<key>/")
+
+        Returns:
+            Number of deleted objects
+        """
+        deleted = 0
+        for obj in self.client.list_objects(self.bucket, prefix=prefix, recursive=True):
+            self.delete_file(obj.object_name)
+            deleted += 1
+        return deleted
+
+    def list_prefixes(self, prefix: str) -> Iterator[str]:
+        """
+        List the "directories" directly under a prefix (non-recursive listing)
+
+        Args:
+            prefix: Object name prefix ending in "/" (e.g. "avatars/")
+
+        Yields:
+            Child prefixes, e.g. "avatars/<job_id>/"
+        """
+        for obj in self.client.list_objects(self.bucket, prefix=prefix, recursive=False):
+            if obj.is_dir:
+                yield obj.object_name
+
     def get_public_url(self, object_name: str) -> str:
         """
         Get public URL for object
@@ -157,3 +221,60 @@ class StorageClient:
         """
         protocol = "https" if self.secure else "http"
         return f"{protocol}://{self.endpoint}/{self.bucket}/{object_name}"
+
+
+class LocalStorageClient:
+    """Filesystem-backed stand-in for StorageClient (offline runs, benchmarks)"""
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Directory holding objects at <root>/<object_name>
+        """
+        self.root = os.path.abspath(root)
+        self.bucket = os.path.basename(self.root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, object_name: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, object_name))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Object name escapes the storage root: {object_name}")
+        return path
+
+    def download_file(self, object_name: str, file_path: str) -> str:
+        shutil.copyfile(self._path(object_name), file_path)
+        return file_path
+
+    def exists(self, object_name: str) -> bool:
+        return os.path.isfile(self._path(object_name))
+
+    def upload_file(self, file_path: str, object_name: str, content_type: Optional[str] = None) -> str:
+        dest = self._path(object_name)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        shutil.copyfile(file_path, dest)
+        return object_name
+
+    def delete_file(self, object_name: str) -> None:
+        try:
+            os.remove(self._path(object_name))
+        except FileNotFoundError:
+            pass
+
+    def delete_prefix(self, prefix: str) -> int:
+        directory = self._path(prefix)
+        if not os.path.isdir(directory):
+            return 0
+        deleted = sum(len(files) for _, _, files in os.walk(directory))
+        shutil.rmtree(directory, ignore_errors=True)
+        return deleted
+
+    def list_prefixes(self, prefix: str) -> Iterator[str]:
+        directory = os.path.join(self.root, prefix)
+        if not os.path.isdir(directory):
+            return
+        for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+            if entry.is_dir():
+                yield f"{prefix}{entry.name}/"
+
+    def get_public_url(self, object_name: str) -> str:
+        return "file://" + self._path(object_name)
@@ -0,0 +1,203 @@
+"""
+Distributed tracing (OpenTelemetry, optional)
+
+The worker continues the trace context the producer put into the job data (W3C `traceparent` /
+`tracestate`, either top-level or under `traceContext`) and emits:
+
+- `queue.wait`: from the BullMQ enqueue timestamp (+ delay) until the worker picked the job up
+- `job <type>`: the whole job, all attempts
+- `stage <name>`: every instrumentation stage (see instrumentation.stage), with its attributes
+- `minio.*`: StorageClient calls
+- `api.*`: APIClient calls (the trace context is propagated in the request headers)
+- `gltfpack`: the optimizer subprocess
+
+so queue wait, stages, transfers and status callbacks line up in one timeline.
+
+Exporters (TRACING_EXPORTER): none (default), console, file (JSON lines to TRACING_FILE_PATH),
+otlp (OTLP/HTTP, else gRPC; endpoint and headers from the standard OTEL_EXPORTER_OTLP_* env
+vars), or `module:factory` returning any SpanExporter. opentelemetry-sdk is optional: without
+it (or with TRACING_EXPORTER=none) every helper here is a no-op.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import importlib
+import logging
+import time
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+_tracer = None
+_NULL = contextlib.nullcontext()
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def _make_exporter(kind: str, file_path: str):
+    if kind == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        return ConsoleSpanExporter()
+    if kind == "file":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        out = open(file_path, "a", encoding="utf-8")
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    if kind == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    module_name, sep, attr = kind.partition(":")
+    if not sep:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {kind}")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+def configure(exporter: str, service_name: str = "avatar-worker", file_path: str = "", sample_ratio: float = 1.0) -> bool:
+    """
+    Install the tracer provider. Call once per process before jobs run (BatchSpanProcessor
+    re-initializes itself in forked children).
+
+    Args:
+        exporter: none | console | file | otlp | module:factory
+        service_name: service.name resource attribute
+        file_path: Output file for the "file" exporter
+        sample_ratio: Fraction of root traces sampled; a sampled parent context is always honored
+
+    Returns:
+        True if tracing is active
+    """
+    global _tracer
+    kind = (exporter or "none").strip()
+    if kind.lower() in ("", "none", "off", "false"):
+        return False
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+        from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+    except ImportError:
+        logger.warning(f"TRACING_EXPORTER={kind} but opentelemetry-sdk is not installed; tracing disabled")
+        return False
+
+    try:
+        span_exporter = _make_exporter(kind.lower() if ":" not in kind else kind, file_path)
+    except Exception as e:
+        logger.warning(f"Failed to create trace exporter {kind!r}; tracing disabled: {e}")
+        return False
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(max(0.0, min(1.0, float(sample_ratio))))),
+    )
+    # Console output is for local runs: write spans as they end rather than in batches.
+    processor = SimpleSpanProcessor if kind.lower() == "console" else BatchSpanProcessor
+    provider.add_span_processor(processor(span_exporter))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("avatar-worker")
+    logger.info(f"Tracing enabled ({kind} exporter, sample ratio {sample_ratio})")
+    return True
+
+
+def shutdown() -> None:
+    """Flush pending spans (call on exit)."""
+    if _tracer is None:
+        return
+    try:
+        from opentelemetry import trace
+
+        trace.get_tracer_provider().shutdown()
+    except Exception:
+        pass
+
+
+def _attributes(attributes: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Span attributes must be primitives (or lists of them); stringify the rest, drop None."""
+    out: Dict[str, Any] = {}
+    for key, value in (attributes or {}).items():
+        if value is None:
+            continue
+        if isinstance(value, (bool, int, float, str)):
+            out[key] = value
+        elif isinstance(value, (list, tuple)) and all(isinstance(v, (bool, int, float, str)) for v in value):
+            out[key] = list(value)
+        else:
+            out[key] = str(value)
+    return out
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """Context manager for a child span of the current one (yields the span, or None when tracing is off)."""
+    if _tracer is None:
+        return _NULL
+    return _tracer.start_as_current_span(name, attributes=_attributes(attributes))
+
+
+def set_attributes(current, attributes: Dict[str, Any]) -> None:
+    """Set attributes on a span yielded by `span()` / `job_span()` (no-op for None)."""
+    if current is not None:
+        current.set_attributes(_attributes(attributes))
+
+
+def inject_headers(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Add the current trace context (traceparent/tracestate) to outgoing HTTP headers."""
+    headers = dict(headers or {})
+    if _tracer is not None:
+        from opentelemetry import propagate
+
+        propagate.inject(headers)
+    return headers
+
+
+def _carrier(job_data: Dict[str, Any]) -> Dict[str, str]:
+    carrier = job_data.get("traceContext")
+    if not isinstance(carrier, dict):
+        carrier = {k: job_data[k] for k in ("traceparent", "tracestate") if isinstance(job_data.get(k), str)}
+    return {str(k): str(v) for k, v in carrier.items()}
+
+
+@contextlib.contextmanager
+def job_span(job_id: str, job_type: str, job_data: Dict[str, Any]) -> Iterator[Any]:
+    """
+    Root span of one job, parented to the producer's trace context from the job data. Also
+    records the queue wait as a `queue.wait` span when the consumer attached the BullMQ
+    enqueue time (job data `_queue`).
+    """
+    if _tracer is None:
+        yield None
+        return
+
+    from opentelemetry import propagate, trace
+
+    parent = propagate.extract(_carrier(job_data))
+    queue = job_data.get("_queue") if isinstance(job_data.get("_queue"), dict) else {}
+    attributes = _attributes(
+        {
+            "job.id": job_id,
+            "job.type": job_type,
+            "messaging.system": "bullmq",
+            "messaging.destination.name": queue.get("name"),
+            "messaging.message.id": queue.get("jobId"),
+        }
+    )
+
+    enqueued_ms = queue.get("timestamp")
+    if isinstance(enqueued_ms, (int, float)) and enqueued_ms > 0:
+        ready_ns = int((float(enqueued_ms) + float(queue.get("delay") or 0)) * 1e6)
+        now_ns = time.time_ns()
+        if ready_ns < now_ns:
+            wait = _tracer.start_span("queue.wait", context=parent, attributes=attributes, start_time=ready_ns)
+            wait.set_attribute("queue.wait_ms", round((now_ns - ready_ns) / 1e6, 1))
+            wait.end(end_time=now_ns)
+
+    with _tracer.start_as_current_span(
+        f"job {job_type}", context=parent, kind=trace.SpanKind.CONSUMER, attributes=attributes
+    ) as current:
+        yield current
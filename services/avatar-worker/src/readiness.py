@@ -0,0 +1,120 @@
+"""
+Readiness signals for autoscalers / orchestrators
+
+- HTTP: GET /healthz (process alive, 200 as soon as the worker starts) and GET /readyz
+  (200 once models are loaded and warmed up, 503 before). Served from a daemon thread, which
+  also serves GET /metrics (Prometheus) when a metrics renderer is passed in.
+- Redis: while the consumer is ready it keeps a key `<prefix>:<host>:<pid>` alive with a TTL,
+  so "how many consumers are ready" is a SCAN away and dead processes drop out on their own.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def start_http_server(
+    port: int,
+    is_ready: Callable[[], bool],
+    host: str = "0.0.0.0",
+    metrics: Optional[Callable[[], Optional[Tuple[bytes, str]]]] = None,
+) -> Optional[ThreadingHTTPServer]:
+    """
+    Serve /healthz and /readyz (and /metrics, given a renderer returning (body, content type))
+    on `port` in a daemon thread (port <= 0 disables).
+
+    Returns:
+        The server, or None when disabled / the port could not be bound
+    """
+    if port <= 0:
+        return None
+
+    started_at = time.time()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):  # noqa: N802 (http.server naming)
+            path = self.path.split("?", 1)[0]
+            if path == "/healthz":
+                self._reply(200, {"status": "alive"})
+            elif path == "/readyz":
+                ready = bool(is_ready())
+                self._reply(200 if ready else 503, {"ready": ready, "uptimeSeconds": round(time.time() - started_at, 1)})
+            elif path == "/metrics" and metrics is not None:
+                rendered = metrics()
+                if rendered is None:
+                    self._reply(503, {"error": "metrics unavailable (prometheus_client not installed)"})
+                    return
+                body, content_type = rendered
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def _reply(self, code: int, body: dict) -> None:
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):  # noqa: A002 - keep probe traffic out of the logs
+            return
+
+    try:
+        server = ThreadingHTTPServer((host, int(port)), Handler)
+    except OSError as e:
+        logger.warning(f"Readiness server could not bind port {port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="readiness-http", daemon=True).start()
+    logger.info(f"Readiness endpoints on :{port} (/healthz, /readyz{', /metrics' if metrics is not None else ''})")
+    return server
+
+
+class RedisReadinessPublisher:
+    """Keeps `<prefix>:<host>:<pid>` set (with a TTL) while this consumer is ready."""
+
+    def __init__(self, client, prefix: str = "avatar-worker:ready", ttl_seconds: int = 30):
+        self.client = client
+        self.key = f"{prefix}:{socket.gethostname()}:{os.getpid()}"
+        self.ttl_seconds = max(3, int(ttl_seconds))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        value = json.dumps({"host": socket.gethostname(), "pid": os.getpid(), "readySince": time.time()})
+
+        def run():
+            while True:
+                try:
+                    self.client.set(self.key, value, ex=self.ttl_seconds)
+                except Exception as e:
+                    logger.warning(f"Failed to publish readiness key {self.key}: {e}")
+                if self._stop.wait(self.ttl_seconds / 3.0):
+                    break
+
+        self._thread = threading.Thread(target=run, name="readiness-redis", daemon=True)
+        self._thread.start()
+        logger.info(f"Publishing readiness in Redis: {self.key} (ttl {self.ttl_seconds}s)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        try:
+            self.client.delete(self.key)
+        except Exception:
+            pass
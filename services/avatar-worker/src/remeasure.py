@@ -0,0 +1,282 @@
+"""
+Bulk re-measurement of stored avatars
+
+Stored measurements.json files go stale when the measurement mapping in
+MeasurementExtractor or SMPL-Anthropometry changes. This job lists the stored avatars
+(avatars/<id>/ in MINIO_BUCKET, or the ids in --ids) and re-measures each of them from the
+betas, PIXIE codes and height persisted in avatar_params.json, the same way an avatar_rebuild
+job does. It then rewrites measurements.json and quality_report.json, stamping the latter with
+"measurementVersion" = MEASUREMENT_VERSION.
+
+Avatars are processed in batches of --batch-size by a pool of --workers processes. Every
+process loads SMPL-X and the measurer once. Each batch runs a single SMPL-X forward pass;
+SMPL-Anthropometry then measures the bodies one at a time (it has no batched API, so this
+part is a per-body loop). Per avatar, the job only transfers a few small JSON objects.
+
+The job is idempotent:
+- avatars whose quality_report.json already carries the current MEASUREMENT_VERSION are
+  skipped after one small read (--force re-measures them);
+- quality_report.json (the stamp) is written last, so an interrupted avatar is redone on the
+  next run;
+- placeholder avatars and avatars without persisted betas are left alone. Avatars built before
+  avatar_params.json existed cannot be re-measured from storage (avatar.glb is a decimated,
+  posed display mesh, not an SMPL-X body); they are counted per reason in the run summary and
+  listed in --output, and need a fresh build from their photos.
+
+    python src/remeasure.py --workers 8 --output remeasured.jsonl
+    python src/remeasure.py --ids ids.txt --dry-run --output diff.jsonl
+    python src/remeasure.py --local-root /data/bucket    # LocalStorageClient layout instead of MinIO
+
+--output receives one JSON line per avatar: id, status (updated / current / skipped / failed),
+the new and previous measurements, and the reason for skips and failures. Use it to backfill
+the API's copy of the measurements.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger("remeasure")
+
+_IO_THREADS = 8
+
+# Child-process state (set by _init_child)
+_storage = None
+_pixie = None
+_measurer = None
+_options: Dict[str, Any] = {}
+
+
+def _make_storage(local_root: Optional[str]):
+    if local_root:
+        from pipeline.storage import LocalStorageClient
+
+        return LocalStorageClient(local_root)
+    from config import MINIO_ACCESS_KEY, MINIO_BUCKET, MINIO_ENDPOINT, MINIO_SECRET_KEY, MINIO_SECURE
+    from pipeline.storage import StorageClient
+
+    return StorageClient(MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_BUCKET, MINIO_SECURE)
+
+
+def list_avatar_ids(storage, prefix: str = "avatars/") -> Iterator[str]:
+    for child in storage.list_prefixes(prefix):
+        avatar_id = child[len(prefix):].rstrip("/")
+        if avatar_id:
+            yield avatar_id
+
+
+def _init_child(options: Dict[str, Any], threads: int) -> None:
+    """Pool initializer: load SMPL-X (via PIXIE) and the measurer once per process, CPU only."""
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    import torch
+
+    torch.set_num_threads(threads)
+
+    from config import PIXIE_DATA_DIR, PIXIE_MODEL_DIR, SMPLX_MODEL_DIR
+    from pipeline.measurements import MeasurementExtractor
+    from pipeline.pixie_runner import PIXIERunner
+
+    global _storage, _pixie, _measurer, _options
+    _options = options
+    _storage = _make_storage(options["local_root"])
+    _pixie = PIXIERunner(PIXIE_MODEL_DIR, SMPLX_MODEL_DIR, data_dir=PIXIE_DATA_DIR)
+    _measurer = MeasurementExtractor(SMPLX_MODEL_DIR)
+    # Placeholder output would overwrite real measurements with constants.
+    if _pixie.model is None or _measurer.measurer is None:
+        raise RuntimeError("PIXIE/SMPL-X or SMPL-Anthropometry failed to load; refusing to re-measure")
+
+
+def _read_json(object_name: str, temp_dir: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(temp_dir, object_name.replace("/", "__"))
+    try:
+        _storage.download_file(object_name, path)
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _write_json(value: Dict[str, Any], object_name: str, temp_dir: str) -> None:
+    path = os.path.join(temp_dir, "out__" + object_name.replace("/", "__"))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(value, f, indent=2)
+    _storage.upload_file(path, object_name, content_type="application/json")
+
+
+def _load_avatar(avatar_id: str, temp_dir: str) -> Dict[str, Any]:
+    """Fetch what re-measuring needs, stopping early when the avatar is already current."""
+    from config import MEASUREMENT_VERSION
+    from pipeline.avatar_params import AVATAR_PARAMS_FILENAME
+
+    record: Dict[str, Any] = {"id": avatar_id}
+    report = _read_json(f"avatars/{avatar_id}/quality_report.json", temp_dir) or {}
+    if report.get("measurementVersion") == MEASUREMENT_VERSION and not _options["force"]:
+        return {**record, "status": "current"}
+
+    params = _read_json(f"avatars/{avatar_id}/{AVATAR_PARAMS_FILENAME}", temp_dir)
+    if params is None:
+        return {**record, "status": "skipped", "reason": f"no {AVATAR_PARAMS_FILENAME}"}
+    if params.get("placeholder"):
+        return {**record, "status": "skipped", "reason": "placeholder avatar"}
+    betas = params.get("betas")
+    if not betas or len(betas) < 10:
+        return {**record, "status": "skipped", "reason": "no persisted betas"}
+
+    return {
+        **record,
+        "status": "pending",
+        "betas": [float(b) for b in betas[:10]],
+        "codes": params.get("pixieCodes"),
+        "heightCm": params.get("heightCm"),
+        "confidence": float(params.get("confidence", 0.0)),
+        "report": report,
+        "previous": _read_json(f"avatars/{avatar_id}/measurements.json", temp_dir),
+    }
+
+
+def _remeasure_batch(avatar_ids: List[str]) -> List[Dict[str, Any]]:
+    """Pool entry point: re-measure one batch of avatars, returning one record per id."""
+    import numpy as np
+
+    from config import MEASUREMENT_VERSION
+
+    with tempfile.TemporaryDirectory(prefix="remeasure-") as temp_dir, ThreadPoolExecutor(max_workers=_IO_THREADS) as io_pool:
+        records = list(io_pool.map(lambda avatar_id: _load_avatar(avatar_id, temp_dir), avatar_ids))
+        pending = [r for r in records if r["status"] == "pending"]
+        if not pending:
+            return records
+
+        vertices = _pixie.measurement_vertices_from_betas(
+            np.asarray([r["betas"] for r in pending], dtype=np.float32),
+            [r["heightCm"] for r in pending],
+            codes=[r["codes"] for r in pending],
+        )
+        measured = _measurer.extract_measurements_batch(vertices)
+
+        def store(record: Dict[str, Any], measurements: Optional[Dict[str, float]]) -> None:
+            if measurements is None:
+                record.update(status="failed", reason="measurement failed")
+                return
+            report = {k: v for k, v in record["report"].items() if k not in ("confidence", "warnings")}
+            report.update(_measurer.generate_quality_report(measurements, record["confidence"]))
+            input_issues = (report.get("inputQuality") or {}).get("issues") or []
+            if input_issues:
+                report["warnings"] = report.get("warnings", []) + [issue["message"] for issue in input_issues]
+            report["measurementVersion"] = MEASUREMENT_VERSION
+            try:
+                if not _options["dry_run"]:
+                    _write_json(measurements, f"avatars/{record['id']}/measurements.json", temp_dir)
+                    # Stamp last: an avatar interrupted between the two writes is redone next run.
+                    _write_json(report, f"avatars/{record['id']}/quality_report.json", temp_dir)
+                record.update(status="updated", measurements=measurements)
+            except Exception as e:
+                record.update(status="failed", reason=f"upload failed: {e}")
+
+        list(io_pool.map(store, pending, measured))
+
+    for record in records:
+        for key in ("betas", "codes", "heightCm", "confidence", "report"):
+            record.pop(key, None)
+    return records
+
+
+def _batches(ids: Iterable[str], size: int) -> Iterator[List[str]]:
+    batch: List[str] = []
+    for avatar_id in ids:
+        batch.append(avatar_id)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ids", help="file with one avatar id per line (default: list avatars/ in storage)")
+    parser.add_argument("--local-root", help="LocalStorageClient root instead of MinIO")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="re-measuring processes")
+    parser.add_argument("--batch-size", type=int, default=64, help="avatars per SMPL-X forward pass")
+    parser.add_argument("--force", action="store_true", help="also re-measure avatars already at MEASUREMENT_VERSION")
+    parser.add_argument("--dry-run", action="store_true", help="measure but do not write artifacts")
+    parser.add_argument("--limit", type=int, default=0, help="stop after N avatars")
+    parser.add_argument("--output", help="append one JSON line per avatar here")
+    args = parser.parse_args(argv)
+    args.workers = max(1, args.workers)
+    args.batch_size = max(1, args.batch_size)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    from config import MEASUREMENT_VERSION
+
+    if args.ids:
+        with open(args.ids, "r", encoding="utf-8") as f:
+            ids: Iterable[str] = [line.strip() for line in f if line.strip()]
+    else:
+        ids = list_avatar_ids(_make_storage(args.local_root))
+    if args.limit:
+        ids = (avatar_id for n, avatar_id in enumerate(ids) if n < args.limit)
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    threads = max(1, cpus // args.workers)
+    options = {"local_root": args.local_root, "force": args.force, "dry_run": args.dry_run}
+    counts: Dict[str, int] = {}
+    skipped: Dict[str, int] = {}  # reason -> avatars
+    started = time.perf_counter()
+    logger.info(f"Re-measuring to MEASUREMENT_VERSION={MEASUREMENT_VERSION} with {args.workers} workers{' (dry run)' if args.dry_run else ''}")
+
+    import multiprocessing
+
+    output = open(args.output, "a", encoding="utf-8") if args.output else None
+    try:
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_child,
+            initargs=(options, threads),
+        ) as pool:
+            in_flight: set = set()
+
+            def collect(done: Iterable) -> None:
+                for future in done:
+                    for record in future.result():
+                        counts[record["status"]] = counts.get(record["status"], 0) + 1
+                        if record["status"] == "skipped":
+                            skipped[record["reason"]] = skipped.get(record["reason"], 0) + 1
+                        if record["status"] == "failed":
+                            logger.warning(f"{record['id']}: {record.get('reason')}")
+                        if output is not None:
+                            output.write(json.dumps(record) + "\n")
+                total = sum(counts.values())
+                rate = total / max(time.perf_counter() - started, 1e-6)
+                logger.info(f"{total} avatars ({rate:.0f}/s): " + ", ".join(f"{k} {v}" for k, v in sorted(counts.items())))
+
+            # Listing is lazy; keep a bounded number of batches queued.
+            for batch in _batches(ids, args.batch_size):
+                in_flight.add(pool.submit(_remeasure_batch, batch))
+                if len(in_flight) >= 2 * args.workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(wait(in_flight).done)
+    finally:
+        if output is not None:
+            output.close()
+
+    logger.info(f"Done in {time.perf_counter() - started:.0f}s: " + ", ".join(f"{k} {v}" for k, v in sorted(counts.items())))
+    for reason, n in sorted(skipped.items()):
+        logger.warning(f"Not re-measured ({reason}): {n} avatar(s){'; ids in ' + args.output if args.output else ''}")
+    return 0 if not counts.get("failed") else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,203 @@
+"""
+Pre-fork worker supervisor
+
+Loads the models once (PIXIE, SMPL-X, SMPL-Anthropometry, optional SAM3D) in the parent,
+then forks WORKER_PROCESSES children that each run the queue consumer. Children share
+the weight tensors with the parent through copy-on-write: weights are only read during
+inference, so their pages are never copied. Torch intra-op threads are partitioned so
+N children do not oversubscribe the node's cores.
+
+The parent never runs jobs. It restarts crashed children by forking again from the
+already-loaded state (no model reload), with a per-slot backoff for crash loops, and
+forwards SIGTERM/SIGINT to the children on shutdown.
+
+Supervisor mode is CPU only. A CUDA context does not survive fork(): a child that touches
+the GPU after its parent initialized CUDA fails ("Cannot re-initialize CUDA in forked
+subprocess") or hangs. prepare_parent() therefore hides the GPUs before anything loads, and
+run_supervisor() refuses to fork once CUDA is initialized. For GPU nodes, run one process
+per GPU (WORKER_PROCESSES=1) instead.
+
+The parent also starts no threads of its own before the first fork: the readiness/metrics
+HTTP server is started by run_supervisor() once the children are running. Children forked
+later (restarts) close the server's inherited listening socket; its handler thread holds no
+locks the children use.
+"""
+
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import signal
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# A child that dies sooner than this after starting counts as a crash loop (restart backoff grows).
+_MIN_HEALTHY_SECONDS = 30.0
+_MAX_RESTART_BACKOFF_SECONDS = 60.0
+
+
+def default_threads_per_process(processes: int) -> int:
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    return max(1, cpus // max(1, processes))
+
+
+def prepare_parent() -> None:
+    """
+    Call before loading models: hide the GPUs so the models load on CPU (CUDA does not survive
+    fork), and keep the parent single-threaded so no OpenMP thread pool exists at fork time
+    (libgomp pools do not survive fork and can hang the children).
+    """
+    if os.environ.get("CUDA_VISIBLE_DEVICES") != "":
+        logger.info("Supervisor mode runs on CPU; hiding CUDA devices (CUDA_VISIBLE_DEVICES='')")
+    os.environ["CUDA_VISIBLE_DEVICES"] = ""
+    try:
+        import torch
+
+        torch.set_num_threads(1)
+    except Exception:
+        pass
+
+
+def _configure_child_threads(threads: int) -> None:
+    try:
+        import torch
+
+        torch.set_num_threads(int(threads))
+    except Exception as e:
+        logger.warning(f"Could not set torch threads in worker process: {e}")
+    try:
+        import cv2
+
+        cv2.setNumThreads(int(threads))
+    except Exception:
+        pass
+
+
+def _cuda_initialized() -> bool:
+    torch = sys.modules.get("torch")
+    try:
+        return torch is not None and torch.cuda.is_initialized()
+    except Exception:
+        return False
+
+
+def run_supervisor(
+    worker,
+    run_worker_loop: Callable[[object], None],
+    processes: int,
+    threads_per_process: int = 0,
+    start_http_server: Optional[Callable[[], Optional[object]]] = None,
+) -> None:
+    """
+    Fork `processes` children running `run_worker_loop(worker)` and keep them alive.
+
+    Args:
+        worker: Fully initialized AvatarWorker (models loaded); shared copy-on-write
+        run_worker_loop: Consumer loop run in each child
+        processes: Number of child processes
+        threads_per_process: Torch/OpenCV threads per child (0 = cores / processes)
+        start_http_server: Starts the parent's readiness/metrics server once the children
+            are forked; returns the server (or None)
+
+    Raises:
+        RuntimeError: CUDA is already initialized in this process (the children would
+            inherit an unusable CUDA context)
+    """
+    if _cuda_initialized():
+        raise RuntimeError(
+            "CUDA is initialized in the supervisor process; forked workers cannot use it. "
+            "Call prepare_parent() before loading models, or run WORKER_PROCESSES=1 per GPU."
+        )
+    threads = threads_per_process or default_threads_per_process(processes)
+    logger.info(f"Supervisor: forking {processes} worker process(es) with {threads} thread(s) each")
+
+    # Move everything allocated so far (models included) out of the GC's reach so collections in
+    # the children do not write to - and thereby copy - the shared pages.
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+
+    children: Dict[int, int] = {}  # pid -> slot
+    started_at: Dict[int, float] = {}  # slot -> start time
+    backoff: Dict[int, float] = {slot: 0.0 for slot in range(processes)}
+    stopping = False
+    http_server = None
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            # Child: default signal handling, own network clients, thread share, then consume.
+            if http_server is not None:
+                http_server.socket.close()
+            signal.signal(signal.SIGTERM, signal.default_int_handler)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            code = 0
+            try:
+                _configure_child_threads(threads)
+                worker.after_fork()
+                logger.info(f"Worker process {slot} started (pid {os.getpid()})")
+                run_worker_loop(worker)
+            except KeyboardInterrupt:
+                pass
+            except BaseException as e:
+                logger.error(f"Worker process {slot} crashed: {e}", exc_info=True)
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        children[pid] = slot
+        started_at[slot] = time.monotonic()
+
+    def shutdown(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        logger.info(f"Supervisor: received signal {signum}; stopping {len(children)} worker process(es)")
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for slot in range(processes):
+        spawn(slot)
+    if start_http_server is not None:
+        http_server = start_http_server()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+
+        slot = children.pop(pid, None)
+        if slot is None:
+            continue
+        code = os.waitstatus_to_exitcode(status) if hasattr(os, "waitstatus_to_exitcode") else status
+        if stopping:
+            logger.info(f"Worker process {slot} (pid {pid}) exited ({code})")
+            continue
+
+        lived = time.monotonic() - started_at.get(slot, 0.0)
+        if lived >= _MIN_HEALTHY_SECONDS:
+            backoff[slot] = 0.0
+        else:
+            backoff[slot] = min(_MAX_RESTART_BACKOFF_SECONDS, max(1.0, backoff[slot] * 2))
+        logger.error(
+            f"Worker process {slot} (pid {pid}) exited ({code}) after {lived:.0f}s; "
+            f"restarting in {backoff[slot]:.0f}s"
+        )
+        time.sleep(backoff[slot])
+        if not stopping:
+            spawn(slot)
+
+    logger.info("Supervisor: all worker processes exited")
+    sys.exit(0)
@@ -13,12 +13,20 @@ NOTE: This is a placeholder implementation. To enable actual ML processing:
    - pipeline/measurements.py
 """
 
+from __future__ import annotations
+
+import contextlib
 import logging
 import time
 import os
 import tempfile
 import json
-from typing import Dict, Any
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Any
+
+import numpy as np
 
 from config import (
     REDIS_URL,
@@ -30,6 +38,7 @@ from config import (
     API_BASE_URL,
     SMPLX_MODEL_DIR,
     PIXIE_MODEL_DIR,
+    PIXIE_DATA_DIR,
     REQUIRE_REAL_AVATAR,
     REQUIRE_GLTFPACK,
     GLTFPACK_PATH,
@@ -43,17 +52,81 @@ from config import (
     SAM3DBODY_FOV_PATH,
     SILHOUETTE_REFINE_ENABLED,
     SILHOUETTE_TORSO_ERODE_PX,
+    BETA_REFINE_MAX_NFEV,
+    INPUT_QUALITY_GATE,
+    INPUT_QUALITY_FAIL_ON,
+    INPUT_QUALITY_MIN_SHARPNESS,
+    INPUT_QUALITY_DETECT_PEOPLE,
+    PIPELINE_VERSION,
+    MEASUREMENT_VERSION,
+    RESULT_CACHE_ENABLED,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_MAX_MB,
+    RESULT_CACHE_REMOTE_ENABLED,
+    RESULT_CACHE_REMOTE_PREFIX,
+    RESULT_CACHE_REMOTE_TTL_DAYS,
+    MAX_RETRIES,
+    RETRY_BACKOFF_SECONDS,
+    RETRY_BACKOFF_MAX_SECONDS,
+    CHECKPOINT_DIR,
+    CHECKPOINT_MAX_MB,
+    CHECKPOINT_REMOTE_ENABLED,
+    CHECKPOINT_REMOTE_TTL_DAYS,
+    PROCESSING_TIMEOUT,
+    JOB_TIMEOUT,
+    RETRY_MIN_BUDGET_SECONDS,
+    DEADLINE_RESERVE_SECONDS,
+    REFINE_MIN_BUDGET_SECONDS,
+    GLTFPACK_TIMEOUT_SECONDS,
+    QUEUE_LOCK_DURATION_MS,
+    QUEUE_STALLED_INTERVAL_MS,
+    QUEUE_MAX_STALLED_COUNT,
+    QUEUE_KEEP_COMPLETED_COUNT,
+    QUEUE_KEEP_COMPLETED_AGE_SECONDS,
+    QUEUE_KEEP_FAILED_COUNT,
+    QUEUE_KEEP_FAILED_AGE_SECONDS,
+    WORKER_QUEUES,
+    QUEUE_SCHEDULING,
+    QUEUE_FAIR_SHARE_ENABLED,
+    QUEUE_FAIR_SHARE_INTAKE,
+    WORKER_PROCESSES,
+    WORKER_THREADS_PER_PROCESS,
+    MODEL_WARMUP_ENABLED,
+    READINESS_PORT,
+    READINESS_REDIS_ENABLED,
+    READINESS_REDIS_PREFIX,
+    READINESS_REDIS_TTL_SECONDS,
+    MODEL_MMAP_ENABLED,
+    MODEL_MMAP_DIR,
+    MODEL_PRELOAD,
+    MODEL_MEMORY_BUDGETS,
+    METRICS_ENABLED,
+    PROFILING_SAMPLE_RATE,
+    PROFILING_MODE,
+    PROFILING_SAMPLE_INTERVAL_MS,
+    PROFILING_TORCH_ENABLED,
+    TRACING_EXPORTER,
+    TRACING_FILE_PATH,
+    TRACING_SAMPLE_RATIO,
+    TRACING_SERVICE_NAME,
 )
-from pipeline.pixie_runner import PIXIERunner
-from pipeline.measurements import MeasurementExtractor
 from pipeline.optimize_glb import GLBOptimizer
 from pipeline.storage import StorageClient
-from pipeline.appearance import estimate_skin_color_rgb, apply_skin_tone_to_glb
-from pipeline.mask_provider import GrabCutMaskProvider, Sam3DBodyMaskProvider
-from pipeline.silhouette_targets import estimate_targets_from_masks
-from pipeline.betas_refiner import refine_betas_to_targets
+from pipeline.result_cache import ResultCache, file_sha256
+from pipeline.avatar_params import AVATAR_PARAMS_FILENAME, AVATAR_PARAMS_VERSION
+from pipeline.checkpoints import JobCheckpoints
+from pipeline.deadline import Deadline, DeadlineExceeded
+from pipeline import instrumentation, profiling, tracing
+from pipeline.residency import ModelResidency, parse_budgets
 from clients.api_client import APIClient
 
+# Model/vision modules (torch, trimesh, cv2, pygltflib, scipy) are imported where they are first
+# needed - in load_models() or the job path - so the worker can connect to Redis and answer
+# health probes while they load.
+if TYPE_CHECKING:
+    from pipeline.mask_provider import MaskResult
+    from pipeline.silhouette_targets import SilhouetteTargets
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -89,14 +162,57 @@ def to_jsonable(value: Any) -> Any:
     return value
 
 
+class NonRetryableJobError(RuntimeError):
+    """A job failure that retrying cannot fix (bad input, missing assets with REQUIRE_REAL_AVATAR)."""
+
+
+def _with_performance(quality_report: Dict[str, Any]) -> Dict[str, Any]:
+    """The quality report plus the current job's stage timings/memory peaks (so far)."""
+    job_metrics = instrumentation.current_job()
+    if job_metrics is None:
+        return quality_report
+    return {**quality_report, "performance": job_metrics.report()}
+
+
+def _rounded(values, digits: int = 6):
+    """Nested lists of rounded floats (JSON) from an array-like, or None."""
+    if values is None:
+        return None
+    return np.round(np.asarray(values, dtype=np.float64), digits).tolist()
+
+
+def build_avatar_params(smplx_params: Dict[str, Any], skin_rgb=None) -> Dict[str, Any]:
+    betas = np.asarray(smplx_params.get("betas", np.zeros(10)), dtype=np.float32).reshape(-1)[:10]
+    codes = smplx_params.get("pixieCodes") or {}
+    return {
+        "version": AVATAR_PARAMS_VERSION,
+        "pipelineVersion": PIPELINE_VERSION,
+        "betas": [round(float(b), 6) for b in betas],
+        "pixieCodes": {key: _rounded(codes.get(key)) for key in ("shape", "expression", "jawPose")} if codes else None,
+        "heightCm": smplx_params.get("heightCm"),
+        "confidence": float(smplx_params.get("confidence", 0.0)),
+        "placeholder": bool(smplx_params.get("placeholder")),
+        "sources": smplx_params.get("sources"),
+        "skinColor": [int(v) for v in skin_rgb] if skin_rgb is not None else None,
+    }
+
+
 class AvatarWorker:
     """Avatar generation worker"""
     
-    def __init__(self):
-        """Initialize worker with all necessary clients"""
+    def __init__(self, load_models: bool = True, storage=None, api_client=None):
+        """
+        Initialize worker with all necessary clients
+
+        Args:
+            load_models: Load (and warm up) models now; pass False and call start_loading() to
+                load them in the background while the queue connection is set up
+            storage: Storage client to use instead of MinIO (same interface as StorageClient)
+            api_client: API client to use instead of the HTTP APIClient
+        """
         logger.info("Initializing Avatar Worker...")
         
-        self.storage = StorageClient(
+        self.storage = storage or StorageClient(
             MINIO_ENDPOINT,
             MINIO_ACCESS_KEY,
             MINIO_SECRET_KEY,
@@ -104,12 +220,82 @@ class AvatarWorker:
             MINIO_SECURE
         )
         
-        self.api_client = APIClient(API_BASE_URL)
-        self.pixie = PIXIERunner(PIXIE_MODEL_DIR, SMPLX_MODEL_DIR)
-        self.measurer = MeasurementExtractor(SMPLX_MODEL_DIR)
-        self.optimizer = GLBOptimizer(gltfpack_path=GLTFPACK_PATH, require_gltfpack=REQUIRE_GLTFPACK)
+        self.api_client = api_client or APIClient(API_BASE_URL)
+
+        self.cache = None
+        if RESULT_CACHE_ENABLED:
+            try:
+                self.cache = ResultCache(
+                    RESULT_CACHE_DIR,
+                    version=PIPELINE_VERSION,
+                    max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024,
+                    storage=self.storage if RESULT_CACHE_REMOTE_ENABLED else None,
+                    remote_prefix=RESULT_CACHE_REMOTE_PREFIX,
+                    remote_ttl_days=RESULT_CACHE_REMOTE_TTL_DAYS,
+                )
+            except Exception as e:
+                logger.warning(f"Failed to initialize result cache; continuing without it: {e}")
+
+        self.checkpoint_store = None
+        try:
+            self.checkpoint_store = ResultCache(
+                CHECKPOINT_DIR,
+                version=PIPELINE_VERSION,
+                max_bytes=CHECKPOINT_MAX_MB * 1024 * 1024,
+                storage=self.storage if CHECKPOINT_REMOTE_ENABLED else None,
+                remote_prefix="checkpoints",
+                remote_ttl_days=CHECKPOINT_REMOTE_TTL_DAYS,
+                remote_rule_id="tryfitted-checkpoint-expiry",
+            )
+        except Exception as e:
+            logger.warning(f"Failed to initialize checkpoint store; retries will restart from scratch: {e}")
+
+        self.optimizer = GLBOptimizer(
+            gltfpack_path=GLTFPACK_PATH,
+            require_gltfpack=REQUIRE_GLTFPACK,
+            timeout_seconds=GLTFPACK_TIMEOUT_SECONDS,
+        )
+
+        # PIXIE, the measurer and the mask provider load on first use (or at startup for
+        # MODEL_PRELOAD) and may be evicted under MODEL_MEMORY_BUDGETS; see the properties below.
+        self.models = ModelResidency(parse_budgets(MODEL_MEMORY_BUDGETS))
+        self.models.register("pixie", self._load_pixie)
+        self.models.register("measurer", self._load_measurer)
+        self.models.register("masks", self._load_mask_provider)
+        self.ready = threading.Event()
+        self.load_error: BaseException | None = None
+
+        if load_models:
+            self.load_models()
+
+        logger.info("Avatar Worker initialized successfully")
 
-        self.mask_provider = None
+    @property
+    def pixie(self):
+        return self.models.get("pixie")
+
+    @property
+    def measurer(self):
+        return self.models.get("measurer")
+
+    @property
+    def mask_provider(self):
+        return self.models.get("masks")
+
+    def _load_pixie(self):
+        from pipeline.pixie_runner import PIXIERunner
+
+        return PIXIERunner(PIXIE_MODEL_DIR, SMPLX_MODEL_DIR, encoding_cache=self.cache, data_dir=PIXIE_DATA_DIR)
+
+    def _load_measurer(self):
+        from pipeline.measurements import MeasurementExtractor
+
+        return MeasurementExtractor(SMPLX_MODEL_DIR)
+
+    def _load_mask_provider(self):
+        from pipeline.mask_provider import GrabCutMaskProvider, Sam3DBodyMaskProvider
+
+        mask_provider = None
         if SAM3DBODY_ENABLED:
             if not SAM3DBODY_CHECKPOINT_PATH or not SAM3DBODY_MHR_PATH:
                 logger.warning(
@@ -118,7 +304,7 @@ class AvatarWorker:
                 )
             else:
                 try:
-                    self.mask_provider = Sam3DBodyMaskProvider(
+                    mask_provider = Sam3DBodyMaskProvider(
                         repo_dir=SAM3DBODY_REPO_DIR,
                         checkpoint_path=SAM3DBODY_CHECKPOINT_PATH,
                         mhr_path=SAM3DBODY_MHR_PATH,
@@ -130,11 +316,248 @@ class AvatarWorker:
                 except Exception as e:
                     logger.warning(f"Failed to initialize SAM3DBodyMaskProvider: {e}")
 
-        if self.mask_provider is None:
-            self.mask_provider = GrabCutMaskProvider()
-        
-        logger.info("Avatar Worker initialized successfully")
+        return mask_provider if mask_provider is not None else GrabCutMaskProvider()
+
+    def load_models(self, warm_up: bool = MODEL_WARMUP_ENABLED) -> None:
+        """
+        Load the MODEL_PRELOAD models in parallel (they share nothing), then run one warm-up
+        inference per model so the first job is not the slow one. Sets `ready`.
+        """
+        started = time.monotonic()
+        if MODEL_MMAP_ENABLED:
+            try:
+                from pipeline import mmap_weights
+
+                mmap_weights.configure(MODEL_MMAP_DIR)
+            except Exception as e:
+                logger.warning(f"mmap weight loading unavailable; loading weights into memory: {e}")
+        loaders = {"pixie": self._load_pixie, "measurer": self._load_measurer, "masks": self._load_mask_provider}
+        preload = [name for name in MODEL_PRELOAD if name in loaders]
+        if preload:
+            # Load outside the residency lock so the loaders run concurrently, then hand them over.
+            with ThreadPoolExecutor(max_workers=len(preload), thread_name_prefix="model-load") as pool:
+                futures = {name: pool.submit(loaders[name]) for name in preload}
+                loaded = {name: future.result() for name, future in futures.items()}
+            for name, model in loaded.items():
+                self.models.register(name, loaders[name], obj=model)
+            logger.info(f"Models loaded in {time.monotonic() - started:.1f}s: {', '.join(preload)}")
+
+        if warm_up:
+            for name in preload:
+                model = self.models.get(name)
+                warm_started = time.monotonic()
+                try:
+                    model.warm_up()
+                    logger.info(f"Warm-up {name}: {time.monotonic() - warm_started:.1f}s")
+                except Exception as e:
+                    logger.warning(f"Warm-up {name} failed (first job will pay the cost): {e}")
+
+        self.ready.set()
+        logger.info(f"Worker models ready after {time.monotonic() - started:.1f}s")
+
+    def start_loading(self) -> threading.Thread:
+        """Load models in a background thread; `ready` is set when done (`load_error` on failure)."""
+
+        def run():
+            try:
+                self.load_models()
+            except BaseException as e:
+                self.load_error = e
+                logger.error(f"Model loading failed: {e}", exc_info=True)
+
+        thread = threading.Thread(target=run, name="model-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def wait_until_ready(self, timeout: float | None = None) -> bool:
+        """Block until models are loaded. Raises if background loading failed."""
+        while not self.ready.wait(0.5 if timeout is None else min(0.5, timeout)):
+            if self.load_error is not None:
+                raise RuntimeError(f"Model loading failed: {self.load_error}") from self.load_error
+            if timeout is not None:
+                timeout -= 0.5
+                if timeout <= 0:
+                    return False
+        return True
+
+    def after_fork(self):
+        """Re-create network clients in a forked worker process (connection pools must not be shared)."""
+        self.storage = StorageClient(
+            MINIO_ENDPOINT,
+            MINIO_ACCESS_KEY,
+            MINIO_SECRET_KEY,
+            MINIO_BUCKET,
+            MINIO_SECURE
+        )
+        self.api_client = APIClient(API_BASE_URL)
+        for store in (self.cache, self.checkpoint_store):
+            if store is not None and store.storage is not None:
+                store.storage = self.storage
+
+    def _generate_mask(
+        self, photo_path: str, photo_hash: str | None, out_dir: str, prefix: str, deadline: Deadline | None = None
+    ) -> MaskResult:
+        """Generate a person mask, reusing a cached one when this photo was seen before."""
+        from pipeline.mask_provider import MaskResult
+
+        key = None
+        if self.cache is not None and photo_hash:
+            key = self.cache.key("mask", photo_hash, self.mask_provider.cache_key())
+            entry_dir = self.cache.get_dir("masks", key)
+            if entry_dir is not None:
+                try:
+                    with open(os.path.join(entry_dir, "result.json"), "r", encoding="utf-8") as f:
+                        meta = json.load(f)
+                    os.makedirs(out_dir, exist_ok=True)
+                    mask_path = os.path.join(out_dir, f"{prefix}_mask.png")
+                    shutil.copyfile(os.path.join(entry_dir, "mask.png"), mask_path)
+                    if meta.get("raw") is not None:
+                        with open(os.path.join(out_dir, f"{prefix}_sam3db.json"), "w", encoding="utf-8") as f:
+                            json.dump(meta["raw"], f, indent=2)
+                    logger.info(f"Mask cache hit for {prefix} view")
+                    return MaskResult(
+                        provider=meta.get("provider", "cached"),
+                        mask_path=mask_path,
+                        keypoints_2d=meta.get("keypoints_2d"),
+                        bbox=meta.get("bbox"),
+                        raw=meta.get("raw"),
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to restore cached mask ({e}); regenerating")
+
+        result = self.mask_provider.generate(photo_path, out_dir, prefix, deadline=deadline)
+
+        if key is not None:
+            meta_path = os.path.join(out_dir, f"{prefix}_mask_result.json")
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    to_jsonable(
+                        {"provider": result.provider, "keypoints_2d": result.keypoints_2d, "bbox": result.bbox, "raw": result.raw}
+                    ),
+                    f,
+                )
+            self.cache.put_files("masks", key, {"mask.png": result.mask_path, "result.json": meta_path})
+
+        return result
+
+    def _estimate_targets(
+        self,
+        front_mask: MaskResult,
+        side_mask: MaskResult,
+        photo_hashes: Dict[str, str | None],
+        height_cm: float,
+        debug_dir: str,
+    ) -> SilhouetteTargets:
+        """Estimate silhouette targets, keyed on both photos + settings that affect them."""
+        from pipeline.silhouette_targets import SilhouetteTargets, estimate_targets_from_masks
+
+        key = None
+        if self.cache is not None and photo_hashes.get("front") and photo_hashes.get("side"):
+            key = self.cache.key(
+                "silhouette-targets",
+                photo_hashes["front"],
+                photo_hashes["side"],
+                self.mask_provider.cache_key(),
+                float(height_cm),
+                SILHOUETTE_TORSO_ERODE_PX,
+            )
+            cached = self.cache.get_json("targets", key)
+            if cached is not None:
+                targets = SilhouetteTargets.from_dict(cached)
+                os.makedirs(debug_dir, exist_ok=True)
+                with open(os.path.join(debug_dir, "silhouette_targets.json"), "w", encoding="utf-8") as f:
+                    json.dump(targets.debug, f, indent=2)
+                logger.info("Silhouette targets cache hit")
+                return targets
+
+        targets = estimate_targets_from_masks(
+            front_mask_path=front_mask.mask_path,
+            side_mask_path=side_mask.mask_path,
+            height_cm=float(height_cm),
+            front_keypoints_2d=front_mask.keypoints_2d,
+            side_keypoints_2d=side_mask.keypoints_2d,
+            torso_erode_px=SILHOUETTE_TORSO_ERODE_PX,
+            save_debug_dir=debug_dir,
+        )
+        if key is not None:
+            self.cache.put_json("targets", key, to_jsonable(targets.to_dict()))
+        return targets
+
+    def _refine_betas(self, initial_betas: Any, height_cm: float, targets: Dict[str, float], deadline: Deadline | None = None):
+        """Refine betas to silhouette targets; the solve is deterministic, so cache it by its inputs."""
+        from pipeline.betas_refiner import BetaRefineConfig, refine_betas_to_targets
+
+        config = BetaRefineConfig(max_nfev=BETA_REFINE_MAX_NFEV)
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(
+                "refine-betas",
+                [round(float(b), 6) for b in to_jsonable(initial_betas)],
+                float(height_cm),
+                {k: round(float(v), 4) for k, v in targets.items()},
+                config.__dict__,
+                self.measurer.measurer is not None,
+            )
+            cached = self.cache.get_json("refine", key)
+            if cached is not None:
+                logger.info("Beta refinement cache hit")
+                return np.asarray(cached, dtype=np.float32)
+
+        refined = refine_betas_to_targets(
+            measurement_extractor=self.measurer,
+            initial_betas=initial_betas,
+            height_cm=float(height_cm),
+            targets=targets,
+            config=config,
+            deadline=deadline,
+        )
+        # A solve cut short by the deadline is a partial result; don't cache it.
+        if key is not None and not (deadline is not None and deadline.expired()):
+            self.cache.put_json("refine", key, to_jsonable(refined))
+        return refined
     
+    def _run_with_retries(self, job_id: str, attempt_fn, report_status: bool = True) -> bool:
+        """
+        Run a job attempt, retrying failures with exponential backoff (up to MAX_RETRIES retries).
+
+        One job-level Deadline of JOB_TIMEOUT seconds covers every attempt and backoff; each
+        attempt runs against a child of it capped at PROCESSING_TIMEOUT. No retry is started
+        unless RETRY_MIN_BUDGET_SECONDS would be left after the backoff. Attempts resume from
+        their stage checkpoints, so a retry after e.g. a failed upload does not re-run inference.
+        NonRetryableJobError and DeadlineExceeded fail the job immediately.
+        """
+        job_deadline = Deadline(JOB_TIMEOUT)
+        attempts = max(0, MAX_RETRIES) + 1
+        for attempt in range(1, attempts + 1):
+            try:
+                attempt_fn(job_deadline.child(budget=PROCESSING_TIMEOUT))
+                return True
+            except (NonRetryableJobError, DeadlineExceeded) as e:
+                logger.error(f"Job {job_id} failed (not retryable): {e}", exc_info=True)
+                error = str(e)
+                break
+            except Exception as e:
+                error = str(e)
+                if attempt >= attempts:
+                    logger.error(f"Job {job_id} failed after {attempt} attempt(s): {e}", exc_info=True)
+                    break
+                delay = min(RETRY_BACKOFF_MAX_SECONDS, RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1)))
+                if not job_deadline.has_budget(delay + RETRY_MIN_BUDGET_SECONDS):
+                    logger.error(
+                        f"Job {job_id} attempt {attempt}/{attempts} failed: {e}; not retrying, "
+                        f"{max(0.0, job_deadline.remaining()):.0f}s left of JOB_TIMEOUT={JOB_TIMEOUT}s",
+                        exc_info=True,
+                    )
+                    break
+                logger.warning(
+                    f"Job {job_id} attempt {attempt}/{attempts} failed: {e}; retrying in {delay:.1f}s", exc_info=True
+                )
+                time.sleep(delay)
+
+        if report_status:
+            self.api_client.update_job_status(job_id, "failed", error=error)
+        return False
+
     def process_job(self, job_data: Dict[str, Any]) -> bool:
         """
         Process avatar generation job
@@ -146,211 +569,590 @@ class AvatarWorker:
             True if successful, False otherwise
         """
         job_id = job_data.get("jobId")
-        front_photo_url = job_data.get("frontPhotoUrl")
-        side_photo_url = job_data.get("sidePhotoUrl")
-        height_cm = job_data.get("heightCm")
 
         if not job_id:
             logger.error(f"Job missing jobId: {job_data}")
             return False
 
         logger.info(f"Processing job {job_id}")
-        
+
+        checkpoints = JobCheckpoints(self.checkpoint_store, job_id)
+        with self._job_scope(job_id, "avatar_build", job_data) as job_metrics:
+            ok = self._run_with_retries(job_id, lambda deadline: self._build_avatar(job_data, checkpoints, deadline))
+            job_metrics.outcome = "completed" if ok else "failed"
+        if ok:
+            checkpoints.clear()
+        return ok
+
+    @contextlib.contextmanager
+    def _job_scope(self, job_id: str, job_type: str, job_data: Dict[str, Any]):
+        """Trace span, stage metrics and (when requested) profiler around one job; yields the JobMetrics."""
+        with tracing.job_span(job_id, job_type, job_data) as span:
+            with instrumentation.job(job_id, job_type) as job_metrics, self._profiler(job_id, job_data):
+                try:
+                    yield job_metrics
+                finally:
+                    tracing.set_attributes(span, {"job.outcome": job_metrics.outcome})
+
+    def _profiler(self, job_id: str, job_data: Dict[str, Any]):
+        """JobProfiler when this job is profiled (job data `profile` or PROFILING_SAMPLE_RATE), else a no-op."""
+        mode = profiling.requested_mode(job_data, PROFILING_SAMPLE_RATE, PROFILING_MODE)
+        if mode is None:
+            return contextlib.nullcontext()
+        return profiling.JobProfiler(
+            job_id,
+            self.storage,
+            mode=mode,
+            sample_interval_ms=PROFILING_SAMPLE_INTERVAL_MS,
+            torch_enabled=PROFILING_TORCH_ENABLED,
+        )
+
+    def _download_upload_url(self, url: str | None, dest_path: str) -> bool:
+        if not url:
+            open(dest_path, "w").close()
+            return False
+
+        if "uploads/" not in url:
+            open(dest_path, "w").close()
+            return False
+
+        parts = url.split("uploads/")
+        object_name = f"uploads/{parts[1]}"
         try:
-            # Update status to processing
-            self.api_client.update_job_status(job_id, "processing", progress=10)
-            
-            # Create temporary directory for processing
-            with tempfile.TemporaryDirectory() as temp_dir:
-                def download_upload_url(url: str | None, dest_path: str) -> bool:
-                    if not url:
-                        open(dest_path, "w").close()
-                        return False
-
-                    if "uploads/" not in url:
-                        open(dest_path, "w").close()
-                        return False
-
-                    parts = url.split("uploads/")
-                    object_name = f"uploads/{parts[1]}"
-                    try:
-                        self.storage.download_file(object_name, dest_path)
-                        return True
-                    except Exception as e:
-                        logger.warning(f"Failed to download {url}, using placeholder: {e}")
-                        open(dest_path, "w").close()
-                        return False
-
-                # Step 1: Download photos
-                logger.info("Step 1: Downloading photos...")
-                front_photo_path = os.path.join(temp_dir, "photo_front.jpg")
-                side_photo_path = os.path.join(temp_dir, "photo_side.jpg")
-                front_ok = download_upload_url(front_photo_url, front_photo_path)
-                side_ok = download_upload_url(side_photo_url, side_photo_path)
+            self.storage.download_file(object_name, dest_path)
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to download {url}, using placeholder: {e}")
+            open(dest_path, "w").close()
+            return False
 
+    def _build_avatar(self, job_data: Dict[str, Any], checkpoints: JobCheckpoints, deadline: Deadline) -> None:
+        """
+        One attempt at an avatar_build job. Raises on failure.
+
+        Stages checkpoint their output, so a retried attempt skips the ones already done:
+        pixie -> shape (after refinement) -> measure -> export -> upload.
+        """
+        job_id = job_data.get("jobId")
+        front_photo_url = job_data.get("frontPhotoUrl")
+        side_photo_url = job_data.get("sidePhotoUrl")
+        height_cm = job_data.get("heightCm")
+
+        # Update status to processing
+        self.api_client.update_job_status(job_id, "processing", progress=10)
+
+        # Create temporary directory for processing
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shape = checkpoints.load("shape")
+            if shape is None:
+                shape = self._build_shape(
+                    job_id, front_photo_url, side_photo_url, height_cm, temp_dir, checkpoints, deadline
+                )
+                checkpoints.save("shape", shape)
+
+            self.api_client.update_job_status(job_id, "processing", progress=40)
+
+            smplx_params = shape["smplx_params"]
+            smplx_params["heightCm"] = float(height_cm) if height_cm is not None else smplx_params.get("heightCm")
+            self._finish_avatar(
+                job_id,
+                smplx_params,
+                shape["skin_rgb"],
+                temp_dir,
+                target_triangles=int(job_data.get("targetTriangles") or 10000),
+                checkpoints=checkpoints,
+                deadline=deadline,
+            )
+
+    def check_inputs(self, photos: Dict[str, str]) -> Dict[str, Any] | None:
+        """
+        Pre-inference input quality gate (INPUT_QUALITY_GATE).
+
+        Args:
+            photos: view name -> local path of each downloaded photo
+
+        Returns:
+            The input quality report (metrics and issues per view), or None when the gate is off
+
+        Raises:
+            NonRetryableJobError: A photo is unreadable, or an INPUT_QUALITY_FAIL_ON issue was
+                found and the gate enforces
+        """
+        if INPUT_QUALITY_GATE == "off" or not photos:
+            return None
+        from pipeline.input_quality import InputQualityConfig, assess_inputs
+
+        config = InputQualityConfig(min_sharpness=INPUT_QUALITY_MIN_SHARPNESS, detect_people=INPUT_QUALITY_DETECT_PEOPLE)
+        with instrumentation.stage("input_quality", views=len(photos)):
+            report = assess_inputs(photos, config)
+            instrumentation.annotate(issues=len(report.issues))
+
+        # A photo that cannot be decoded cannot be processed either, so it fails even under "flag".
+        blocking = report.blocking(INPUT_QUALITY_FAIL_ON if INPUT_QUALITY_GATE == "enforce" else ["unreadable"])
+        if blocking:
+            raise NonRetryableJobError("Input photos rejected: " + " ".join(issue.message for issue in blocking))
+        return report.to_dict()
+
+    def _build_shape(
+        self,
+        job_id: str,
+        front_photo_url: str | None,
+        side_photo_url: str | None,
+        height_cm: float | None,
+        temp_dir: str,
+        checkpoints: JobCheckpoints,
+        deadline: Deadline,
+    ) -> Dict[str, Any]:
+        """Steps 1-2b: download photos, PIXIE, optional silhouette refinement."""
+        # Step 1: Download photos
+        logger.info("Step 1: Downloading photos...")
+        front_photo_path = os.path.join(temp_dir, "photo_front.jpg")
+        side_photo_path = os.path.join(temp_dir, "photo_side.jpg")
+        with instrumentation.stage("download"):
+            front_ok = self._download_upload_url(front_photo_url, front_photo_path)
+            side_ok = self._download_upload_url(side_photo_url, side_photo_path)
+
+        photo_hashes: Dict[str, str | None] = {"front": None, "side": None}
+        if self.cache is not None:
+            photo_hashes["front"] = file_sha256(front_photo_path) if front_ok else None
+            photo_hashes["side"] = file_sha256(side_photo_path) if side_ok else None
+
+        self.api_client.update_job_status(job_id, "processing", progress=20)
+
+        pixie_state = checkpoints.load("pixie")
+        if pixie_state is None:
+            input_quality = self.check_inputs(
+                {view: path for view, path, ok in (("front", front_photo_path, front_ok), ("side", side_photo_path, side_ok)) if ok}
+            )
+
+            from pipeline.appearance import estimate_skin_color_rgb
+
+            with instrumentation.stage("skin"):
                 skin_rgb = estimate_skin_color_rgb(front_photo_path) if front_ok else None
 
-                self.api_client.update_job_status(job_id, "processing", progress=20)
-                
-                # Step 2: Process with PIXIE (front + optional side)
-                logger.info("Step 2: Processing with PIXIE...")
+            # Step 2: Process with PIXIE (front + optional side)
+            logger.info("Step 2: Processing with PIXIE...")
+            with instrumentation.stage("pixie"), profiling.model_stage("pixie"):
                 smplx_params = self.pixie.process_images(
                     front_photo_path,
                     side_photo_path if side_ok else None,
                     height_cm,
+                    deadline=deadline,
+                )
+            if REQUIRE_REAL_AVATAR and smplx_params.get("placeholder"):
+                raise NonRetryableJobError(
+                    "Avatar generation ran in placeholder mode (PIXIE/SMPL-X assets not loaded). "
+                    "Install required PIXIE data + weights and SMPL-X models, or unset REQUIRE_REAL_AVATAR."
                 )
-                if REQUIRE_REAL_AVATAR and smplx_params.get("placeholder"):
-                    raise RuntimeError(
-                        "Avatar generation ran in placeholder mode (PIXIE/SMPL-X assets not loaded). "
-                        "Install required PIXIE data + weights and SMPL-X models, or unset REQUIRE_REAL_AVATAR."
+            if input_quality is not None:
+                smplx_params["inputQuality"] = input_quality
+            checkpoints.save("pixie", {"smplx_params": smplx_params, "skin_rgb": skin_rgb})
+        else:
+            smplx_params = pixie_state["smplx_params"]
+            skin_rgb = pixie_state["skin_rgb"]
+
+        # Optional silhouette refinement (Option A): use masks to refine betas for better fit accuracy.
+        # Optional stages run against a child deadline that keeps DEADLINE_RESERVE_SECONDS for the
+        # mandatory tail (measure/export/upload), and are skipped outright when the budget is short.
+        refine_deadline = deadline.child(DEADLINE_RESERVE_SECONDS)
+        refine_wanted = SILHOUETTE_REFINE_ENABLED and front_ok and side_ok and not smplx_params.get("placeholder")
+        if refine_wanted and not refine_deadline.has_budget(REFINE_MIN_BUDGET_SECONDS):
+            logger.warning(
+                f"Skipping silhouette refinement: {deadline.remaining():.0f}s left of PROCESSING_TIMEOUT={PROCESSING_TIMEOUT}s"
+            )
+            smplx_params["sources"] = {**(smplx_params.get("sources") or {}), "silhouetteRefineSkipped": "timeBudget"}
+        elif refine_wanted:
+            try:
+                logger.info("Step 2b: Generating masks + silhouette targets for refinement...")
+                debug_dir = os.path.join(temp_dir, "fit_debug")
+                with instrumentation.stage("masks", view="front"), profiling.model_stage("masks_front"):
+                    front_mask = self._generate_mask(front_photo_path, photo_hashes["front"], debug_dir, "front", refine_deadline)
+                with instrumentation.stage("masks", view="side"), profiling.model_stage("masks_side"):
+                    side_mask = self._generate_mask(side_photo_path, photo_hashes["side"], debug_dir, "side", refine_deadline)
+
+                with instrumentation.stage("silhouette_targets"):
+                    targets = self._estimate_targets(front_mask, side_mask, photo_hashes, float(height_cm), debug_dir)
+
+                # Upload debug artifacts (best-effort)
+                try:
+                    self.storage.upload_file(front_mask.mask_path, f"avatars/{job_id}/mask_front.png", content_type="image/png")
+                    self.storage.upload_file(side_mask.mask_path, f"avatars/{job_id}/mask_side.png", content_type="image/png")
+                    self.storage.upload_file(os.path.join(debug_dir, "front_sam3db.json"), f"avatars/{job_id}/front_sam3db.json", content_type="application/json")
+                    self.storage.upload_file(os.path.join(debug_dir, "side_sam3db.json"), f"avatars/{job_id}/side_sam3db.json", content_type="application/json")
+                    self.storage.upload_file(os.path.join(debug_dir, "silhouette_targets.json"), f"avatars/{job_id}/silhouette_targets.json", content_type="application/json")
+                except Exception:
+                    pass
+
+                with instrumentation.stage("refinement"):
+                    refined = self._refine_betas(
+                        smplx_params.get("betas", []),
+                        float(height_cm),
+                        {"chestCm": targets.chest_cm, "waistCm": targets.waist_cm, "hipCm": targets.hip_cm},
+                        deadline=refine_deadline,
                     )
+                smplx_params["betas"] = refined
+                smplx_params["sources"] = {**(smplx_params.get("sources") or {}), "silhouetteRefine": True}
 
-                # Optional silhouette refinement (Option A): use masks to refine betas for better fit accuracy.
-                if SILHOUETTE_REFINE_ENABLED and front_ok and side_ok and not smplx_params.get("placeholder"):
-                    try:
-                        logger.info("Step 2b: Generating masks + silhouette targets for refinement...")
-                        debug_dir = os.path.join(temp_dir, "fit_debug")
-                        front_mask = self.mask_provider.generate(front_photo_path, debug_dir, "front")
-                        side_mask = self.mask_provider.generate(side_photo_path, debug_dir, "side")
-
-                        targets = estimate_targets_from_masks(
-                            front_mask_path=front_mask.mask_path,
-                            side_mask_path=side_mask.mask_path,
-                            height_cm=float(height_cm),
-                            front_keypoints_2d=front_mask.keypoints_2d,
-                            side_keypoints_2d=side_mask.keypoints_2d,
-                            torso_erode_px=SILHOUETTE_TORSO_ERODE_PX,
-                            save_debug_dir=debug_dir,
-                        )
-
-                        # Upload debug artifacts (best-effort)
-                        try:
-                            self.storage.upload_file(front_mask.mask_path, f"avatars/{job_id}/mask_front.png", content_type="image/png")
-                            self.storage.upload_file(side_mask.mask_path, f"avatars/{job_id}/mask_side.png", content_type="image/png")
-                            self.storage.upload_file(os.path.join(debug_dir, "front_sam3db.json"), f"avatars/{job_id}/front_sam3db.json", content_type="application/json")
-                            self.storage.upload_file(os.path.join(debug_dir, "side_sam3db.json"), f"avatars/{job_id}/side_sam3db.json", content_type="application/json")
-                            self.storage.upload_file(os.path.join(debug_dir, "silhouette_targets.json"), f"avatars/{job_id}/silhouette_targets.json", content_type="application/json")
-                        except Exception:
-                            pass
-
-                        refined = refine_betas_to_targets(
-                            measurement_extractor=self.measurer,
-                            initial_betas=smplx_params.get("betas", []),
-                            height_cm=float(height_cm),
-                            targets={"chestCm": targets.chest_cm, "waistCm": targets.waist_cm, "hipCm": targets.hip_cm},
-                        )
-                        smplx_params["betas"] = refined
-                        smplx_params["sources"] = {**(smplx_params.get("sources") or {}), "silhouetteRefine": True}
-
-                        meshes = self.pixie.build_meshes_from_betas(refined, float(height_cm))
-                        smplx_params.update(meshes)
-
-                    except Exception as e:
-                        logger.warning(f"Silhouette refinement skipped/failed: {e}")
+                with instrumentation.stage("mesh_build"), profiling.model_stage("mesh_build"):
+                    meshes = self.pixie.build_meshes_from_betas(refined, float(height_cm), codes=smplx_params.get("pixieCodes"))
+                smplx_params.update(meshes)
 
-                self.api_client.update_job_status(job_id, "processing", progress=40)
-                
-                # Step 3: Extract measurements
-                logger.info("Step 3: Extracting measurements...")
+            except Exception as e:
+                logger.warning(f"Silhouette refinement skipped/failed: {e}")
+
+        return {"smplx_params": smplx_params, "skin_rgb": skin_rgb}
+
+    def _finish_avatar(
+        self,
+        job_id: str,
+        smplx_params: Dict[str, Any],
+        skin_rgb,
+        temp_dir: str,
+        target_triangles: int = 10000,
+        report_status: bool = True,
+        checkpoints: JobCheckpoints | None = None,
+        deadline: Deadline | None = None,
+    ) -> Dict[str, Any]:
+        """
+        Shared tail of build + rebuild jobs: measure, export, optimize, upload, complete.
+
+        Returns:
+            The result payload sent to the API
+        """
+        checkpoints = checkpoints or JobCheckpoints(None, job_id)
+        deadline = deadline or Deadline()
+
+        def update_status(status: str, **kwargs) -> bool:
+            if report_status:
+                return self.api_client.update_job_status(job_id, status, **kwargs)
+            return True
+
+        # Step 3: Extract measurements
+        deadline.check("measurement")
+        measured = checkpoints.load("measure")
+        if measured is None:
+            logger.info("Step 3: Extracting measurements...")
+            with instrumentation.stage("measurement"):
                 measurements = self.measurer.extract_measurements(smplx_params)
                 quality_report = self.measurer.generate_quality_report(
                     measurements,
                     smplx_params.get("confidence", 0.0),
                     placeholder=bool(smplx_params.get("placeholder") or self.measurer.measurer is None)
                 )
-                
-                self.api_client.update_job_status(job_id, "processing", progress=60)
-                
+                quality_report["measurementVersion"] = MEASUREMENT_VERSION
+                input_quality = smplx_params.get("inputQuality")
+                if input_quality:
+                    quality_report["inputQuality"] = input_quality
+                    if input_quality.get("issues"):
+                        quality_report["warnings"] = quality_report.get("warnings", []) + [
+                            issue["message"] for issue in input_quality["issues"]
+                        ]
+            checkpoints.save("measure", {"measurements": measurements, "quality_report": quality_report})
+        else:
+            measurements = measured["measurements"]
+            quality_report = measured["quality_report"]
+
+        update_status("processing", progress=60)
+
+        object_name = f"avatars/{job_id}/avatar.glb"
+        uploaded = checkpoints.load("upload")
+        if uploaded is None:
+            final_glb_path = checkpoints.load_file("export", "avatar.glb")
+            if final_glb_path is None:
                 # Step 4: Export mesh
+                deadline.check("mesh export")
                 logger.info("Step 4: Exporting mesh...")
                 glb_path = os.path.join(temp_dir, "avatar.glb")
-                self.pixie.export_mesh(smplx_params, glb_path)
-                
-                self.api_client.update_job_status(job_id, "processing", progress=70)
-                
+                with instrumentation.stage("export"):
+                    self.pixie.export_mesh(smplx_params, glb_path)
+
+                update_status("processing", progress=70)
+
                 # Step 5: Optimize GLB
                 logger.info("Step 5: Optimizing GLB...")
                 optimized_path = os.path.join(temp_dir, "avatar_optimized.glb")
-                final_glb_path = self.optimizer.optimize(glb_path, optimized_path)
-
-                if skin_rgb is not None:
-                    apply_skin_tone_to_glb(final_glb_path, skin_rgb)
-                
-                self.api_client.update_job_status(job_id, "processing", progress=85)
-                
-                # Step 6: Upload to MinIO
-                logger.info("Step 6: Uploading to MinIO...")
-                object_name = f"avatars/{job_id}/avatar.glb"
-                self.storage.upload_file(final_glb_path, object_name)
-                glb_url = self.storage.get_public_url(object_name)
-
-                measurements_path = os.path.join(temp_dir, "measurements.json")
-                quality_report_path = os.path.join(temp_dir, "quality_report.json")
-                appearance_path = os.path.join(temp_dir, "appearance.json")
-                with open(measurements_path, "w", encoding="utf-8") as f:
-                    json.dump(to_jsonable(measurements), f, indent=2)
-                with open(quality_report_path, "w", encoding="utf-8") as f:
-                    json.dump(to_jsonable(quality_report), f, indent=2)
-                with open(appearance_path, "w", encoding="utf-8") as f:
-                    appearance = {"sources": to_jsonable(smplx_params.get("sources"))}
+                with instrumentation.stage("optimization"):
+                    final_glb_path = self.optimizer.optimize(
+                        glb_path, optimized_path, target_triangles=target_triangles, deadline=deadline
+                    )
+
                     if skin_rgb is not None:
-                        r, g, b = skin_rgb
-                        appearance["skinColor"] = {"rgb": [int(r), int(g), int(b)], "hex": f"#{r:02x}{g:02x}{b:02x}"}
-                    json.dump(to_jsonable(appearance), f, indent=2)
-
-                self.storage.upload_file(measurements_path, f"avatars/{job_id}/measurements.json", content_type="application/json")
-                self.storage.upload_file(quality_report_path, f"avatars/{job_id}/quality_report.json", content_type="application/json")
-                self.storage.upload_file(appearance_path, f"avatars/{job_id}/appearance.json", content_type="application/json")
-                
-                self.api_client.update_job_status(job_id, "processing", progress=95)
-                
-                # Step 7: Complete job
-                logger.info("Step 7: Completing job...")
-                # TODO: Get user_id from job data
-                user_id = "default-user"
-                result = {
-                    "userId": user_id,
-                    "glbUrl": glb_url,
-                    "measurements": to_jsonable(measurements),
-                    "qualityReport": to_jsonable(quality_report),
+                        from pipeline.appearance import apply_skin_tone_to_glb
+
+                        apply_skin_tone_to_glb(final_glb_path, skin_rgb)
+                checkpoints.save_file("export", "avatar.glb", final_glb_path)
+
+            update_status("processing", progress=85)
+
+            # Step 6: Upload to MinIO
+            deadline.check("upload")
+            logger.info("Step 6: Uploading to MinIO...")
+            with instrumentation.stage("upload"):
+                self._upload_artifacts(
+                    job_id, final_glb_path, smplx_params, skin_rgb, measurements, _with_performance(quality_report), temp_dir
+                )
+            checkpoints.save("upload", True)
+
+        glb_url = self.storage.get_public_url(object_name)
+
+        update_status("processing", progress=95)
+
+        # Step 7: Complete job
+        logger.info("Step 7: Completing job...")
+        # TODO: Get user_id from job data
+        user_id = "default-user"
+        result = {
+            "userId": user_id,
+            "glbUrl": glb_url,
+            "measurements": to_jsonable(measurements),
+            "qualityReport": to_jsonable(_with_performance(quality_report)),
+        }
+        if not update_status("completed", progress=100, result=result):
+            raise RuntimeError("Failed to report job completion to the API")
+
+        logger.info(f"Job {job_id} completed successfully!")
+        return result
+
+    def _upload_artifacts(
+        self,
+        job_id: str,
+        final_glb_path: str,
+        smplx_params: Dict[str, Any],
+        skin_rgb,
+        measurements: Dict[str, float],
+        quality_report: Dict[str, Any],
+        temp_dir: str,
+    ) -> None:
+        self.storage.upload_file(final_glb_path, f"avatars/{job_id}/avatar.glb")
+
+        measurements_path = os.path.join(temp_dir, "measurements.json")
+        quality_report_path = os.path.join(temp_dir, "quality_report.json")
+        appearance_path = os.path.join(temp_dir, "appearance.json")
+        params_path = os.path.join(temp_dir, AVATAR_PARAMS_FILENAME)
+        with open(measurements_path, "w", encoding="utf-8") as f:
+            json.dump(to_jsonable(measurements), f, indent=2)
+        with open(quality_report_path, "w", encoding="utf-8") as f:
+            json.dump(to_jsonable(quality_report), f, indent=2)
+        with open(appearance_path, "w", encoding="utf-8") as f:
+            appearance = {"sources": to_jsonable(smplx_params.get("sources"))}
+            if skin_rgb is not None:
+                r, g, b = skin_rgb
+                appearance["skinColor"] = {"rgb": [int(r), int(g), int(b)], "hex": f"#{r:02x}{g:02x}{b:02x}"}
+            json.dump(to_jsonable(appearance), f, indent=2)
+        with open(params_path, "w", encoding="utf-8") as f:
+            json.dump(to_jsonable(build_avatar_params(smplx_params, skin_rgb)), f)
+
+        self.storage.upload_file(measurements_path, f"avatars/{job_id}/measurements.json", content_type="application/json")
+        self.storage.upload_file(quality_report_path, f"avatars/{job_id}/quality_report.json", content_type="application/json")
+        self.storage.upload_file(appearance_path, f"avatars/{job_id}/appearance.json", content_type="application/json")
+        self.storage.upload_file(params_path, f"avatars/{job_id}/{AVATAR_PARAMS_FILENAME}", content_type="application/json")
+
+    def process_rebuild_job(self, job_data: Dict[str, Any]) -> bool:
+        """
+        Process an `avatar_rebuild` job: regenerate meshes from persisted betas.
+
+        No photo downloads, PIXIE or masks; only SMPL-X mesh building, measurement, export and upload.
+        Used for pose / height / LOD changes after the fact.
+
+        Args:
+            job_data: jobId, optional sourceJobId (defaults to jobId), heightCm, displayPose,
+                aposeArmDownDeg, targetTriangles, reportStatus (default True)
+
+        Returns:
+            True if successful, False otherwise
+        """
+        job_id = job_data.get("jobId")
+        source_job_id = job_data.get("sourceJobId") or job_id
+        report_status = bool(job_data.get("reportStatus", True))
+
+        if not job_id:
+            logger.error(f"Rebuild job missing jobId: {job_data}")
+            return False
+
+        logger.info(f"Rebuilding avatar {source_job_id} as job {job_id}")
+        with self._job_scope(job_id, "avatar_rebuild", job_data) as job_metrics:
+            ok = self._run_with_retries(
+                job_id,
+                lambda deadline: self._rebuild_avatar(job_data, job_id, source_job_id, report_status, deadline),
+                report_status=report_status,
+            )
+            job_metrics.outcome = "completed" if ok else "failed"
+        return ok
+
+    def _rebuild_avatar(
+        self, job_data: Dict[str, Any], job_id: str, source_job_id: str, report_status: bool, deadline: Deadline
+    ) -> None:
+        """One attempt at an avatar_rebuild job. Raises on failure."""
+        if report_status:
+            self.api_client.update_job_status(job_id, "processing", progress=10)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            params_path = os.path.join(temp_dir, AVATAR_PARAMS_FILENAME)
+            with instrumentation.stage("download"):
+                self.storage.download_file(f"avatars/{source_job_id}/{AVATAR_PARAMS_FILENAME}", params_path)
+            with open(params_path, "r", encoding="utf-8") as f:
+                params = json.load(f)
+
+            betas = params.get("betas")
+            if not betas:
+                raise NonRetryableJobError(f"{AVATAR_PARAMS_FILENAME} for {source_job_id} has no betas")
+
+            height_cm = job_data.get("heightCm") or params.get("heightCm")
+            if height_cm is None:
+                raise NonRetryableJobError("Rebuild requires heightCm (job data or persisted params)")
+
+            logger.info("Step 2: Rebuilding meshes from betas...")
+            with instrumentation.stage("mesh_build"), profiling.model_stage("mesh_build"):
+                meshes = self.pixie.build_meshes_from_betas(
+                    np.asarray(betas, dtype=np.float32),
+                    float(height_cm),
+                    display_pose=job_data.get("displayPose"),
+                    arm_down_deg=job_data.get("aposeArmDownDeg"),
+                    codes=params.get("pixieCodes"),
+                )
+            if meshes.get("placeholder"):
+                if REQUIRE_REAL_AVATAR:
+                    raise NonRetryableJobError("Avatar rebuild ran in placeholder mode (PIXIE/SMPL-X assets not loaded).")
+                smplx_params = meshes
+            else:
+                smplx_params = {
+                    "betas": np.asarray(betas, dtype=np.float32),
+                    "pixieCodes": params.get("pixieCodes"),
+                    "confidence": float(params.get("confidence", 0.0)),
+                    "placeholder": False,
+                    "heightCm": float(height_cm),
+                    "sources": {**(params.get("sources") or {}), "rebuiltFrom": source_job_id},
+                    **meshes,
                 }
-                self.api_client.update_job_status(job_id, "completed", progress=100, result=result)
-                
-                logger.info(f"Job {job_id} completed successfully!")
-                return True
-                
-        except Exception as e:
-            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
-            self.api_client.update_job_status(job_id, "failed", error=str(e))
+
+            if report_status:
+                self.api_client.update_job_status(job_id, "processing", progress=40)
+
+            skin = params.get("skinColor")
+            skin_rgb = tuple(int(v) for v in skin) if skin else None
+
+            self._finish_avatar(
+                job_id,
+                smplx_params,
+                skin_rgb,
+                temp_dir,
+                target_triangles=int(job_data.get("targetTriangles") or 10000),
+                report_status=report_status,
+                deadline=deadline,
+            )
+
+    def report_stalled_failure(self, job_data: Dict[str, Any], reason: str) -> None:
+        """Mark a job the queue's stalled check moved to failed as failed in the API."""
+        job_id = job_data.get("jobId")
+        if not job_id:
+            logger.error(f"Stalled job without a jobId failed ({reason}); nothing to report")
+            return
+        logger.error(f"Job {job_id} failed: {reason}")
+        self.api_client.update_job_status(job_id, "failed", error=reason)
+
+    def handle_job(self, job_data: Dict[str, Any]) -> bool:
+        """Dispatch a queued job by its `type` (defaults to avatar_build)."""
+        job_type = job_data.get("type") or "avatar_build"
+        if job_type == "avatar_rebuild":
+            return self.process_rebuild_job(job_data)
+        if job_type != "avatar_build":
+            logger.error(f"Unknown job type {job_type!r} for job {job_data.get('jobId')}")
             return False
+        return self.process_job(job_data)
 
 
-def main():
-    """Main worker loop"""
-    logger.info("Starting Avatar Worker...")
-    
-    worker = AvatarWorker()
-    
+def run_worker_loop(worker: AvatarWorker):
+    """Consume jobs with an initialized worker until interrupted"""
     # Import Redis client
     from clients.redis_client import RedisClient
+    from clients.queue_scheduling import parse_queue_specs
+    from readiness import RedisReadinessPublisher
     
+    publisher = None
     try:
-        # Connect to Redis
+        # Connect to Redis (overlaps with background model loading, if any)
         redis_client = RedisClient(REDIS_URL)
+
+        if not worker.ready.is_set():
+            logger.info("Waiting for models to finish loading...")
+        worker.wait_until_ready()
+
+        if READINESS_REDIS_ENABLED:
+            publisher = RedisReadinessPublisher(redis_client.client, READINESS_REDIS_PREFIX, READINESS_REDIS_TTL_SECONDS)
+            publisher.start()
         
         # Define job handler
         def handle_job(job_data: Dict[str, Any]) -> bool:
-            """Handle avatar_build job"""
-            return worker.process_job(job_data)
+            """Handle avatar_build / avatar_rebuild jobs"""
+            return worker.handle_job(job_data)
         
         # Start consuming jobs
         logger.info("Worker ready and listening for jobs...")
-        redis_client.consume_jobs("avatar_build", handle_job)
+        redis_client.consume_jobs(
+            parse_queue_specs(WORKER_QUEUES),
+            handle_job,
+            lock_duration_ms=QUEUE_LOCK_DURATION_MS,
+            stalled_interval_ms=QUEUE_STALLED_INTERVAL_MS,
+            max_stalled_count=QUEUE_MAX_STALLED_COUNT,
+            keep_completed=(QUEUE_KEEP_COMPLETED_COUNT, QUEUE_KEEP_COMPLETED_AGE_SECONDS),
+            keep_failed=(QUEUE_KEEP_FAILED_COUNT, QUEUE_KEEP_FAILED_AGE_SECONDS),
+            scheduling=QUEUE_SCHEDULING,
+            fair_share=QUEUE_FAIR_SHARE_ENABLED,
+            fair_share_intake=QUEUE_FAIR_SHARE_INTAKE,
+            on_stalled_failure=worker.report_stalled_failure,
+        )
         
     except KeyboardInterrupt:
         logger.info("Worker shutting down...")
     except Exception as e:
         logger.error(f"Worker error: {e}", exc_info=True)
+    finally:
+        if publisher is not None:
+            publisher.stop()
+        tracing.shutdown()
+
+
+def main():
+    """Main worker loop"""
+    logger.info("Starting Avatar Worker...")
+
+    from readiness import start_http_server
+
+    if METRICS_ENABLED and WORKER_PROCESSES > 1 and not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Children record into per-process files that the parent's /metrics aggregates.
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="avatar-worker-metrics-")
+
+    if TRACING_EXPORTER.lower() == "file":
+        os.makedirs(os.path.dirname(TRACING_FILE_PATH) or ".", exist_ok=True)
+    tracing.configure(TRACING_EXPORTER, TRACING_SERVICE_NAME, TRACING_FILE_PATH, TRACING_SAMPLE_RATIO)
+
+    ready = threading.Event()
+    metrics = instrumentation.render_metrics if METRICS_ENABLED else None
+
+    if WORKER_PROCESSES > 1:
+        from supervisor import prepare_parent, run_supervisor
+
+        # Models must be resident before forking so the children share them. The HTTP server
+        # thread is started by the supervisor after forking (see supervisor.py).
+        prepare_parent()
+        worker = AvatarWorker()
+        ready.set()
+        run_supervisor(
+            worker,
+            run_worker_loop,
+            WORKER_PROCESSES,
+            WORKER_THREADS_PER_PROCESS,
+            start_http_server=lambda: start_http_server(READINESS_PORT, ready.is_set, metrics=metrics),
+        )
+        return
+
+    start_http_server(READINESS_PORT, ready.is_set, metrics=metrics)
+
+    # Load models in the background while Redis is connected; consumption starts once they are ready.
+    worker = AvatarWorker(load_models=False)
+    worker.ready = ready
+    worker.start_loading()
+    run_worker_loop(worker)
 
 
 if __name__ == "__main__":
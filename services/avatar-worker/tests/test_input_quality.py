@@ -0,0 +1,67 @@
+"""assess_view on synthetic photos: sharp, blurred, dark and blown-out."""
+
+import cv2
+import numpy as np
+import pytest
+
+from pipeline.input_quality import InputQualityConfig, assess_view
+
+# Person checks need a real person (and HOG, which OpenCV 5 lacks); only image checks here.
+CONFIG = InputQualityConfig(detect_people=False)
+
+
+def _scene(seed: int = 0) -> np.ndarray:
+    """A textured mid-gray 1200x900 scene with hard edges, like a room behind a subject."""
+    rng = np.random.default_rng(seed)
+    image = np.full((1200, 900, 3), 128, dtype=np.uint8)
+    for _ in range(60):
+        x, y = int(rng.integers(0, 860)), int(rng.integers(0, 1160))
+        w, h = int(rng.integers(20, 200)), int(rng.integers(20, 200))
+        cv2.rectangle(image, (x, y), (x + w, y + h), tuple(int(c) for c in rng.integers(40, 216, 3)), -1)
+    noise = rng.normal(0, 8, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+
+def _write(tmp_path, name: str, image: np.ndarray) -> str:
+    path = str(tmp_path / f"{name}.jpg")
+    assert cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, 95])
+    return path
+
+
+def _codes(result) -> list:
+    return [issue.code for issue in result.issues]
+
+
+def test_sharp_photo_has_no_issues(tmp_path):
+    result = assess_view(_write(tmp_path, "sharp", _scene()), "front", CONFIG)
+    assert _codes(result) == []
+    assert result.sharpness >= CONFIG.min_sharpness
+    assert CONFIG.min_brightness <= result.brightness <= CONFIG.max_brightness
+
+
+def test_blurred_photo_is_blurry(tmp_path):
+    sharp = assess_view(_write(tmp_path, "sharp", _scene()), "front", CONFIG)
+    blurred = assess_view(_write(tmp_path, "blurred", cv2.GaussianBlur(_scene(), (0, 0), 12)), "front", CONFIG)
+    assert _codes(blurred) == ["blurry"]
+    assert blurred.sharpness < sharp.sharpness
+
+
+def test_dark_photo_is_too_dark_not_blurry(tmp_path):
+    dark = (_scene().astype(np.float32) * 0.15).astype(np.uint8)
+    result = assess_view(_write(tmp_path, "dark", dark), "side", CONFIG)
+    assert _codes(result) == ["too_dark"]
+    assert result.issues[0].view == "side"
+
+
+def test_blown_out_photo_is_too_bright(tmp_path):
+    blown = np.clip(_scene().astype(np.float32) * 3.0, 0, 255).astype(np.uint8)
+    result = assess_view(_write(tmp_path, "blown", blown), "front", CONFIG)
+    assert _codes(result) == ["too_bright"]
+    assert result.bright_fraction > CONFIG.max_clipped_fraction
+
+
+@pytest.mark.parametrize("content", [b"", b"not an image"])
+def test_unreadable_photo(tmp_path, content):
+    path = tmp_path / "broken.jpg"
+    path.write_bytes(content)
+    assert _codes(assess_view(str(path), "front", CONFIG)) == ["unreadable"]